@@ -1,19 +1,19 @@
 from .coincap import CoinCap
 from .coinmarketcap import CoinMarketCap
-from .ccxt_exapi import CCXT 
+from .ccxt_exapi import CCXT
+from .orderbook import OrderBook
+from .registry import ExchangeRegistry
 
-exs = {
-    'CoinCap': {'PUBLIC': CoinCap},
-    'CoinMarketCap': {'PUBLIC': CoinMarketCap()},
-    }
+exs = ExchangeRegistry()
+exs['CoinCap'] = {'PUBLIC': CoinCap}
+exs['CoinMarketCap'] = {'PUBLIC': CoinMarketCap()}
 
 exchanges = ['Binance', 'Bitfinex', 'Bitstamp', 'Bittrex',
              'CoinbasePro', 'Kraken', 'Kucoin',
              'Liquid', 'Poloniex']
 
-for ex_name in exchanges:
-    if ex_name == 'Kucoin':
-        exs[ex_name] = {'PUBLIC': CCXT('Kucoin2')}       
-    else:
-        exs[ex_name] = {'PUBLIC': CCXT(ex_name)}
+# exapi exchange name -> ccxt exchange name, where they differ
+ccxt_names = {'Kucoin': 'Kucoin2'}
 
+for ex_name in exchanges:
+    exs.register(ex_name, lambda ex_name=ex_name: CCXT(ccxt_names.get(ex_name, ex_name)))
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+import os
+import json
+import fcntl
+import logging
+import tempfile
+from threading import Lock
+from time import time
+import numpy as np
+
+CANDLE_DIR = os.getenv('EXAPI_CANDLE_DIR', os.path.join(tempfile.gettempdir(), 'exapi', 'candles'))
+DAY = 24 * 60 * 60 * 1000
+
+TIMEFRAME_UNITS = {
+    's': 1000,
+    'm': 60 * 1000,
+    'h': 60 * 60 * 1000,
+    'd': 24 * 60 * 60 * 1000,
+    'w': 7 * 24 * 60 * 60 * 1000,
+    'M': 30 * 24 * 60 * 60 * 1000,
+    'y': 365 * 24 * 60 * 60 * 1000,
+}
+
+log = logging.getLogger(__name__)
+
+
+def parse_timeframe(interval):
+    '''
+    returns the length of a ccxt timeframe such as '5m' or '1h' in milliseconds
+    '''
+    try:
+        return int(interval[:-1]) * TIMEFRAME_UNITS[interval[-1]]
+    except (KeyError, ValueError):
+        raise ValueError(f'Unknown candle interval {interval!r}')
+
+
+def storable(step):
+    '''
+    whether candles of step ms start at multiples of step from the epoch,
+    so closed ones can be told apart without asking the exchange. True for
+    intervals dividing a day; weeks start on Monday, months are not of a
+    fixed length and multi-day candles are aligned differently per exchange.
+    '''
+    return DAY % step == 0
+
+
+def add_range(ranges, start, end):
+    # merges [start, end) into a sorted list of disjoint [start, end) ranges
+    merged = []
+    for s, e in sorted(ranges + [[start, end]]):
+        if merged and s <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], e)
+        else:
+            merged.append([s, e])
+    return merged
+
+
+def missing_ranges(ranges, start, end):
+    # parts of [start, end) not covered by ranges
+    missing = []
+    for s, e in ranges:
+        if e <= start:
+            continue
+        if s >= end:
+            break
+        if s > start:
+            missing.append([start, s])
+        start = max(start, e)
+    if start < end:
+        missing.append([start, end])
+    return missing
+
+
+class CandleStore(object):
+    '''
+    On-disk OHLCV cache per (exchange, symbol, interval), shared by every
+    process. Closed candles are kept in a (n, 6) float64 .npy file sorted by
+    timestamp and read through a memory map, with the time ranges already
+    fetched recorded next to it. Only the missing ranges are fetched; the
+    open candle is never stored and is fetched on every request.
+    '''
+    def __init__(self, path=CANDLE_DIR):
+        self.path = path
+        self.locks = {}
+        os.makedirs(self.path, exist_ok=True)
+
+    def _base(self, name, symbol, interval):
+        d = os.path.join(self.path, name.lower())
+        os.makedirs(d, exist_ok=True)
+        return os.path.join(d, f'{symbol.replace("/", "-")}-{interval}')
+
+    def _read(self, base):
+        try:
+            with open(base + '.json') as f:
+                ranges = json.load(f)
+            candles = np.load(base + '.npy', mmap_mode='r')
+        except (OSError, ValueError):
+            return [], np.empty((0, 6))
+        return ranges, candles
+
+    def _write(self, base, ranges, candles):
+        # candles first: ranges must never claim data that is not on disk
+        d = os.path.dirname(base)
+        fd, tmp = tempfile.mkstemp(dir=d, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, candles)
+        os.replace(tmp, base + '.npy')
+        fd, tmp = tempfile.mkstemp(dir=d, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(ranges, f)
+        os.replace(tmp, base + '.json')
+
+    @staticmethod
+    def _merge(candles, new):
+        # union by timestamp, new rows replacing stored ones
+        if not len(new):
+            return candles
+        rows = np.concatenate([np.asarray(new, dtype=float), candles])
+        ts, first = np.unique(rows[:, 0], return_index=True)
+        return rows[first]
+
+    def _sync(self, name, symbol, interval, since, until, loader):
+        # fetches the closed candles missing between since and until,
+        # returning every stored candle
+        base = self._base(name, symbol, interval)
+        ranges, candles = self._read(base)
+        if not missing_ranges(ranges, since, until):
+            return candles
+        with self.locks.setdefault(base, Lock()):
+            with open(base + '.lock', 'a') as lockfile:
+                fcntl.flock(lockfile, fcntl.LOCK_EX)
+                try:
+                    # another process may have filled the gaps while we waited
+                    ranges, candles = self._read(base)
+                    missing = missing_ranges(ranges, since, until)
+                    for start, end in missing:
+                        log.debug(f'Fetching {name} {symbol} {interval} candles {start}-{end}')
+                        new = [c for c in loader(start, end) if start <= c[0] < end]
+                        candles = self._merge(candles, new)
+                        ranges = add_range(ranges, start, end)
+                    if missing:
+                        self._write(base, ranges, candles)
+                finally:
+                    fcntl.flock(lockfile, fcntl.LOCK_UN)
+        return candles
+
+    def iter(self, name, symbol, interval, since, loader, now=None, batch=1000):
+        '''
+        yields candles for name/symbol/interval from since (ms) to now as
+        lists of [timestamp, open, high, low, close, volume] rows of up to
+        batch candles, oldest first. loader(since, until) fetches candles
+        from the exchange and is only called for missing closed ranges and
+        for the open candle, which comes last. Intervals that are not
+        storable() are always fetched whole.
+        '''
+        step = parse_timeframe(interval)
+        if not storable(step):
+            candles = loader(since, None)
+            for i in range(0, len(candles), batch):
+                yield candles[i:i + batch]
+            return
+        now = now if now is not None else time() * 1000
+        since = since - since % step
+        open_start = int(now - now % step)
+        candles = self._sync(name, symbol, interval, since, open_start, loader)
+        lo, hi = np.searchsorted(candles[:, 0], [since, open_start])
+        for i in range(lo, hi, batch):
+            yield candles[i:min(i + batch, hi)].tolist()
+        current = [c for c in loader(open_start, None) if c[0] >= open_start]
+        if current:
+            yield current
+
+    def get(self, name, symbol, interval, since, loader, now=None):
+        '''
+        returns the candles of iter() as a (n, 6) array
+        '''
+        rows = [c for part in self.iter(name, symbol, interval, since, loader, now) for c in part]
+        return np.array(rows, dtype=float).reshape(-1, 6)
+
+
+store = CandleStore()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+import asyncio
+import logging
+import ccxt.async_support as ccxt_async
+from .exchange import Exchange, API_RETRIES, retry_policy
+from .circuit import breakers
+from .market_store import store
+from .ratelimit import limiter
+from .orderbook import OrderBook
+from .ccxt_exapi import (build_details, next_page, next_candles, to_history, to_candles, to_balances,
+                         to_order)
+
+log = logging.getLogger(__name__)
+
+
+class AsyncCCXT(Exchange):
+    '''
+    asyncio counterpart of CCXT built on ccxt.async_support.
+    Methods are coroutines returning the same results as their CCXT
+    equivalents; call close() (or use "async with") when done.
+    '''
+
+    def __init__(self, exchange, key=None, secret=None, passphrase=None, exchange_class=None):
+        '''
+        exchange_class replaces the ccxt.async_support class named after
+        exchange, e.g. with tests.mock_exchange.AsyncMockExchange
+        '''
+        super(AsyncCCXT, self).__init__()
+        self.name = exchange
+        self.key = key
+        self.secret = secret
+        self.passphrase = passphrase
+        exchange_class = exchange_class or getattr(ccxt_async, self.name.lower())
+        self.exchange = exchange_class({
+            'apiKey': key,
+            'secret': secret,
+            'password': passphrase,
+            'uid': passphrase,
+            'timeout': 30000,
+            'enableRateLimit': True,
+        })
+        self._snapshot = None
+        self._markets_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.load_markets()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        await self.exchange.close()
+
+    async def _ccxt_query(self, method, *args):
+        log.debug('CCXT async request: %s' % dict(method=method, args=args))
+        breaker = breakers.get(self.exchange.id, method)
+        deadline = retry_policy.deadline()
+        for i in range(API_RETRIES + 1):
+            self._ccxt_allow(self.exchange, method, breaker)
+            reported = False
+            try:
+                t = limiter.reserve_ccxt(self.exchange, method)
+                if t > 0:
+                    await asyncio.sleep(t)
+                try:
+                    call = getattr(self.exchange, method)
+                    result = await call(*args)
+                except Exception as e:
+                    reported = True
+                    delay = self._ccxt_failed(e, breaker, i, deadline)
+                    if delay is None:
+                        return self._ccxt_error(e)
+                else:
+                    reported = True
+                    breaker.success()
+                    return result
+            finally:
+                # a half-open breaker would otherwise wait for this probe
+                # forever, e.g. when the task is cancelled while waiting
+                if not reported:
+                    breaker.release()
+            await asyncio.sleep(delay)
+
+    async def load_markets(self):
+        '''
+        returns markets from the shared market store, fetching them only
+        when the snapshot has expired. The store reads files and takes
+        file locks, so it runs in a worker thread; the fetch itself runs on
+        this event loop while that thread holds the store's refresh lock.
+        '''
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.age >= store.ttl:
+            loop = asyncio.get_running_loop()
+
+            def fetch():
+                return asyncio.run_coroutine_threadsafe(self._ccxt_query('fetch_markets'), loop).result()
+
+            async with self._markets_lock:
+                snapshot = await loop.run_in_executor(None, store.get, self.name, fetch)
+        if snapshot is not self._snapshot:
+            self.exchange.set_markets(snapshot.markets)
+            if 'details' not in snapshot.derived:
+                snapshot.derived['details'] = build_details(self.name, self.exchange.markets)
+            self.details = snapshot.derived['details']
+            self._snapshot = snapshot
+        return self.exchange.markets
+
+    # Public calls
+    async def get_orderbook(self, base='ETH', quote='BTC', limit=100, side=None):
+        if self.exchange.has['fetchL2OrderBook']:
+            symbol = f'{base.upper()}/{quote.upper()}'
+            ret = await self._ccxt_query('fetch_l2_order_book', symbol, limit)
+            if ret:
+                return OrderBook.from_ccxt(ret, side)
+            return None
+        log.debug(f'Method get_orderbook() unavailable for {self.exchange.name}')
+        return []
+
+    async def get_history(self, base='ETH', quote='BTC', limit=50, since=None):
+        now = self.exchange.milliseconds()
+        if not since:
+            since = self.exchange.milliseconds() - 86400000  # -1 day from now
+
+        all_trades = []
+        edge = set()
+        symbol = f'{base.upper()}/{quote.upper()}'
+        while since is not None and since < now:
+            trades = await self._ccxt_query('fetch_trades', symbol, since, limit)
+            if not trades:
+                break
+            trades, since, edge = next_page(trades, since, edge)
+            all_trades += trades
+        return to_history(all_trades)
+
+    async def get_candles(self, base='BTC', quote='USD', interval='1h', since=None, limit=1000):
+        now = self.exchange.milliseconds()
+        if not since:
+            since = self.exchange.milliseconds() - 86400000  # -1 day from now
+
+        all_candles = []
+        if self.exchange.has['fetchOHLCV']:
+            symbol = f'{base.upper()}/{quote.upper()}'
+            while since is not None and since < now:
+                candles = await self._ccxt_query('fetch_ohlcv', symbol, interval, since, limit)
+                candles, since = next_candles(candles, since)
+                all_candles += candles
+        return to_candles(all_candles)
+
+    async def get_markets(self):
+        markets = await self.load_markets()
+        return [symbol for symbol in markets.keys() if '/' in symbol]
+
+    async def get_details(self, base='ETH', quote='BTC'):
+        symbol = f'{base.upper()}/{quote.upper()}'
+        await self.load_markets()
+        return dict(self.details[symbol])
+
+    async def get_all_details(self):
+        await self.load_markets()
+        return self.details
+
+    # Private calls
+    async def get_balances(self):
+        balances = await self._ccxt_query('fetch_balance')
+        if balances:
+            return to_balances(balances)
+        log.debug('Balance query failed.')
+        return None
+
+    async def get_order(self, order_id, base=None, quote=None):
+        symbol = ''
+        if base and quote:
+            symbol = f'{base.upper()}/{quote.upper()}'
+        order = await self._ccxt_query('fetch_order', order_id, symbol)
+        if order:
+            return to_order(order)
+        return None
+
+    async def get_orders(self, base=None, quote=None):
+        orders = []
+        if self.exchange.has['fetchOpenOrders']:
+            if base and quote:
+                symbol = f'{base.upper()}/{quote.upper()}'
+                orders = await self._ccxt_query('fetch_open_orders', symbol)
+            else:
+                orders = await self._ccxt_query('fetch_open_orders')
+        return {order['id']: to_order(order) for order in orders}
+
+    async def order(self, side, amount, price, base='ETH', quote='BTC', type='limit'):
+        symbol = f'{base.upper()}/{quote.upper()}'
+        log.debug(f'Placing order for {symbol}')
+        details = await self.get_details(base=base, quote=quote)
+
+        if price is not None:
+            price = self.exchange.price_to_precision(symbol, price)
+        if 'lot' in details:
+            lot_amount = amount - amount % details['lot']
+            amount = round(lot_amount, 8)
+        amount = self.exchange.amount_to_precision(symbol, amount)
+
+        ret = await self._ccxt_query('create_order', symbol, type, side, amount, price)
+        return ret['id']
+
+    async def cancel(self, order_id=None, base=None, quote=None):
+        symbol = ''
+        if base and quote:
+            symbol = f'{base.upper()}/{quote.upper()}'
+        resp = await self._ccxt_query('cancel_order', order_id, symbol)
+        if not resp:
+            return False
+        return True
@@ -1,22 +1,164 @@
 #!/usr/bin/env python3
+import os
 import logging
-import pandas as pd
+from time import time
+from concurrent.futures import ThreadPoolExecutor
 import ccxt
+from flask_restful import abort
+from werkzeug.exceptions import HTTPException
 from .exchange import Exchange
+from .market_store import store
+from .candle_store import store as candle_store
+from .trade_store import store as trade_store, trade_key
+from .transaction_store import store as tx_store
+from .trade_sync import (store as my_trade_store, account_symbol, fetch_windows,
+                         MAX_WINDOWS, MY_TRADE_WINDOW, MY_TRADE_LOOKBACK)
+from .orderbook import OrderBook
+from .pool import account_id
+from .singleflight import SingleFlight
+from .order_tracker import OrderTracker, now_ms
+from .records import (HISTORY_COLUMNS, CANDLE_COLUMNS, TRADE_COLUMNS, TRANSACTION_COLUMNS,
+                      to_datetime, to_history, to_candles, to_trades, to_transactions)
+
+BATCH_WORKERS = int(os.getenv('EXAPI_BATCH_WORKERS', 8))   # orders submitted at once
+BALANCE_TTL = float(os.getenv('EXAPI_BALANCE_TTL', 1))      # seconds balances are cached
 
 logging.basicConfig(level=logging.DEBUG)
 log = logging.getLogger(__name__)
 
+# threads start on first use, so this is safe to create before uWSGI forks
+batch_pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS)
+
+
+def build_details(name, markets):
+    # Normalized trading rules for every pair, see CCXT.get_details
+    details = {}
+    for symbol, info in markets.items():
+        if '/' not in symbol:
+            continue
+        min_amount = info['limits']['amount']['min']
+        if not min_amount:
+            min_amount = 0
+        min_price = info['limits']['price']['min']
+        if not min_price:
+            min_price = 0
+
+        if name == "CoinbasePro":
+            if info['base'].upper() != 'BTC':
+                min_amount = 1
+
+        min_val = min_amount * min_price
+        d = {
+            'min_amt': min_amount,
+            'max_amt': info['limits']['amount']['max'],
+            'min_price' : min_price,
+            'max_price': info['limits']['price']['max'],
+            'min_val': min_val,
+            'amt_precision': info['precision']['amount'],
+            'price_precision': info['precision']['price'],
+        }
+        if 'lot' in info:
+            d['lot'] = info['lot']
+        if 'cost' in info['limits']:
+            min_value = info['limits']['cost']['min']
+            if min_value:
+                d['min_val'] = min_value
+        details[symbol] = d
+    return details
+
+
+def to_balances(balances):
+    # Using pop() instead of del balances['info'] since not all exchanges return these keys
+    balances.pop('info', None)
+    balances.pop('free', None)
+    balances.pop('used', None)
+    balances.pop('total', None)
+    bals = {}
+    for cur, bal in balances.items():
+        bals[cur] = {
+            'total': bal['total'],
+            'reserved': bal['used'],
+            'available': bal['free'],
+            }
+    return bals
+
+
+def to_error(e):
+    # per-order result for an exception raised while placing an order
+    if isinstance(e, ccxt.BaseError):
+        # the status the API answers this ccxt error with, see Exchange._ccxt_error
+        try:
+            Exchange._ccxt_error(e)
+        except HTTPException as mapped:
+            return {'error': str(e), 'status': mapped.code}
+        return {'error': str(e), 'status': 404}
+    if isinstance(e, HTTPException):
+        if isinstance(e.__context__, ccxt.BaseError):
+            # aborted by _ccxt_query; the exchange's message is more useful
+            return {'error': str(e.__context__), 'status': e.code}
+        message = getattr(e, 'data', {}).get('message') or e.description
+        return {'error': message, 'status': e.code}
+    log.exception('Order failed')
+    return {'error': str(e), 'status': 500}
+
+
+def to_order(order):
+    return {
+        'timestamp': to_datetime(order['timestamp']),
+        'base': order['symbol'].split('/')[0],
+        'quote': order['symbol'].split('/')[1],
+        'side': order['side'],
+        'price': order['price'],
+        'amount': order['amount'],
+        'filled': order['filled'],
+        'unfilled': order['remaining'],
+        'avg_price': order['cost'],
+        'open': order['status'] == 'open',
+        'status': order['status']
+    }
+
+
+def next_page(page, since, edge):
+    '''
+    returns the records of a page fetched from since that the previous
+    page did not return, and the (since, edge) of the next request: edge
+    holds the keys of the records at since, which a page starting there
+    repeats. since is None once paging should stop.
+    '''
+    new = [r for r in page if r['timestamp'] != since or trade_key(r) not in edge]
+    if not new or page[-1]['timestamp'] == since:
+        return new, None, edge
+    since = page[-1]['timestamp']
+    return new, since, {trade_key(r) for r in page if r['timestamp'] == since}
+
+
+def next_candles(candles, since):
+    '''
+    returns the candles of a page fetched from since, without any before
+    it, and the since of the next request, None once paging should stop
+    '''
+    candles = [c for c in candles or [] if c[0] >= since]
+    if not candles:
+        return candles, None
+    # not + the interval: months differ in length
+    return candles, candles[-1][0] + 1
+
 
 class CCXT(Exchange):
 
-    def __init__(self, exchange, key=None, secret=None, passphrase=None):
+    def __init__(self, exchange, key=None, secret=None, passphrase=None, exchange_class=None):
+        '''
+        exchange_class replaces the ccxt class named after exchange, e.g.
+        with tests.mock_exchange.MockExchange
+        '''
         super(CCXT, self).__init__()
         self.name = exchange
         self.key = key
         self.secret = secret
         self.passphrase = passphrase
-        exchange_class = getattr(ccxt, self.name.lower())
+        # keys the account's cached trades and transactions
+        self.account = account_id(exchange, key, secret, passphrase)
+        exchange_class = exchange_class or getattr(ccxt, self.name.lower())
         self.exchange = exchange_class({
             'apiKey': key,
             'secret': secret,
@@ -26,17 +168,44 @@ class CCXT(Exchange):
             'enableRateLimit': True,
             'verbose': True,
         })
-        self._ccxt_query('fetch_markets')
+        self._snapshot = None
+        self.orders_tracker = OrderTracker(self._fetch_open_orders, self._fetch_order)
+        self._balances = None           # (expiry, balances)
+        self._balances_generation = 0   # bumped whenever the account changes
+        self._balances_flight = SingleFlight()
+        self.load_markets()
         log.info(ccxt.__version__)
         log.info(f'{exchange} Instantiated')
 
+    def close(self):
+        '''
+        closes the HTTP session of the ccxt exchange
+        '''
+        session = getattr(self.exchange, 'session', None)
+        if session is not None:
+            session.close()
+
     def _ccxt_query(self, method, *args, **kwargs):
         return super(CCXT, self)._ccxt_query(self.exchange, method, *args, **kwargs)
+
+    def load_markets(self):
+        '''
+        returns markets from the shared market store, which only goes to
+        the exchange when the snapshot has expired
+        '''
+        snapshot = store.get(self.name, lambda: self._ccxt_query('fetch_markets'))
+        if snapshot is not self._snapshot:
+            self.exchange.set_markets(snapshot.markets)
+            if 'details' not in snapshot.derived:
+                snapshot.derived['details'] = build_details(self.name, self.exchange.markets)
+            self.details = snapshot.derived['details']
+            self._snapshot = snapshot
+        return self.exchange.markets
                     
     # Public calls
     def get_orderbook(self, base='ETH', quote='BTC', limit=100, side=None):
         '''
-        returns orderbook as {'bids','asks': (price, amount)}
+        returns an OrderBook of 'bids','asks': (price, amount) arrays
         specify limit/side to limit results.
         side can optionally be 'bids' or 'asks' for only respective book
         '''
@@ -45,14 +214,7 @@ class CCXT(Exchange):
             ret = self._ccxt_query('fetch_l2_order_book', symbol, limit)
 
             if ret:
-                orderbook = {'bids': [], 'asks': []}
-                if side != 'asks':
-                    for bid in ret['bids']:
-                        orderbook['bids'].append((float(bid[0]), float(bid[1])))
-                if side != 'bids':
-                    for ask in ret['asks']:
-                        orderbook['asks'].append((float(ask[0]), float(ask[1])))
-                return orderbook
+                return OrderBook.from_ccxt(ret, side)
             else:
                 return None
         else:
@@ -68,31 +230,65 @@ class CCXT(Exchange):
         if not since:
             since = self.exchange.milliseconds() - 86400000  # -1 day from now
 
-        all_trades = []
         symbol = f'{base.upper()}/{quote.upper()}'
-        while since < now:
-            trades = self._ccxt_query('fetch_trades', symbol, since, limit)
-            if trades and len(trades):
-                if since == trades[-1]['timestamp']:
-                    break
-                since = trades[-1]['timestamp']
-                all_trades += trades
-            else:
+        if since < now - trade_store.retention * 1000:
+            # older than the store keeps, fetch directly
+            return to_history(self._fetch_trades(symbol, since, limit=limit))
+        all_trades = trade_store.get(self.name, symbol, since,
+                                     lambda since, until: self._fetch_trades(symbol, since, until, limit))
+        return to_history(all_trades)
+
+    def _fetch_trades(self, symbol, since, until=None, limit=50):
+        '''
+        pages through fetch_trades from since until the until timestamp (ms)
+        or now, returning trades oldest first
+        '''
+        if until is None:
+            until = self.exchange.milliseconds()
+        return [t for page in self._iter_pages('fetch_trades', (symbol,), since, limit, until) for t in page]
+
+    def _iter_pages(self, method, args, since, limit, until=None, params=None):
+        '''
+        yields successive pages of a ccxt method taking (*args, since, limit),
+        oldest first, without the records repeated at page boundaries.
+        Stops at the until timestamp (ms), or when no new records come back.
+        '''
+        extra = (params,) if params else ()
+        edge = set()
+        while until is None or since is None or since < until:
+            page = self._ccxt_query(method, *args, since, limit, *extra)
+            if not page:
+                break
+            new, since, edge = next_page(page, since, edge)
+            if new:
+                yield new
+            if since is None:
                 break
-        
-        # Reverse so newest first
-        all_trades.reverse()
-        df = pd.DataFrame(all_trades, columns=(
-            'price', 'amount', 'timestamp', 'side', 'type', 'fee',
-            'cost', 'order', 'id'))
-        df.timestamp = pd.to_datetime(df.timestamp, unit='ms', utc=True)
 
-        history = df.to_dict('records')
-        return history
+    def iter_history(self, base='ETH', quote='BTC', limit=50, since=None):
+        '''
+        yields the trades of get_history one at a time, oldest first, as
+        they are read from the trade store or fetched from the exchange
+        '''
+        now = self.exchange.milliseconds()
+        if not since:
+            since = now - 86400000  # -1 day from now
+
+        symbol = f'{base.upper()}/{quote.upper()}'
+        if since < now - trade_store.retention * 1000:
+            pages = self._iter_pages('fetch_trades', (symbol,), since, limit, now)
+        else:
+            trade_store.sync(self.name, symbol, since,
+                             lambda since, until: self._fetch_trades(symbol, since, until, limit))
+            pages = trade_store.iter_read(self.name, symbol, since)
+        for page in pages:
+            for trade in page:
+                yield {k: trade.get(k) for k in HISTORY_COLUMNS}
 
     def get_candles(self, base='BTC', quote='USD', interval='1h', since=None, limit=1000):
         """
-        returns candles oldest to newest
+        returns candles oldest to newest, as a records.Table;
+        use .to_frame() for a pandas DataFrame
         start is optional start datetime
         limit is optional integer limit
         """
@@ -100,34 +296,50 @@ class CCXT(Exchange):
         if not since:
             since = self.exchange.milliseconds() - 86400000  # -1 day from now
 
+        all_candles = []
         if self.exchange.has['fetchOHLCV']:
             symbol = f'{base.upper()}/{quote.upper()}'
-            all_candles = []
-            while since < now:
-                candles = self._ccxt_query('fetch_ohlcv', 
-                                 symbol, 
-                                 interval,
-                                 since,
-                                 limit
-                                 )
-                if candles and len(candles):
-                    if since == candles[-1][0]:
-                        break
-                    since = candles[-1][0]
-                    all_candles += candles
-                else:
-                    break
-
-        c = pd.DataFrame(all_candles, columns=('timestamp', 'open', 'high',
-                                       'low', 'close', 'volume'))
-        c.timestamp = pd.to_datetime(c.timestamp, unit='ms')
-        c = c.set_index('timestamp')
-        c = c.reset_index().drop_duplicates(subset='timestamp', keep='first').set_index('timestamp')
-        return c
+            candles = candle_store.get(self.name, symbol, interval, since,
+                                       lambda since, until: self._fetch_candles(symbol, interval, since, until, limit),
+                                       now=now)
+            all_candles = candles.tolist()
+
+        return to_candles(all_candles)
+
+    def _fetch_candles(self, symbol, interval, since, until=None, limit=1000):
+        '''
+        pages through fetch_ohlcv from since until the until timestamp (ms)
+        or now, returning candles oldest first
+        '''
+        if until is None:
+            until = self.exchange.milliseconds()
+        all_candles = []
+        while since is not None and since < until:
+            candles = self._ccxt_query('fetch_ohlcv', symbol, interval, since, limit)
+            candles, since = next_candles(candles, since)
+            all_candles += candles
+        return all_candles
+
+    def iter_candles(self, base='BTC', quote='USD', interval='1h', since=None, limit=1000):
+        '''
+        yields the candles of get_candles one at a time, oldest first
+        '''
+        if not since:
+            since = self.exchange.milliseconds() - 86400000  # -1 day from now
+        if not self.exchange.has['fetchOHLCV']:
+            return
+        symbol = f'{base.upper()}/{quote.upper()}'
+        pages = candle_store.iter(self.name, symbol, interval, since,
+                                  lambda since, until: self._fetch_candles(symbol, interval, since, until, limit))
+        for page in pages:
+            for candle in page:
+                candle = dict(zip(CANDLE_COLUMNS, candle))
+                candle['timestamp'] = int(candle['timestamp'])
+                yield candle
 
     def get_markets(self):
         # Get pairs
-        markets = self._ccxt_query('load_markets')
+        markets = self.load_markets()
         symbols = [symbol for symbol in markets.keys() if '/' in symbol]
         return symbols
 
@@ -141,212 +353,342 @@ class CCXT(Exchange):
             'price_precision' - the increment in the price
         """
         symbol = f'{base.upper()}/{quote.upper()}'
+        self.load_markets()
+        return dict(self.details[symbol])
 
-        info = self._ccxt_query('load_markets')[symbol]
-
-        details = {}
-        min_amount = info['limits']['amount']['min']
-        if not min_amount:
-            min_amount = 0
-        min_price = info['limits']['price']['min']
-        if not min_price:
-            min_price = 0
-
-        if self.name == "CoinbasePro":
-            if base.upper() != 'BTC':
-                min_amount = 1
-
-        min_val = min_amount * min_price
-        d = {
-            'min_amt': min_amount,
-            'max_amt': info['limits']['amount']['max'],
-            'min_price' : min_price,
-            'max_price': info['limits']['price']['max'],
-            'min_val': min_val,
-            'amt_precision': info['precision']['amount'],
-            'price_precision': info['precision']['price'],
-        }
-        if 'lot' in info:
-            d['lot'] = info['lot']
-        if 'cost' in info['limits']:
-            min_value = info['limits']['cost']['min']
-            if min_value:
-                d['min_val'] = min_value
-        details[quote] = {base: d}
-        return details[quote][base]
+    def get_all_details(self):
+        """
+        Returns {symbol: details} for every pair, see get_details()
+        """
+        self.load_markets()
+        return self.details
 
     # Private calls
-    def get_balances(self):
-        # Fetch balances
+    def _account_changed(self, order_id=None):
+        # after orders were placed or cancelled, cached account state is stale
+        self.orders_tracker.invalidate(order_id)
+        self._balances_generation += 1
+        self._balances = None
+
+    def _fetch_balances(self, generation):
         balances = self._ccxt_query('fetch_balance')
 
         if balances:
-            # Using pop() instead of del balances['info'] since not all exchanges return these keys
-            balances.pop('info', None)
-            balances.pop('free', None)
-            balances.pop('used', None)
-            balances.pop('total', None)
-            bals = {}
-            for cur, bal in balances.items():
-                bals[cur] = {
-                    'total': bal['total'],
-                    'reserved': bal['used'],
-                    'available': bal['free'],
-                    }
-            return bals
+            balances = to_balances(balances)
+            # an order placed while fetching may already have changed them
+            if generation == self._balances_generation:
+                self._balances = (time() + BALANCE_TTL, balances)
+            return balances
         else:  
             log.debug('Balance query failed.')
             return None
 
-    def get_trades(self, base=None, quote=None, limit=1000, since=None):
+    def get_balances(self):
+        '''
+        returns the balances, cached for EXAPI_BALANCE_TTL seconds and until
+        an order is placed or cancelled; concurrent callers share one fetch
+        '''
+        cached = self._balances
+        if cached is not None and cached[0] > time():
+            return cached[1]
+        generation = self._balances_generation
+        return self._balances_flight.do(generation, self._fetch_balances, generation)
+
+    def _fetch_my_trades(self, symbol, since, until, limit=1000):
+        # pages through fetch_my_trades from since to until (ms)
+        params = None
+        if self.name == 'Poloniex':
+            # Poloniex returns nothing without an end, in seconds
+            params = {'end': int(until / 1000)}
+        pages = self._iter_pages('fetch_my_trades', (symbol,), since, limit, until, params)
+        return [t for page in pages for t in page]
+
+    def _sync_trades(self, base, quote, limit, since):
+        '''
+        brings the user's trades in the trade sync store up to date from
+        since (ms, default the last 30 days), fetching gaps as concurrent
+        windows of at most what the exchange accepts. Returns the store's
+        symbol for them and since.
+        '''
         symbol = None
         if base and quote:
             symbol = f'{base.upper()}/{quote.upper()}'
+        if since is None:
+            since = self.exchange.milliseconds() - MY_TRADE_LOOKBACK
+        size = min(MY_TRADE_WINDOW, MAX_WINDOWS.get(self.name, MY_TRADE_WINDOW))
 
-        if self.name == 'Poloniex':
-            # End in seconds 10 days from since
-            days = 10
-            end = int(since/1000) + 24 * 60 * 60 * days
-            params = {'end': end}
-            trades = self._ccxt_query('fetch_my_trades', symbol, since, limit, params)
+        def loader(since, until):
+            fetch = lambda start, end: self._fetch_my_trades(symbol, start, end, limit)
+            return fetch_windows(fetch, since, until or self.exchange.milliseconds(), size)
+
+        stored = account_symbol(self.account, symbol)
+        my_trade_store.sync(self.name, stored, since, loader)
+        return stored, since
+
+    def get_trades(self, base=None, quote=None, limit=1000, since=None):
+        '''
+        returns the user's trades from since (ms, default the last 30 days).
+        They are kept per account in the trade sync store, so only new fills
+        are fetched. limit is the page size of each fetch.
+        '''
+        stored, since = self._sync_trades(base, quote, limit, since)
+        return to_trades(my_trade_store.read(self.name, stored, since)).to_json()
+
+    def _fetch_transactions(self, method, since, limit=1000):
+        # pages through method from since (ms), None for the exchange's default
+        pages = self._iter_pages(method, (None,), since or None, limit)
+        return [{k: tx.get(k) for k in TRANSACTION_COLUMNS} for page in pages for tx in page]
+
+    def _transactions(self, limit, since):
+        '''
+        returns the user's deposits and withdrawals from since (ms), oldest
+        first. They are kept per account in the transaction store, so later
+        calls only fetch past the last one seen (or the oldest still
+        pending); the deposit and withdrawal lists are paged concurrently.
+        '''
+        if self.exchange.has['fetchTransactions']:
+            methods = ['fetch_transactions']
         else:
-            trades = self._ccxt_query('fetch_my_trades', symbol, since, limit)
-            
-        t = pd.DataFrame(
-                trades, 
-                columns=(
-                    'id', 
-                    'timestamp', 
-                    'datetime', 
-                    'symbol', 
-                    'order', 
-                    'type', 
-                    'side', 
-                    'price', 
-                    'amount', 
-                    'cost', 
-                    'fee')
-                )
-
-        t = t.reset_index().drop_duplicates(subset='timestamp', keep='first').set_index('datetime')
-        t = t.sort_index()
-        return t.to_json()
+            methods = ['fetch_deposits', 'fetch_withdrawals']
+        loaders = {method: lambda since, method=method: self._fetch_transactions(method, since, limit)
+                   for method in methods}
+        return tx_store.get(self.name, self.account, since or 0, loaders)
 
     def get_transactions(self, limit=1000, since=None):
+        '''
+        returns the user's deposits and withdrawals from since (ms), keyed
+        by transaction id, see _transactions(). limit is the page size of
+        each fetch.
+        '''
+        return to_transactions(self._transactions(limit, since)).to_json()
 
-        if self.exchange.has['fetchTransactions']:
-            txs = self._ccxt_query('fetch_transactions', None, since, limit)
+    def iter_trades(self, base=None, quote=None, limit=1000, since=None):
+        '''
+        yields the user's trades of get_trades one at a time, oldest first,
+        as they are read from the trade sync store
+        '''
+        stored, since = self._sync_trades(base, quote, limit, since)
+        for page in my_trade_store.iter_read(self.name, stored, since):
+            for trade in page:
+                yield {k: trade.get(k) for k in TRADE_COLUMNS}
 
-        else:
-            txs = []
-            deposits = self._ccxt_query('fetch_deposits', None, since, limit)
-            withdrawals = self._ccxt_query('fetch_withdrawals', None, since, limit)
-            txs += deposits
-            txs += withdrawals             
-
-        t = pd.DataFrame(
-                txs, 
-                columns=(
-                    'id', 
-                    'txid',
-                    'timestamp', 
-                    'datetime', 
-                    'address', 
-                    'tag', 
-                    'type', 
-                    'amount', 
-                    'currency', 
-                    'status', 
-                    'updated', 
-                    'fee')
-                )
-        t.datetime = pd.to_datetime(t.timestamp, unit='ms')
-        t = t.reset_index().drop_duplicates(subset='timestamp', keep='first').set_index('datetime')
-        t = t.sort_index()
-        return t.to_json()
+    def iter_transactions(self, limit=1000, since=None):
+        '''
+        yields the user's deposits and withdrawals of get_transactions one
+        at a time, oldest first
+        '''
+        for tx in self._transactions(limit, since):
+            yield {k: tx.get(k) for k in TRANSACTION_COLUMNS}
 
-    def get_order(self, order_id, base=None, quote=None):
+    def _fetch_open_orders(self, symbol=None):
+        return self._ccxt_query('fetch_open_orders', symbol)
 
-        symbol = ''
+    def _fetch_order(self, order_id, symbol=None):
+        return self._ccxt_query('fetch_order', order_id, symbol or '')
+
+    def get_order(self, order_id, base=None, quote=None):
+        '''
+        returns the order, with as_of (ms) the time it was fetched. Open
+        orders come from the account's order tracker.
+        '''
+        symbol = None
         if base and quote:
             symbol = f'{base.upper()}/{quote.upper()}'
 
-        order = self._ccxt_query('fetch_order', order_id, symbol)
+        if self.exchange.has['fetchOpenOrders']:
+            order, as_of = self.orders_tracker.get(order_id, symbol)
+        else:
+            order, as_of = self._fetch_order(order_id, symbol), now_ms()
 
         if order:
-            o = {
-                'timestamp': pd.to_datetime(order['timestamp'], unit='ms', utc=True),
-                'base': order['symbol'].split('/')[0],
-                'quote': order['symbol'].split('/')[1],
-                'side': order['side'],
-                'price': order['price'],
-                'amount': order['amount'],
-                'filled': order['filled'],
-                'unfilled': order['remaining'],
-                'avg_price': order['cost'],
-                'open': order['status'] == 'open',
-                'status': order['status']
-            }
-            return o
+            return {**to_order(order), 'as_of': as_of}
         else:
             return None
 
     def get_orders(self, base=None, quote=None):
-
-        if self.exchange.has['fetchOpenOrders']:
-            if base and quote:
-                symbol = f'{base.upper()}/{quote.upper()}'
-                orders = self._ccxt_query('fetch_open_orders', symbol)
-            else:
-                orders = self._ccxt_query('fetch_open_orders')
+        '''
+        returns {order id: order} of the open orders from the account's
+        order tracker, each with as_of (ms) the time of the sweep
+        '''
+        if not self.exchange.has['fetchOpenOrders']:
+            return {}
+        symbol = None
+        if base and quote:
+            symbol = f'{base.upper()}/{quote.upper()}'
+        as_of, orders = self.orders_tracker.open_orders(symbol)
 
         open_orders = {}
-        for order in orders:
-            open_orders[order['id']] = {
-                'timestamp': pd.to_datetime(order['timestamp'], unit='ms', utc=True),
-                'base': order['symbol'].split('/')[0],
-                'quote': order['symbol'].split('/')[1],
-                'side': order['side'],
-                'price': order['price'],
-                'amount': order['amount'],
-                'filled': order['filled'],
-                'unfilled': order['remaining'],
-                'avg_price': order['cost'],
-                'open': order['status'] == 'open',
-                'status': order['status']
-            }
+        for order_id, order in orders.items():
+            open_orders[order_id] = {**to_order(order), 'as_of': as_of}
         return open_orders
 
-    def order(self, side, amount, price, base='ETH', quote='BTC',
-        type='limit'):
-        # Place order
+    def _prepare_order(self, side, amount, price, base, quote, type):
+        # rounds an order to the pair's precision; expects load_markets() to have run
         symbol = f'{base.upper()}/{quote.upper()}'
-        log.debug(f'Placing order for {symbol}')
-        self._ccxt_query('load_markets')
-        details = self.get_details(base=base, quote=quote)
-
-        price = self.exchange.price_to_precision(symbol, price)
+        details = self.details.get(symbol)
+        if details is None:
+            abort(400, message=f'Unknown pair {symbol}')
+        if price is not None:
+            price = self.exchange.price_to_precision(symbol, price)
         if 'lot' in details:
             lot_amount = amount - amount % details['lot']
             amount = round(lot_amount, 8)
         amount = self.exchange.amount_to_precision(symbol, amount)
+        return symbol, type, side, amount, price
+
+    def _check_order(self, symbol, type, side, amount, price):
+        # aborts with 400 if a rounded order breaks the pair's trading rules
+        details = self.details[symbol]
+        amount = float(amount)
+        if amount <= 0 or amount < details['min_amt']:
+            abort(400, message=f'Amount {amount} is below the minimum of {details["min_amt"]} for {symbol}')
+        if details['max_amt'] and amount > details['max_amt']:
+            abort(400, message=f'Amount {amount} is above the maximum of {details["max_amt"]} for {symbol}')
+        if type == 'limit':
+            if price is None:
+                abort(400, message='A limit order needs a price')
+            price = float(price)
+            if price <= 0 or price < details['min_price']:
+                abort(400, message=f'Price {price} is below the minimum of {details["min_price"]} for {symbol}')
+            if details['max_price'] and price > details['max_price']:
+                abort(400, message=f'Price {price} is above the maximum of {details["max_price"]} for {symbol}')
+            if amount * price < details['min_val']:
+                abort(400, message=f'Order value {amount * price} is below the minimum of {details["min_val"]} for {symbol}')
 
-        return self._ccxt_query('create_order', symbol, type, 
-                                side, amount, price)['id']
+    def order(self, side, amount, price, base='ETH', quote='BTC',
+        type='limit'):
+        # Place order
+        log.debug(f'Placing order for {base}/{quote}')
+        self.load_markets()
+        order = self._prepare_order(side, amount, price, base, quote, type)
+        try:
+            return self._ccxt_query('create_order', *order)['id']
+        finally:
+            self._account_changed()
 
+    def _submit_order(self, order):
+        try:
+            return {'id': self._ccxt_query('create_order', *order)['id']}
+        except Exception as e:
+            return to_error(e)
+
+    def orders(self, orders):
+        '''
+        places a list of orders, each a dict of order() arguments. Every
+        order is rounded and checked against the pair's trading rules
+        before any is sent; the valid ones are then submitted concurrently.
+        Returns a result per order, in the same order: {'id': order id}
+        or {'error': message, 'status': HTTP status}.
+        '''
+        self.load_markets()
+        results = []
+        for order in orders:
+            try:
+                order = self._prepare_order(order['side'], order['amount'], order.get('price'),
+                                            order.get('base', 'ETH'), order.get('quote', 'BTC'),
+                                            order.get('type', 'limit'))
+                self._check_order(*order)
+            except Exception as e:
+                results.append(to_error(e))
+            else:
+                results.append(batch_pool.submit(self._submit_order, order))
+        log.debug(f'Submitting {sum(1 for r in results if not isinstance(r, dict))} of {len(orders)} orders')
+        results = [r if isinstance(r, dict) else r.result() for r in results]
+        self._account_changed()
+        return results
 
     def cancel(self, order_id=None, base=None, quote=None):
         # If no argument supplied, cancel all orders
+        if order_id is None:
+            return self.cancel_all(base=base, quote=quote)
         symbol = ''
         # Cancel order_id
         if base and quote:
             symbol = f'{base.upper()}/{quote.upper()}'
 
-        resp = self._ccxt_query('cancel_order', order_id, symbol)
+        return self._cancel(order_id, symbol)
+
+    def _cancel(self, order_id, symbol):
+        try:
+            resp = self._ccxt_query('cancel_order', order_id, symbol)
+        finally:
+            self._account_changed(order_id)
         if not resp:
             return False
         return True
 
+    def _cancel_result(self, order_id, symbol):
+        try:
+            return {'id': order_id, 'cancelled': self._cancel(order_id, symbol)}
+        except Exception as e:
+            return {'id': order_id, **to_error(e)}
+
+    def _cancelled_result(self, order_id, symbol):
+        # whether an order that is no longer open was cancelled rather than filled
+        try:
+            if not self.exchange.has['fetchOrder']:
+                return {'id': order_id, 'cancelled': True}
+            order = self._fetch_order(order_id, symbol)
+            return {'id': order_id, 'cancelled': bool(order) and order['status'] == 'canceled'}
+        except Exception as e:
+            return {'id': order_id, **to_error(e)}
+
+    def _cancel_all_orders(self, order_ids, symbol):
+        # the exchange's cancel-all for symbol. Orders the response does not
+        # report on are checked: those still open were not cancelled and the
+        # others are fetched, since they may have been filled instead
+        log.debug(f'Cancelling {len(order_ids)} {symbol} orders at once')
+        try:
+            resp = self._ccxt_query('cancel_all_orders', symbol)
+        except Exception as e:
+            return [{'id': order_id, **to_error(e)} for order_id in order_ids]
+        finally:
+            self._account_changed()
+        results = {}
+        if isinstance(resp, list):
+            for o in resp:
+                if isinstance(o, dict) and o.get('status') and o.get('id') in order_ids:
+                    results[o['id']] = {'id': o['id'], 'cancelled': o['status'] == 'canceled'}
+        unknown = [order_id for order_id in order_ids if order_id not in results]
+        if unknown:
+            try:
+                still_open = {o['id'] for o in self._ccxt_query('fetch_open_orders', symbol)}
+            except Exception as e:
+                results.update((order_id, {'id': order_id, **to_error(e)}) for order_id in unknown)
+            else:
+                futures = {}
+                for order_id in unknown:
+                    if order_id in still_open:
+                        results[order_id] = {'id': order_id, 'cancelled': False}
+                    else:
+                        futures[order_id] = batch_pool.submit(self._cancelled_result, order_id, symbol)
+                results.update((order_id, f.result()) for order_id, f in futures.items())
+        return [results[order_id] for order_id in order_ids]
+
+    def cancel_all(self, order_ids=None, base=None, quote=None):
+        '''
+        cancels order_ids, or every open order (of base/quote if given),
+        returning [{'id': order id, 'cancelled': bool}] with 'error' and
+        'status' instead of 'cancelled' for orders that failed. Open orders
+        are listed once; with a pair and no ids the exchange's own
+        cancel-all is used where it has one, otherwise the orders are
+        cancelled concurrently.
+        '''
+        symbol = ''
+        if base and quote:
+            symbol = f'{base.upper()}/{quote.upper()}'
+        if order_ids is None:
+            if not self.exchange.has['fetchOpenOrders']:
+                abort(501, message=f'{self.name} cannot list open orders, pass the order ids')
+            orders = [(o['id'], o['symbol']) for o in self._ccxt_query('fetch_open_orders', symbol or None)]
+            if symbol and orders and self.exchange.has.get('cancelAllOrders'):
+                return self._cancel_all_orders([order_id for order_id, _ in orders], symbol)
+        else:
+            orders = [(order_id, symbol) for order_id in order_ids]
+        log.debug(f'Cancelling {len(orders)} orders')
+        futures = [batch_pool.submit(self._cancel_result, order_id, s) for order_id, s in orders]
+        return [f.result() for f in futures]
+
     def test_trading_enabled(self): 
         """
         Verify if trading is enabled for user API Key
@@ -359,7 +701,7 @@ class CCXT(Exchange):
         price = self.get_orderbook(base=base, quote=quote, limit=10, side='bids')['bids'][0][0]
         price = price * 0.7
 
-        self._ccxt_query('load_markets')
+        self.load_markets()
         price = self.exchange.price_to_precision(symbol, price)
         
         try:
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+import logging
+import random
+from threading import Lock
+from time import time
+
+FAILURE_THRESHOLD = 5   # consecutive failures before a breaker opens
+RESET_TIMEOUT = 30      # seconds a breaker stays open before probing
+HALF_OPEN_PROBES = 1    # concurrent calls allowed while probing
+REQUEST_BUDGET = 10     # seconds a request may spend waiting to retry
+BACKOFF_BASE = 0.5      # seconds
+BACKOFF_MAX = 4         # seconds
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+log = logging.getLogger(__name__)
+
+
+class CircuitBreaker(object):
+    '''
+    Opens after threshold consecutive failures and rejects calls for
+    reset_timeout seconds. It then lets up to probes calls through: a
+    success closes it again, a failure re-opens it.
+    Every call allowed by allow() must report success() or failure(), or
+    release() if it ended without reaching the exchange.
+    '''
+    def __init__(self, name, threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT,
+                 probes=HALF_OPEN_PROBES):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.probes = probes
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = None
+        self.probing = 0
+        self.lock = Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time() - self.opened < self.reset_timeout:
+                    return False
+                log.info(f'{self.name} circuit half open')
+                self.state = HALF_OPEN
+                self.probing = 0
+            if self.probing < self.probes:
+                self.probing += 1
+                return True
+            return False
+
+    def release(self):
+        # gives back a probe that reported no outcome
+        with self.lock:
+            if self.state == HALF_OPEN and self.probing > 0:
+                self.probing -= 1
+
+    def success(self):
+        with self.lock:
+            if self.state != CLOSED:
+                log.info(f'{self.name} circuit closed')
+            self.state = CLOSED
+            self.failures = 0
+            self.probing = 0
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.threshold:
+                if self.state != OPEN:
+                    log.warning(f'{self.name} circuit open after {self.failures} failures')
+                self.state = OPEN
+                self.opened = time()
+                self.probing = 0
+
+    def status(self):
+        status = {'state': self.state, 'failures': self.failures}
+        if self.state == OPEN:
+            status['retry_in'] = max(0, self.opened + self.reset_timeout - time())
+        return status
+
+
+class CircuitBreakers(object):
+    '''
+    One CircuitBreaker per (exchange, method)
+    '''
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.breakers = {}
+        self.lock = Lock()
+
+    def get(self, exchange, method):
+        key = f'{exchange}.{method}'
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            with self.lock:
+                breaker = self.breakers.setdefault(key, CircuitBreaker(key, **self.kwargs))
+        return breaker
+
+    def states(self):
+        with self.lock:
+            breakers = list(self.breakers.items())
+        return {key: breaker.status() for key, breaker in breakers}
+
+
+class RetryPolicy(object):
+    '''
+    Exponential backoff with full jitter, limited to retries attempts and
+    to budget seconds for the whole request.
+    '''
+    def __init__(self, retries=3, base=BACKOFF_BASE, cap=BACKOFF_MAX, budget=REQUEST_BUDGET):
+        self.retries = retries
+        self.base = base
+        self.cap = cap
+        self.budget = budget
+
+    def deadline(self):
+        return time() + self.budget
+
+    def backoff(self, attempt, deadline=None):
+        '''
+        returns seconds to wait before retry number attempt + 1, or None
+        if no more retries are allowed
+        '''
+        if attempt >= self.retries:
+            return None
+        delay = random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+        if deadline is not None and time() + delay > deadline:
+            return None
+        return delay
+
+
+breakers = CircuitBreakers()
@@ -1,22 +1,21 @@
 import logging
 import http
 import werkzeug
-from threading import Lock
 from requests import Session, adapters
 from requests.exceptions import ReadTimeout
 from flask_restful import abort
-from time import time, sleep
+from time import sleep
 import ccxt
 
 from .exceptions import *
+from .ratelimit import limiter
+from .circuit import breakers, RetryPolicy
 
-GRACE_TIME = 5 # Seconds to sleep on exception
 API_RETRIES = 3  # Times to retry query before giving up
+retry_policy = RetryPolicy(retries=API_RETRIES)
 
 class Exchange(object):
     _initialized = False
-    _req = 0
-    _reqtime = 0
     
     # default values
     _reqinterval = 1    # seconds
@@ -31,7 +30,6 @@ class Exchange(object):
             adapter = adapters.HTTPAdapter(max_retries=5)
             cls._session.mount('http://', adapter)
             cls._session.mount('https://', adapter)
-            cls._reqlock = Lock()
             cls._initialized = True
             cls.logger.debug('Initializing ' + cls.__name__)
         
@@ -45,17 +43,7 @@ class Exchange(object):
     @classmethod
     def _query(cls, method, url, *args, **kwargs):
         # may be worth error handling here - retry / temp blacklist
-        with cls._reqlock:
-            # throttle
-            t = cls._reqtime - time()
-            if (t > 0 and cls._req == cls._reqlimit):
-                cls.logger.info('reqlimit hit. sleeping %.2fs' % t)
-                sleep(t)
-            # new interval
-            if cls._reqtime <= time():
-                cls._reqtime = time() + cls._reqinterval
-                cls._req = 0
-            cls._req += 1
+        limiter.wait((cls.__name__,), cls._reqlimit / cls._reqinterval, capacity=cls._reqlimit)
         cls.logger.debug('request: %s' % dict(
             method=method, url=url, args=args, kwargs=kwargs))
         kwargs['timeout'] = cls._reqtimeout
@@ -86,55 +74,80 @@ class Exchange(object):
 
     @classmethod
     def _ccxt_query(cls, exchange, method, *args):
-        # may be worth error handling here - retry / temp blacklist
-        with cls._reqlock:
-            # throttle
-            t = cls._reqtime - time()
-            if (t > 0 and cls._req == cls._reqlimit):
-                cls.logger.info('reqlimit hit. sleeping %.2fs' % t)
-                sleep(t)
-            # new interval
-            if cls._reqtime <= time():
-                cls._reqtime = time() + cls._reqinterval
-                cls._req = 0
-            cls._req += 1
         cls.logger.debug('CCXT request: %s' % dict(
             method=method, args=args))
+        breaker = breakers.get(exchange.id, method)
+        deadline = retry_policy.deadline()
         for i in range(API_RETRIES + 1):
+            cls._ccxt_allow(exchange, method, breaker)
+            reported = False
             try:
-                call = getattr(exchange, method)
-                return call(*args)
-            except ccxt.OrderNotFound:
-                return False  
-            except ccxt.InvalidOrder:
-                abort(400)             
-            except ccxt.AuthenticationError:
-                abort(403)
-            except ccxt.PermissionDenied:
-                abort(403)
-            except ccxt.InvalidNonce:
-                abort(503)
-            except ccxt.ExchangeError:
-                abort(404)
-            except ccxt.NetworkError:
-                if i == API_RETRIES:
-                    abort(503)
-                sleep(GRACE_TIME)
-            except http.client.RemoteDisconnected:
-                if i == API_RETRIES:
-                    abort(503)
-                sleep(GRACE_TIME)
-            except ccxt.ExchangeNotAvailable:
-                if i == API_RETRIES:
-                    abort(503)
-                sleep(GRACE_TIME)  
-            except werkzeug.exceptions.ServiceUnavailable:
-                if i == API_RETRIES:
-                    abort(503)
-                sleep(GRACE_TIME)       
-            except Exception as e:
-                cls.logger.debug(e)
-                abort(503)
+                limiter.wait_ccxt(exchange, method)
+                try:
+                    call = getattr(exchange, method)
+                    result = call(*args)
+                except Exception as e:
+                    reported = True
+                    delay = cls._ccxt_failed(e, breaker, i, deadline)
+                    if delay is None:
+                        return cls._ccxt_error(e)
+                else:
+                    reported = True
+                    breaker.success()
+                    return result
+            finally:
+                # a half-open breaker would otherwise wait for this probe forever
+                if not reported:
+                    breaker.release()
+            sleep(delay)
+
+    @staticmethod
+    def _ccxt_allow(exchange, method, breaker):
+        # fail fast while the exchange is known to be down
+        if not breaker.allow():
+            abort(503, message=f'{exchange.id} {method} is unavailable, retry later')
+
+    @classmethod
+    def _ccxt_failed(cls, e, breaker, attempt, deadline):
+        '''
+        records the outcome of a failed ccxt call and returns seconds to
+        wait before retrying, or None to give up
+        '''
+        if not cls._ccxt_retryable(e):
+            # the exchange answered, it just didn't like the request
+            breaker.success()
+            return None
+        breaker.failure()
+        return retry_policy.backoff(attempt, deadline)
+
+    @staticmethod
+    def _ccxt_retryable(e):
+        # InvalidNonce is a NetworkError but retrying with the same nonce won't help
+        if isinstance(e, ccxt.InvalidNonce):
+            return False
+        return isinstance(e, (ccxt.NetworkError,
+                              http.client.RemoteDisconnected,
+                              werkzeug.exceptions.ServiceUnavailable))
+
+    @classmethod
+    def _ccxt_error(cls, e):
+        '''
+        maps an exception raised by a ccxt call to the API response:
+        False for a missing order, otherwise aborts with an HTTP status
+        '''
+        if isinstance(e, ccxt.OrderNotFound):
+            return False
+        if isinstance(e, ccxt.InvalidOrder):
+            abort(400)
+        if isinstance(e, (ccxt.AuthenticationError, ccxt.PermissionDenied)):
+            abort(403)
+        if isinstance(e, ccxt.InvalidNonce):
+            abort(503)
+        if isinstance(e, ccxt.ExchangeError):
+            abort(404)
+        if not cls._ccxt_retryable(e):
+            cls.logger.debug(e)
+        abort(503)
 
     @staticmethod
     def trunc(v, d=8):
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+import os
+import json
+import fcntl
+import logging
+import tempfile
+from threading import Lock
+from time import time
+
+MARKET_DIR = os.getenv('EXAPI_MARKET_DIR', os.path.join(tempfile.gettempdir(), 'exapi', 'markets'))
+MARKET_TTL = int(os.getenv('EXAPI_MARKET_TTL', 3600))  # seconds
+
+log = logging.getLogger(__name__)
+
+
+class Snapshot(object):
+    def __init__(self, markets, timestamp):
+        self.markets = markets
+        self.timestamp = timestamp
+        # values computed from markets, kept for the lifetime of the snapshot
+        self.derived = {}
+
+    @property
+    def age(self):
+        return time() - self.timestamp
+
+
+class MarketStore(object):
+    '''
+    Market metadata snapshots shared by every process and CCXT instance.
+    Each exchange has one JSON snapshot on disk; the file mtime is the
+    time the markets were fetched. When a snapshot expires, one process
+    refreshes it under an exclusive file lock and the others read its result.
+    '''
+    def __init__(self, path=MARKET_DIR, ttl=MARKET_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.locks = {}
+        self.snapshots = {}
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file(self, name):
+        return os.path.join(self.path, f'{name.lower()}.json')
+
+    def _read(self, name):
+        filename = self._file(name)
+        try:
+            mtime = os.stat(filename).st_mtime
+            snapshot = self.snapshots.get(name)
+            if snapshot and snapshot.timestamp >= mtime:
+                return snapshot
+            with open(filename) as f:
+                snapshot = Snapshot(json.load(f), mtime)
+        except (OSError, ValueError) as e:
+            log.debug(f'No market snapshot for {name}: {e}')
+            return self.snapshots.get(name)
+        self.snapshots[name] = snapshot
+        return snapshot
+
+    def _write(self, name, markets):
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(markets, f)
+            os.replace(tmp, self._file(name))
+        except Exception:
+            os.unlink(tmp)
+            raise
+        snapshot = Snapshot(markets, os.stat(self._file(name)).st_mtime)
+        self.snapshots[name] = snapshot
+        return snapshot
+
+    def peek(self, name):
+        '''
+        returns the current snapshot for name if it has not expired, else None
+        '''
+        snapshot = self.snapshots.get(name)
+        if snapshot and snapshot.age < self.ttl:
+            return snapshot
+        snapshot = self._read(name)
+        if snapshot and snapshot.age < self.ttl:
+            return snapshot
+        return None
+
+    def put(self, name, markets):
+        with open(self._file(name) + '.lock', 'a') as lockfile:
+            fcntl.flock(lockfile, fcntl.LOCK_EX)
+            try:
+                return self._write(name, markets)
+            finally:
+                fcntl.flock(lockfile, fcntl.LOCK_UN)
+
+    def get(self, name, loader):
+        '''
+        returns the snapshot for name, calling loader() to fetch markets
+        when it has expired. Only one caller across all processes runs the
+        loader; a stale snapshot is returned if the loader fails.
+        '''
+        snapshot = self.peek(name)
+        if snapshot:
+            return snapshot
+        with self.locks.setdefault(name, Lock()):
+            snapshot = self.peek(name)
+            if snapshot:
+                return snapshot
+            with open(self._file(name) + '.lock', 'a') as lockfile:
+                fcntl.flock(lockfile, fcntl.LOCK_EX)
+                try:
+                    # another process may have refreshed while we waited
+                    snapshot = self.peek(name)
+                    if snapshot:
+                        return snapshot
+                    log.info(f'Refreshing {name} markets')
+                    try:
+                        markets = loader()
+                        if not markets:
+                            raise ValueError('empty markets')
+                    except Exception as e:
+                        stale = self.snapshots.get(name)
+                        if stale is None:
+                            raise
+                        log.warning(f'Using stale {name} markets ({stale.age:.0f}s): {e!r}')
+                        return stale
+                    return self._write(name, markets)
+                finally:
+                    fcntl.flock(lockfile, fcntl.LOCK_UN)
+
+    def ages(self):
+        '''
+        returns {name: seconds since the markets were fetched} for every snapshot on disk
+        '''
+        now = time()
+        ages = {}
+        for filename in os.listdir(self.path):
+            if filename.endswith('.json'):
+                try:
+                    ages[filename[:-5]] = now - os.stat(os.path.join(self.path, filename)).st_mtime
+                except OSError:
+                    pass
+        return ages
+
+
+store = MarketStore()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+import os
+import logging
+from collections import OrderedDict
+from threading import Lock
+from time import time
+from .singleflight import SingleFlight
+
+ORDER_REFRESH = float(os.getenv('EXAPI_ORDER_REFRESH', 2))  # seconds between open order sweeps
+CLOSED_ORDERS = 1000                                        # closed orders remembered per account
+FINAL_STATUSES = ('closed', 'canceled', 'cancelled', 'expired', 'rejected')
+
+log = logging.getLogger(__name__)
+
+
+def now_ms():
+    return int(time() * 1000)
+
+
+class OrderTracker(object):
+    '''
+    Orders of one account. The open orders are listed with one
+    fetch_open(symbol) sweep per refresh seconds, however many of them are
+    polled; an order missing from the last sweep is fetched alone with
+    fetch_one(order_id, symbol), and remembered once closed. Results come
+    with as_of, the time in ms at which they were fetched.
+    '''
+    def __init__(self, fetch_open, fetch_one, refresh=ORDER_REFRESH, closed_limit=CLOSED_ORDERS):
+        self.fetch_open = fetch_open
+        self.fetch_one = fetch_one
+        self.refresh = refresh
+        self.closed_limit = closed_limit
+        self.sweeps = {}                # symbol or None: (as_of, {order id: order})
+        self.closed = OrderedDict()     # order id: (order, as_of)
+        self.lock = Lock()
+        self.flight = SingleFlight()
+
+    def _sweep(self, symbol):
+        as_of = now_ms()
+        orders = {order['id']: order for order in self.fetch_open(symbol)}
+        log.debug(f'Swept {len(orders)} open orders for {symbol or "all pairs"}')
+        with self.lock:
+            self.sweeps[symbol] = (as_of, orders)
+        return as_of, orders
+
+    def _fresh(self, symbol):
+        # the last sweep of symbol, or of every pair, if it is recent enough
+        now = now_ms()
+        for key in ((symbol, None) if symbol else (None,)):
+            sweep = self.sweeps.get(key)
+            if sweep is not None and now - sweep[0] < self.refresh * 1000:
+                as_of, orders = sweep
+                if key != symbol:
+                    orders = {i: o for i, o in orders.items() if o.get('symbol') == symbol}
+                return as_of, orders
+        return None
+
+    def open_orders(self, symbol=None):
+        '''
+        returns (as_of, {order id: order}) for the open orders, of symbol if given
+        '''
+        return self._fresh(symbol) or self.flight.do(symbol, self._sweep, symbol)
+
+    def get(self, order_id, symbol=None):
+        '''
+        returns (order, as_of) for order_id; order is whatever fetch_one
+        returned if the order is not open
+        '''
+        with self.lock:
+            if order_id in self.closed:
+                return self.closed[order_id]
+        as_of, orders = self.open_orders(symbol)
+        if order_id in orders:
+            return orders[order_id], as_of
+        # closed since the sweep, or placed after it
+        as_of = now_ms()
+        order = self.fetch_one(order_id, symbol)
+        if order:
+            self._remember(order, as_of)
+        return order, as_of
+
+    def _remember(self, order, as_of):
+        with self.lock:
+            if order.get('status') in FINAL_STATUSES:
+                self.closed[order['id']] = (order, as_of)
+                while len(self.closed) > self.closed_limit:
+                    self.closed.popitem(last=False)
+                return
+            # open: add it to the sweeps it belongs to until they are redone
+            for key, (swept, orders) in list(self.sweeps.items()):
+                if key is None or key == order.get('symbol'):
+                    self.sweeps[key] = (swept, {**orders, order['id']: order})
+
+    def invalidate(self, order_id=None):
+        '''
+        forgets the open orders, and order_id if given, after this account
+        placed or cancelled orders
+        '''
+        with self.lock:
+            self.sweeps.clear()
+            self.closed.pop(order_id, None)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+import numpy as np
+
+
+def _levels(levels):
+    # (n, 2) float array of (price, amount); ccxt levels may carry extra fields
+    a = np.array(levels, dtype=float)
+    if not len(a):
+        return np.empty((0, 2))
+    return a[:, :2]
+
+
+class OrderBook(object):
+    '''
+    Order book with each side stored as an (n, 2) float array of
+    (price, amount), best price first.
+    ob['bids'][0][0] is the best bid, as with the old dict of tuples.
+    '''
+    sides = ('bids', 'asks')
+
+    def __init__(self, bids=None, asks=None):
+        self.bids = bids if bids is not None else np.empty((0, 2))
+        self.asks = asks if asks is not None else np.empty((0, 2))
+
+    @classmethod
+    def from_ccxt(cls, ret, side=None):
+        '''
+        builds an OrderBook from a ccxt order book, keeping only side if given
+        '''
+        bids = _levels(ret['bids']) if side != 'asks' else None
+        asks = _levels(ret['asks']) if side != 'bids' else None
+        return cls(bids, asks)
+
+    def __repr__(self):
+        return f'OrderBook({len(self.bids)} bids, {len(self.asks)} asks)'
+
+    def __getitem__(self, side):
+        if side not in self.sides:
+            raise KeyError(side)
+        return getattr(self, side)
+
+    def side(self, side, depth=None):
+        '''
+        returns the (price, amount) array of side, limited to depth levels
+        '''
+        return self[side][:depth]
+
+    def head(self, depth):
+        '''
+        returns an OrderBook of the first depth levels of each side, without copying
+        '''
+        return OrderBook(self.bids[:depth], self.asks[:depth])
+
+    def best_bid(self):
+        return float(self.bids[0, 0])
+
+    def best_ask(self):
+        return float(self.asks[0, 0])
+
+    def to_dict(self):
+        '''
+        returns {'bids', 'asks': [[price, amount], ...]}
+        '''
+        return {'bids': self.bids.tolist(), 'asks': self.asks.tolist()}
+
+    def mid(self):
+        return (self.best_bid() + self.best_ask()) / 2
+
+    def impact(self, side, amount=None, notional=None):
+        '''
+        walks the book for a market order: side 'buy' takes asks and
+        'sell' takes bids, for amount of base or notional of quote currency.
+        returns the fillable amount, its cost, the VWAP, the worst price
+        reached and the slippage of the VWAP versus mid in basis points.
+        '''
+        levels = self.asks if side == 'buy' else self.bids
+        prices, sizes = levels[:, 0], levels[:, 1]
+        cum_amount = np.cumsum(sizes)
+        cum_cost = np.cumsum(prices * sizes)
+        if amount is not None:
+            requested, cum = amount, cum_amount
+        else:
+            requested, cum = notional, cum_cost
+        if not len(levels) or requested <= 0:
+            filled = cost = 0.0
+            vwap = worst = None
+        else:
+            # index of the level the order finishes in
+            i = min(int(np.searchsorted(cum, requested)), len(levels) - 1)
+            prev_amount = cum_amount[i - 1] if i else 0.0
+            prev_cost = cum_cost[i - 1] if i else 0.0
+            if amount is not None:
+                filled = float(min(amount, cum_amount[-1]))
+                cost = float(prev_cost + (filled - prev_amount) * prices[i])
+            else:
+                cost = float(min(notional, cum_cost[-1]))
+                filled = float(prev_amount + (cost - prev_cost) / prices[i])
+            if filled > 0:
+                vwap = cost / filled
+                worst = float(prices[i])
+            else:
+                # only empty levels to take
+                vwap = worst = None
+        result = {
+            'side': side,
+            'filled': filled,
+            'cost': cost,
+            'vwap': vwap,
+            'worst_price': worst,
+            'complete': bool(len(levels)) and requested <= float(cum[-1]),
+            'mid': None,
+            'slippage_bps': None,
+        }
+        if len(self.bids) and len(self.asks):
+            mid = self.mid()
+            result['mid'] = mid
+            if vwap is not None:
+                sign = 1 if side == 'buy' else -1
+                result['slippage_bps'] = sign * (vwap - mid) / mid * 10000
+        return result
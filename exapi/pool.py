@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+import os
+import hashlib
+import logging
+from collections import OrderedDict
+from threading import Lock
+from time import time
+from .singleflight import SingleFlight
+
+POOL_SIZE = int(os.getenv('EXAPI_POOL_SIZE', 256))              # instances per process
+POOL_IDLE_TIME = int(os.getenv('EXAPI_POOL_IDLE_TIME', 900))    # seconds
+
+log = logging.getLogger(__name__)
+
+
+def credential_key(exchange, key, secret, passphrase=None):
+    # the secret is hashed so it is not kept in the pool's keys
+    digest = hashlib.sha256(f'{secret}\0{passphrase}'.encode()).hexdigest()
+    return (exchange, key, digest)
+
+
+def account_id(exchange, key, secret, passphrase=None):
+    '''
+    a digest of every credential of an account, for keying per-account
+    caches: a request with the right key but a wrong secret gets another
+    id, so it never reads the account's cached data
+    '''
+    credentials = credential_key(exchange, key, secret, passphrase)
+    return hashlib.sha256('\0'.join(map(str, credentials)).encode()).hexdigest()[:32]
+
+
+class _Entry(object):
+    def __init__(self, instance):
+        self.instance = instance
+        self.leases = 0
+        self.last_used = time()
+        self.evicted = False
+
+
+class Lease(object):
+    '''
+    Use of a pooled instance; the instance is not closed while a lease on
+    it is held. Use "with lease as ex:" or call release().
+    '''
+    def __init__(self, pool, entry):
+        self.pool = pool
+        self.entry = entry
+        self.released = False
+
+    @property
+    def instance(self):
+        return self.entry.instance
+
+    def retain(self):
+        '''
+        returns another lease on the same instance, e.g. for a streamed response
+        '''
+        with self.pool.lock:
+            return self.pool._acquire(self.entry)
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.pool._release(self.entry)
+
+    def __enter__(self):
+        return self.entry.instance
+
+    def __exit__(self, *args):
+        self.release()
+
+
+class InstancePool(object):
+    '''
+    LRU of exchange instances keyed by exchange and credentials, holding at
+    most size instances and dropping those unused for idle_time seconds.
+    factory(exchange, key, secret, passphrase) creates an instance; it is
+    closed once evicted and no longer leased.
+    '''
+    def __init__(self, factory, size=POOL_SIZE, idle_time=POOL_IDLE_TIME):
+        self.factory = factory
+        self.size = size
+        self.idle_time = idle_time
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def lease(self, exchange, key, secret, passphrase=None):
+        '''
+        returns a Lease on the instance for these credentials, creating it if needed
+        '''
+        pkey = credential_key(exchange, key, secret, passphrase)
+        lease = None
+        with self.lock:
+            closing = self._expire()
+            entry = self.entries.get(pkey)
+            if entry is not None:
+                self.hits += 1
+                self.entries.move_to_end(pkey)
+                lease = self._acquire(entry)
+            else:
+                self.misses += 1
+        self._close(closing)
+        if lease is not None:
+            return lease
+        # instances for different credentials are created concurrently
+        entry = self.flight.do(pkey, self._create, pkey, exchange, key, secret, passphrase)
+        with self.lock:
+            if not entry.evicted:
+                return self._acquire(entry)
+        # evicted before we could lease it
+        return self.lease(exchange, key, secret, passphrase)
+
+    def _create(self, pkey, exchange, key, secret, passphrase):
+        log.debug(f'Creating {exchange} instance for {key}')
+        entry = _Entry(self.factory(exchange, key, secret, passphrase))
+        closing = []
+        with self.lock:
+            self.entries[pkey] = entry
+            closing += self._expire()
+            while len(self.entries) > self.size:
+                _, old = self.entries.popitem(last=False)
+                self.evictions += 1
+                closing += self._evict(old)
+        self._close(closing)
+        return entry
+
+    def _acquire(self, entry):
+        # called with self.lock held
+        entry.leases += 1
+        entry.last_used = time()
+        return Lease(self, entry)
+
+    def _release(self, entry):
+        with self.lock:
+            entry.leases -= 1
+            entry.last_used = time()
+            closing = [entry] if entry.evicted and entry.leases == 0 else []
+        self._close(closing)
+
+    def _evict(self, entry):
+        # marks an entry removed from entries; returns it if it can be closed now
+        entry.evicted = True
+        return [entry] if entry.leases == 0 else []
+
+    def _expire(self):
+        # removes entries idle for idle_time, least recently used first
+        closing = []
+        now = time()
+        while self.entries:
+            pkey, entry = next(iter(self.entries.items()))
+            if entry.leases or now - entry.last_used < self.idle_time:
+                break
+            del self.entries[pkey]
+            self.expirations += 1
+            closing += self._evict(entry)
+        return closing
+
+    def _close(self, entries):
+        for entry in entries:
+            close = getattr(entry.instance, 'close', None)
+            if close is not None:
+                try:
+                    close()
+                except Exception as e:
+                    log.warning(f'Closing pooled instance failed: {e!r}')
+
+    def sweep(self):
+        '''
+        evicts idle instances now rather than on the next miss
+        '''
+        with self.lock:
+            closing = self._expire()
+        self._close(closing)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'leased': sum(1 for entry in self.entries.values() if entry.leases),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+import os
+import fcntl
+import struct
+import hashlib
+import logging
+import tempfile
+from threading import Lock
+from time import time, sleep
+
+RATE_SHARED = os.getenv('EXAPI_RATE_SHARED', '0') != '0'
+RATE_DIR = os.getenv('EXAPI_RATE_DIR', os.path.join(tempfile.gettempdir(), 'exapi', 'ratelimit'))
+RATE_BUCKETS = int(os.getenv('EXAPI_RATE_BUCKETS', 1024))   # buckets kept before idle ones are dropped
+
+# Relative cost of ccxt methods, in requests. Anything not listed costs 1.
+METHOD_COSTS = {
+    'fetch_markets': 5,
+    'fetch_balance': 2,
+    'fetch_open_orders': 3,
+    'fetch_my_trades': 2,
+    'fetch_transactions': 2,
+    'fetch_deposits': 2,
+    'fetch_withdrawals': 2,
+}
+# buckets of ccxt calls hold at least this, so a call on an idle bucket never waits
+MAX_COST = max(METHOD_COSTS.values())
+
+# Methods limited per API key rather than per exchange
+PRIVATE_METHODS = {
+    'fetch_balance', 'fetch_my_trades', 'fetch_order', 'fetch_orders',
+    'fetch_open_orders', 'fetch_closed_orders', 'create_order', 'cancel_order',
+    'cancel_all_orders', 'fetch_transactions', 'fetch_deposits',
+    'fetch_withdrawals', 'withdraw',
+}
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket(object):
+    '''
+    rate tokens per second, up to capacity. reserve() takes tokens
+    immediately, letting the balance go negative, and returns how many
+    seconds the caller has to wait; callers are served in order.
+    '''
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time()
+        self.lock = Lock()
+
+    def _take(self, cost):
+        now = time()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= cost
+        if self.tokens >= 0:
+            return 0
+        return -self.tokens / self.rate
+
+    def reserve(self, cost=1):
+        with self.lock:
+            return self._take(cost)
+
+    def full(self, now):
+        # whether the bucket has refilled, so a new one would behave the same
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class SharedTokenBucket(TokenBucket):
+    '''
+    TokenBucket kept in a file, so that every process on the host draws
+    from the same bucket. The file is opened for each reservation, so
+    buckets of idle accounts do not hold file descriptors.
+    '''
+    state = struct.Struct('<dd')  # tokens, updated
+
+    def __init__(self, path, rate, capacity=None):
+        super(SharedTokenBucket, self).__init__(rate, capacity)
+        self.path = path
+
+    def reserve(self, cost=1):
+        with self.lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX)
+                data = os.pread(fd, self.state.size, 0)
+                if len(data) == self.state.size:
+                    self.tokens, self.updated = self.state.unpack(data)
+                wait = self._take(cost)
+                os.pwrite(fd, self.state.pack(self.tokens, self.updated), 0)
+                return wait
+            finally:
+                # closing releases the lock
+                os.close(fd)
+
+
+class RateLimiter(object):
+    '''
+    Token buckets per exchange for public calls and per (exchange, API key)
+    for private calls. Waits happen outside of any lock, so a busy bucket
+    only delays callers of that bucket. With shared=True the buckets are
+    coordinated across processes through files in path. Once there are
+    more than max_buckets, buckets that have refilled are dropped.
+    '''
+    def __init__(self, shared=RATE_SHARED, path=RATE_DIR, max_buckets=RATE_BUCKETS):
+        self.shared = shared
+        self.path = path
+        self.max_buckets = max_buckets
+        self.sweep_at = max_buckets
+        self.buckets = {}
+        self.lock = Lock()
+        if shared:
+            os.makedirs(path, exist_ok=True)
+
+    def bucket(self, key, rate, capacity=None):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            with self.lock:
+                bucket = self.buckets.get(key)
+                if bucket is None:
+                    if len(self.buckets) >= self.sweep_at:
+                        self._sweep()
+                    if self.shared:
+                        name = hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+                        bucket = SharedTokenBucket(os.path.join(self.path, name), rate, capacity)
+                    else:
+                        bucket = TokenBucket(rate, capacity)
+                    self.buckets[key] = bucket
+        return bucket
+
+    def _sweep(self):
+        # called with self.lock held; a dropped bucket is recreated full,
+        # which is the state it was in
+        now = time()
+        for key in [key for key, bucket in self.buckets.items() if bucket.full(now)]:
+            del self.buckets[key]
+        # sweep again once the buckets kept have doubled
+        self.sweep_at = max(self.max_buckets, 2 * len(self.buckets))
+
+    def reserve(self, key, rate, capacity=None, cost=1):
+        '''
+        returns seconds to wait before making a request of cost to key
+        '''
+        return self.bucket(key, rate, capacity).reserve(cost)
+
+    def wait(self, key, rate, capacity=None, cost=1):
+        t = self.reserve(key, rate, capacity, cost)
+        if t > 0:
+            log.info('ratelimit hit for %s. sleeping %.2fs' % (key[0], t))
+            sleep(t)
+
+    @staticmethod
+    def ccxt_bucket(exchange, method):
+        # key, rate, capacity and cost for a call to a ccxt exchange instance
+        if method in PRIVATE_METHODS:
+            key = (exchange.id, exchange.apiKey)
+        else:
+            key = (exchange.id, None)
+        rate = 1000 / (exchange.rateLimit or 1000)
+        return key, rate, max(MAX_COST, rate), METHOD_COSTS.get(method, 1)
+
+    def reserve_ccxt(self, exchange, method):
+        key, rate, capacity, cost = self.ccxt_bucket(exchange, method)
+        return self.reserve(key, rate, capacity, cost)
+
+    def wait_ccxt(self, exchange, method):
+        key, rate, capacity, cost = self.ccxt_bucket(exchange, method)
+        self.wait(key, rate, capacity, cost)
+
+
+limiter = RateLimiter()
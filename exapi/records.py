@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+import json
+from json.encoder import encode_basestring_ascii
+from datetime import datetime, timezone
+import numpy as np
+
+HISTORY_COLUMNS = ('price', 'amount', 'timestamp', 'side', 'type', 'fee', 'cost', 'order', 'id')
+CANDLE_COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+TRADE_COLUMNS = ('id', 'timestamp', 'datetime', 'symbol', 'order', 'type', 'side',
+                 'price', 'amount', 'cost', 'fee')
+TRANSACTION_COLUMNS = ('id', 'txid', 'timestamp', 'datetime', 'address', 'tag', 'type',
+                       'amount', 'currency', 'status', 'updated', 'fee')
+
+
+def to_datetime(ms):
+    '''
+    returns the UTC datetime of a timestamp in milliseconds, or None
+    '''
+    if ms is None:
+        return None
+    return datetime.fromtimestamp(ms / 1000, timezone.utc)
+
+
+def tx_key(tx):
+    # identity of a transaction; ccxt leaves id empty on a few exchanges
+    if tx.get('id') is not None:
+        return str(tx['id'])
+    return json.dumps([tx.get('type'), tx.get('txid'), tx.get('timestamp'), tx.get('currency'),
+                       tx.get('amount')])
+
+
+def dedupe(records, key='timestamp'):
+    '''
+    returns records without those repeating an earlier record's key
+    '''
+    seen = set()
+    unique = []
+    for record in records:
+        if record.get(key) not in seen:
+            seen.add(record.get(key))
+            unique.append(record)
+    return unique
+
+
+def format_float(v):
+    # a float as pandas' to_json writes it, with 10 decimals
+    if v != v or v in (float('inf'), float('-inf')):
+        return 'null'
+    if v == 0:
+        return '0.0'
+    m = abs(v)
+    if m > 1e16 or m < 1e-15:
+        return '%.10g' % v
+    whole = int(m)
+    tmp = (m - whole) * 1e10
+    frac = int(tmp)
+    diff = tmp - frac
+    if abs(diff - 0.5) >= 1e-4:
+        # away from a rounding tie, '%.10f' rounds the same way
+        f = ('%.10f' % v).rstrip('0')
+        return f + '0' if f[-1] == '.' else f
+    if diff > 0.5 or (diff == 0.5 and (frac == 0 or frac & 1)):
+        frac += 1
+        if frac >= 10 ** 10:
+            frac = 0
+            whole += 1
+    s = f'{whole}.{frac:010d}'.rstrip('0') if frac else f'{whole}.0'
+    return '-' + s if v < 0 else s
+
+
+def encode_str(s):
+    # pandas also escapes forward slashes
+    s = encode_basestring_ascii(s)
+    return s.replace('/', '\\/') if '/' in s else s
+
+
+def format_floats(values):
+    '''
+    format_float for a list of numbers and None. Values are formatted with
+    '%.10f', which agrees with pandas except when the 11th decimal is close
+    to a rounding tie; those few go through format_float.
+    '''
+    a = np.array([np.nan if v is None else v for v in values], dtype=float)
+    with np.errstate(invalid='ignore'):
+        m = np.abs(a)
+        tmp = (m - np.floor(m)) * 1e10
+        diff = tmp - np.floor(tmp)
+        slow = ~np.isfinite(a) | (m > 1e16) | (m < 1e-15) | (np.abs(diff - 0.5) < 1e-4)
+    out = []
+    for v, is_slow in zip(a.tolist(), slow.tolist()):
+        if is_slow:
+            out.append(format_float(v))
+        else:
+            f = '%.10f' % v
+            f = f.rstrip('0')
+            out.append(f + '0' if f[-1] == '.' else f)
+    return out
+
+
+def encode_column(values):
+    # JSON for each value of a column, choosing the encoding once
+    if is_float_column(values):
+        return format_floats(values)
+    if all(v is None or type(v) is str for v in values):
+        return ['null' if v is None else encode_str(v) for v in values]
+    return [encode(v) for v in values]
+
+
+def encode(obj):
+    '''
+    JSON for obj as pandas' to_json writes it
+    '''
+    t = type(obj)
+    if t is str:
+        return encode_str(obj)
+    if t is float:
+        return format_float(obj)
+    if obj is None:
+        return 'null'
+    if t is bool:
+        return 'true' if obj else 'false'
+    if t is int:
+        return str(obj)
+    if isinstance(obj, dict):
+        return '{' + ','.join([f'{encode_str(str(k))}:{encode(v)}' for k, v in obj.items()]) + '}'
+    if isinstance(obj, (list, tuple)):
+        return '[' + ','.join([encode(v) for v in obj]) + ']'
+    if isinstance(obj, float):
+        return format_float(float(obj))
+    if isinstance(obj, int):
+        return str(int(obj))
+    return encode_str(str(obj))
+
+
+def is_float_column(values):
+    # pandas stores numbers as float64 when a column mixes them with floats or None
+    types = set(map(type, values))
+    numbers = types - {type(None)}
+    if not numbers or not numbers <= {int, float}:
+        return False
+    return numbers != {int} or type(None) in types
+
+
+class Table(object):
+    '''
+    Columns of values keyed by an index, the subset of a pandas DataFrame
+    the API uses. to_json() writes what DataFrame.to_json() did and
+    to_frame() builds the DataFrame itself, importing pandas only then.
+    The index and ms_columns hold epoch-ms timestamps standing for datetimes.
+    '''
+    def __init__(self, columns, index_name, index, ms_index=False, ms_columns=()):
+        self.columns = columns      # {name: [values]}, in column order
+        self.index_name = index_name
+        self.index = index
+        self.ms_index = ms_index
+        self.ms_columns = ms_columns
+
+    def __len__(self):
+        return len(self.index)
+
+    def to_json(self):
+        # keys are always strings; pandas writes a missing one as NaT or NaN
+        if self.ms_index:
+            keys = ['"null"' if k is None else f'"{int(k)}"' for k in self.index]
+        else:
+            keys = ['"nan"' if k is None else encode_str(str(k)) for k in self.index]
+        parts = []
+        for column, values in self.columns.items():
+            if column in self.ms_columns:
+                encoded = ['null' if v is None else str(int(v)) for v in values]
+            else:
+                encoded = encode_column(values)
+            body = ','.join([f'{k}:{v}' for k, v in zip(keys, encoded)])
+            parts.append(f'{encode_str(column)}:{{{body}}}')
+        return '{' + ','.join(parts) + '}'
+
+    def to_frame(self):
+        import pandas as pd
+        index = pd.Index(self.index, name=self.index_name)
+        if self.ms_index:
+            index = pd.DatetimeIndex(pd.to_datetime(index, unit='ms'), name=self.index_name)
+        frame = pd.DataFrame(self.columns, columns=list(self.columns), index=index)
+        for column in self.ms_columns:
+            frame[column] = pd.to_datetime(frame[column], unit='ms')
+        return frame
+
+
+def unique_positions(keys):
+    # positions of the first occurrence of each key
+    seen = set()
+    positions = []
+    for i, k in enumerate(keys):
+        if k not in seen:
+            seen.add(k)
+            positions.append(i)
+    return positions
+
+
+def to_table(records, columns, index, ms_index=False, key=None, unique='timestamp', order=None):
+    '''
+    Table of records indexed by the index column (or by the key column
+    when index is derived from it), deduplicated on the unique column and
+    sorted by the index (or by the order column), with each record's
+    original position in an 'index' column:
+    DataFrame(records).reset_index().drop_duplicates(unique).set_index(index).sort_index()
+    '''
+    key = key or index
+    values = {c: [r.get(c) for r in records] for c in columns}
+    keep = unique_positions(values[unique])
+    # pandas sorts missing values last
+    keys = values[key]
+    by = values[order or key]
+    keep.sort(key=lambda i: (by[i] is None, by[i] if by[i] is not None else 0))
+    table = {'index': keep}
+    table.update((c, [values[c][i] for i in keep]) for c in columns if c != index)
+    return Table(table, index, [keys[i] for i in keep], ms_index)
+
+
+def to_history(all_trades):
+    '''
+    trades newest first, limited to HISTORY_COLUMNS, with datetime timestamps
+    '''
+    history = []
+    for trade in reversed(all_trades):
+        record = {c: trade.get(c) for c in HISTORY_COLUMNS}
+        record['timestamp'] = to_datetime(record['timestamp'])
+        history.append(record)
+    return history
+
+
+def to_candles(all_candles):
+    '''
+    Table of [timestamp, open, high, low, close, volume] candles indexed by
+    timestamp, keeping the first candle of each timestamp
+    '''
+    keep = unique_positions([c[0] for c in all_candles])
+    columns = {name: [all_candles[i][n] for i in keep] for n, name in enumerate(CANDLE_COLUMNS)}
+    return Table(columns, 'timestamp', columns.pop('timestamp'), ms_index=True)
+
+
+def to_trades(trades):
+    return to_table(trades, TRADE_COLUMNS, 'datetime')
+
+
+def to_transactions(txs):
+    # indexed and deduplicated on id, oldest first: a deposit and a
+    # withdrawal can share a timestamp. Transactions without an id are
+    # keyed by tx_key, as in the transaction store, so they stay apart.
+    # datetime is rebuilt from timestamp.
+    txs = [tx if tx.get('id') is not None else dict(tx, id=tx_key(tx)) for tx in txs]
+    table = to_table(txs, TRANSACTION_COLUMNS, 'id', unique='id', order='timestamp')
+    table.columns['datetime'] = list(table.columns['timestamp'])
+    table.ms_columns = ('datetime',)
+    return table
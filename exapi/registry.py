@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Lock
+from time import time
+
+log = logging.getLogger(__name__)
+
+
+class ExchangeSlots(dict):
+    '''
+    Instances of one exchange keyed by API key.
+    The 'PUBLIC' instance is created by factory() on first use.
+    '''
+    def __init__(self, factory):
+        super(ExchangeSlots, self).__init__()
+        self.factory = factory
+        self.lock = Lock()
+
+    def __missing__(self, key):
+        if key != 'PUBLIC':
+            raise KeyError(key)
+        with self.lock:
+            if not dict.__contains__(self, key):
+                self[key] = self.factory()
+            return dict.__getitem__(self, key)
+
+
+class ExchangeRegistry(dict):
+    '''
+    {exchange name: {'PUBLIC' or API key: instance}}
+    Exchanges are created lazily; warmup() creates them all concurrently.
+    '''
+    def __init__(self):
+        super(ExchangeRegistry, self).__init__()
+        self.startup_times = {}
+        self.startup_errors = {}
+        if hasattr(os, 'register_at_fork'):
+            # a warmup still running in the parent must not leave locks held in workers
+            os.register_at_fork(after_in_child=self._reset_locks)
+
+    def register(self, name, factory):
+        self[name] = ExchangeSlots(lambda: self._create(name, factory))
+
+    def _create(self, name, factory):
+        start = time()
+        try:
+            ex = factory()
+        except BaseException as e:
+            self.startup_errors[name] = repr(e)
+            raise
+        else:
+            self.startup_errors.pop(name, None)
+            return ex
+        finally:
+            self.startup_times[name] = time() - start
+            log.info(f'{name} startup took {self.startup_times[name]:.2f}s')
+
+    def _reset_locks(self):
+        for slots in self.values():
+            if isinstance(slots, ExchangeSlots):
+                slots.lock = Lock()
+
+    def warmup(self, deadline=30):
+        '''
+        creates the public instance of every registered exchange concurrently.
+        Each exchange gets deadline seconds; returns the names that were not
+        ready in time (they keep loading in the background) or failed.
+        '''
+        names = [name for name, slots in self.items() if isinstance(slots, ExchangeSlots)]
+        pool = ThreadPoolExecutor(max_workers=len(names) or 1)
+        futures = {pool.submit(self[name].__getitem__, 'PUBLIC'): name for name in names}
+        done, pending = wait(futures, timeout=deadline)
+        pool.shutdown(wait=False)
+        failed = [futures[f] for f in done if f.exception() is not None]
+        late = [futures[f] for f in pending]
+        for name in failed:
+            log.warning(f'{name} warmup failed: {self.startup_errors.get(name)}')
+        for name in late:
+            log.warning(f'{name} not ready after {deadline}s')
+        return sorted(failed + late)
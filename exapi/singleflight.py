@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+from threading import Event, Lock
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    '''
+    Runs at most one call per key at a time. Callers asking for a key that
+    is already in flight wait for that call and share its result.
+    '''
+    def __init__(self):
+        self.lock = Lock()
+        self.calls = {}
+
+    def _begin(self, key):
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                return call, False
+            call = self.calls[key] = _Call()
+            return call, True
+
+    def _run(self, key, call, fn, args, kwargs):
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def do(self, key, fn, *args, **kwargs):
+        '''
+        returns fn(*args, **kwargs), or the result of the call for key already in flight
+        '''
+        call, leader = self._begin(key)
+        if leader:
+            self._run(key, call, fn, args, kwargs)
+        else:
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def submit(self, executor, key, fn, *args, **kwargs):
+        '''
+        runs fn in executor unless a call for key is already in flight; doesn't wait
+        '''
+        call, leader = self._begin(key)
+        if leader:
+            executor.submit(self._run, key, call, fn, args, kwargs)
+
+    def in_flight(self, key):
+        return key in self.calls
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+'''
+Offline benchmark of the exchange calls against tests.mock_exchange:
+latency percentiles, throughput and upstream calls per call at each
+concurrency level, written as JSON so runs can be compared. Run with
+python exapi/tests/bench.py [--latency 0.02] [--concurrency 1 8 32] [--out run.json] [--compare old.json]
+'''
+import sys
+sys.path.insert(0, '/')
+import os
+import json
+import logging
+import argparse
+import platform
+import tempfile
+from time import perf_counter, time
+from concurrent.futures import ThreadPoolExecutor
+
+# every store starts empty and private to this run
+for var in ('EXAPI_MARKET_DIR', 'EXAPI_TRADE_DIR', 'EXAPI_CANDLE_DIR', 'EXAPI_MY_TRADE_DIR', 'EXAPI_TX_DIR'):
+    os.environ[var] = tempfile.mkdtemp(prefix='exapi-bench-')
+os.environ['EXAPI_PRICE_BACKEND'] = 'memory'
+os.environ['EXAPI_PRICE_REFRESH_AHEAD'] = '0'
+
+import ccxt
+import exapi
+from exapi.tests.mock_exchange import MockExchange, symbols
+sys.path.insert(0, os.path.join(os.path.dirname(exapi.__file__), 'web'))
+from price_cacher import PriceCacher
+
+
+def percentile(values, p):
+    # values sorted ascending
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def pair(i, pairs):
+    return symbols(pairs)[i % pairs].split('/')
+
+
+def cases(ex, cacher, pairs):
+    # name -> call(i)
+    # order prices come straight from the mock, so that timed orders make no other calls
+    now = ex.exchange.milliseconds()
+    prices = [ex.exchange.mid(symbol, now) * 0.9 for symbol in symbols(pairs)]
+    return {
+        'get_orderbook': lambda i: ex.get_orderbook(*pair(i, pairs), limit=100),
+        'get_history': lambda i: ex.get_history(*pair(i, pairs)),
+        'get_candles': lambda i: ex.get_candles(*pair(i, pairs), interval='1h'),
+        'get_details': lambda i: ex.get_details(*pair(i, pairs)),
+        'order': lambda i: ex.order('buy', 1, prices[i % pairs], *pair(i, pairs)),
+        'PriceCacher.get_price': lambda i: cacher.get_price('Mock', *pair(i, pairs)),
+    }
+
+
+def run(fn, concurrency, calls):
+    latencies = []
+    errors = []
+
+    def timed(i):
+        start = perf_counter()
+        try:
+            fn(i)
+        except Exception as e:
+            errors.append(repr(e))
+        latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(calls)))
+    seconds = perf_counter() - start
+    latencies.sort()
+    return {
+        'calls': calls,
+        'errors': len(errors),
+        'seconds': round(seconds, 4),
+        'throughput': round(calls / seconds, 1),
+        'mean_ms': round(sum(latencies) / calls * 1000, 3),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def compare(results, old):
+    # throughput and median latency of this run relative to old
+    before = {(r['name'], r['concurrency']): r for r in old['results']}
+    print(f'{"call":24} {"threads":>7} {"throughput":>12} {"p50":>12}', file=sys.stderr)
+    for r in results['results']:
+        o = before.get((r['name'], r['concurrency']))
+        if o is None:
+            continue
+        speed = r['throughput'] / o['throughput'] if o['throughput'] else float('nan')
+        p50 = r['p50_ms'] / o['p50_ms'] if o['p50_ms'] else float('nan')
+        print(f'{r["name"]:24} {r["concurrency"]:7} {speed:11.2f}x {p50:11.2f}x', file=sys.stderr)
+
+
+def main(args):
+    MockExchange.latency = args.latency
+    MockExchange.error_rate = args.error_rate
+    MockExchange.seed = args.seed
+    MockExchange.pairs = args.pairs
+    ex = exapi.CCXT('Mock', exchange_class=MockExchange)
+    exapi.exs.register('Mock', lambda: ex)
+    cacher = PriceCacher()
+    results = {
+        'meta': {
+            'time': int(time()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'ccxt': ccxt.__version__,
+            'latency': args.latency,
+            'error_rate': args.error_rate,
+            'seed': args.seed,
+            'pairs': args.pairs,
+        },
+        'results': [],
+    }
+    for name, fn in cases(ex, cacher, args.pairs).items():
+        if args.only and name not in args.only:
+            continue
+        for concurrency in args.concurrency:
+            upstream = ex.exchange.calls
+            result = run(fn, concurrency, args.calls)
+            result = {'name': name, 'concurrency': concurrency, **result,
+                      'upstream_calls': ex.exchange.calls - upstream}
+            print(f'{name:24} {concurrency:3} threads {result["throughput"]:10.1f}/s '
+                  f'p50 {result["p50_ms"]:8.3f} ms p99 {result["p99_ms"]:8.3f} ms', file=sys.stderr)
+            results['results'].append(result)
+    out = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(out)
+    else:
+        print(out)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per mock exchange call')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of mock calls failing')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pairs', type=int, default=20)
+    parser.add_argument('--calls', type=int, default=200, help='calls per benchmark')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--only', nargs='+', help='names of the calls to run')
+    parser.add_argument('--out', help='write the JSON results here instead of stdout')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+    logging.disable(logging.CRITICAL)
+    main(parser.parse_args())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+'''
+Compares exapi.records with the pandas code it replaced: import time in a
+fresh interpreter, then time per call for each transform. Run with
+python exapi/tests/bench_records.py [rows ...]
+'''
+import sys
+sys.path.insert(0, '/')
+import random
+import subprocess
+from timeit import timeit
+import pandas as pd
+from exapi import records
+
+
+def import_time(module):
+    # seconds to import module, and whether that loaded pandas
+    code = (f'import sys, time; sys.path.insert(0, "/"); t = time.perf_counter(); import {module}; '
+            f'print(time.perf_counter() - t, "pandas" in sys.modules)')
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    seconds, pandas_loaded = out.stdout.split()
+    return float(seconds), pandas_loaded == 'True'
+
+
+def make_trades(n):
+    start = 1546300800000
+    return [{'id': str(i), 'timestamp': start + i * 1000,
+             'datetime': records.to_datetime(start + i * 1000).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+             'symbol': 'ETH/BTC', 'order': None, 'type': 'limit', 'side': random.choice(['buy', 'sell']),
+             'price': random.uniform(0.03, 0.04), 'amount': random.uniform(0, 10), 'cost': None,
+             'fee': {'cost': random.random(), 'currency': 'BNB'}}
+            for i in range(n)]
+
+
+def make_txs(n):
+    return [{'id': str(i), 'txid': f'0x{i:x}', 'timestamp': 1546300800000 + i * 1000, 'datetime': None,
+             'address': 'addr', 'tag': None, 'type': 'deposit', 'amount': random.uniform(0, 10),
+             'currency': 'BTC', 'status': 'ok', 'updated': None, 'fee': None}
+            for i in range(n)]
+
+
+def make_candles(n):
+    return [[1546300800000 + i * 60000] + [random.uniform(1, 2) for _ in range(5)] for i in range(n)]
+
+
+# the pandas implementations records replaces
+
+def pandas_history(all_trades):
+    df = pd.DataFrame(list(reversed(all_trades)), columns=records.HISTORY_COLUMNS)
+    df.timestamp = pd.to_datetime(df.timestamp, unit='ms', utc=True)
+    return df.to_dict('records')
+
+
+def pandas_candles(all_candles):
+    c = pd.DataFrame(all_candles, columns=records.CANDLE_COLUMNS)
+    c.timestamp = pd.to_datetime(c.timestamp, unit='ms')
+    c = c.set_index('timestamp')
+    c = c.reset_index().drop_duplicates(subset='timestamp', keep='first').set_index('timestamp')
+    return c.to_json()
+
+
+def pandas_trades(trades):
+    t = pd.DataFrame(trades, columns=records.TRADE_COLUMNS)
+    t = t.reset_index().drop_duplicates(subset='timestamp', keep='first').set_index('datetime')
+    return t.sort_index().to_json()
+
+
+def pandas_transactions(txs):
+    t = pd.DataFrame(txs, columns=records.TRANSACTION_COLUMNS)
+    # transactions without an id are keyed as the transaction store keys them
+    t['id'] = [records.tx_key(tx) if tx.get('id') is None else tx['id'] for tx in txs]
+    t.datetime = pd.to_datetime(t.timestamp, unit='ms')
+    t = t.reset_index().drop_duplicates(subset='id', keep='first')
+    return t.sort_values('timestamp', kind='stable').set_index('id').to_json()
+
+
+def bench(rows):
+    trades, txs, candles = make_trades(rows), make_txs(rows), make_candles(rows)
+    cases = [
+        ('history', lambda: pandas_history(trades), lambda: records.to_history(trades)),
+        ('candles', lambda: pandas_candles(candles), lambda: records.to_candles(candles).to_json()),
+        ('trades', lambda: pandas_trades(trades), lambda: records.to_trades(trades).to_json()),
+        ('transactions', lambda: pandas_transactions(txs), lambda: records.to_transactions(txs).to_json()),
+    ]
+    print(f'\nper call, {rows} rows      pandas    records')
+    for name, old, new in cases:
+        if name != 'history':
+            assert old() == new(), f'{name} output differs'
+        number = max(5, 20000 // rows)
+        t_old = timeit(old, number=number) / number * 1000
+        t_new = timeit(new, number=number) / number * 1000
+        print(f'{name:20} {t_old:8.2f} ms {t_new:8.2f} ms')
+
+
+def main(sizes):
+    for module in ('pandas', 'exapi.records', 'exapi'):
+        seconds, pandas_loaded = import_time(module)
+        print(f'import {module:14} {seconds * 1000:8.1f} ms  (pandas loaded: {pandas_loaded})')
+    for rows in sizes:
+        bench(rows)
+
+
+if __name__ == '__main__':
+    main([int(n) for n in sys.argv[1:]] or [50, 500, 2000])
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+'''
+A ccxt exchange serving synthetic, deterministic markets, order books,
+trades and OHLCV, for running CCXT offline:
+
+    CCXT('Mock', exchange_class=MockExchange)
+    AsyncCCXT('Mock', exchange_class=AsyncMockExchange)
+
+Options, passed through the ccxt config dict or set as class attributes:
+latency (seconds per call), error_rate (share of calls raising
+ccxt.NetworkError), seed, pairs (number of markets) and now (a fixed
+time in ms; the real time when None).
+'''
+import math
+import asyncio
+import random
+import hashlib
+from itertools import count
+from threading import Lock
+from time import sleep
+import ccxt
+import ccxt.async_support as ccxt_async
+
+QUOTES = ('BTC', 'USD')
+TIMEFRAMES = {'1m': 60000, '5m': 300000, '15m': 900000, '1h': 3600000, '4h': 14400000, '1d': 86400000}
+DESCRIPTION = {
+    'id': 'mock',
+    'name': 'Mock',
+    'rateLimit': 1,
+    'precisionMode': ccxt.DECIMAL_PLACES,
+    'timeframes': {k: k for k in TIMEFRAMES},
+    'has': {
+        'fetchL2OrderBook': True, 'fetchOHLCV': True, 'fetchTrades': True, 'fetchMyTrades': True,
+        'fetchOrder': True, 'fetchOpenOrders': True, 'cancelAllOrders': False,
+        'fetchTransactions': False, 'fetchDeposits': True, 'fetchWithdrawals': True,
+    },
+}
+# the MockExchange methods AsyncMockExchange serves as coroutines
+CALLS = ('fetch_markets', 'fetch_l2_order_book', 'fetch_order_book', 'fetch_trades', 'fetch_ohlcv',
+         'fetch_balance', 'create_order', 'fetch_order', 'cancel_order', 'fetch_open_orders',
+         'fetch_my_trades', 'fetch_deposits', 'fetch_withdrawals')
+
+
+def symbols(pairs):
+    # the synthetic markets: C000/BTC, C001/USD, C002/BTC, ...
+    return [f'C{i:03d}/{QUOTES[i % len(QUOTES)]}' for i in range(pairs)]
+
+
+class MockExchange(ccxt.Exchange):
+    latency = 0.0
+    error_rate = 0.0
+    seed = 0
+    pairs = 20
+    now = None
+    trade_interval = 60000  # ms between synthetic trades
+    depth = 100             # order book levels per side
+
+    def describe(self):
+        return self.deep_extend(super(MockExchange, self).describe(), DESCRIPTION)
+
+    def __init__(self, config={}):
+        super(MockExchange, self).__init__(config)
+        self.lock = Lock()
+        self.errors = random.Random(self.seed)
+        self.order_ids = count(1)
+        self.mock_orders = {}
+        self.calls = 0
+
+    def milliseconds(self):
+        return self.now if self.now is not None else super(MockExchange, self).milliseconds()
+
+    def _rng(self, *key):
+        # a random generator determined by seed and key
+        digest = hashlib.sha256(repr((self.seed,) + key).encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], 'big'))
+
+    def _call(self):
+        # the cost of a request: latency, and failing at error_rate
+        with self.lock:
+            self.calls += 1
+            fail = self.error_rate and self.errors.random() < self.error_rate
+        if self.latency:
+            sleep(self.latency)
+        if fail:
+            raise ccxt.NetworkError(f'{self.id} mock network error')
+
+    def mid(self, symbol, timestamp):
+        '''
+        the price of symbol at timestamp (ms): a daily cycle around a
+        level set by the symbol, with noise
+        '''
+        level = 1 + self._rng(symbol).random() * 100
+        cycle = math.sin(2 * math.pi * timestamp / 86400000)
+        return level * (1 + 0.05 * cycle + 0.001 * self._rng(symbol, timestamp).gauss(0, 1))
+
+    # Public calls
+
+    def fetch_markets(self, params={}):
+        self._call()
+        markets = []
+        for symbol in symbols(self.pairs):
+            base, quote = symbol.split('/')
+            markets.append({
+                'id': symbol.replace('/', ''), 'symbol': symbol, 'base': base, 'quote': quote,
+                'baseId': base, 'quoteId': quote, 'active': True, 'type': 'spot', 'spot': True,
+                'margin': False, 'swap': False, 'future': False, 'option': False, 'contract': False,
+                'settle': None, 'settleId': None, 'linear': None, 'inverse': None,
+                'taker': 0.001, 'maker': 0.001,
+                'precision': {'amount': 3, 'price': 6},
+                'limits': {'amount': {'min': 0.001, 'max': 100000}, 'price': {'min': 0.000001, 'max': None},
+                           'cost': {'min': 0.0001, 'max': None}},
+                'info': {},
+            })
+        return markets
+
+    def fetch_l2_order_book(self, symbol, limit=None, params={}):
+        self._call()
+        now = self.milliseconds()
+        mid = self.mid(symbol, now - now % 1000)
+        rng = self._rng(symbol, 'book', now // 1000)
+        levels = min(limit or self.depth, self.depth)
+        bids = [[mid * (1 - 0.0005 * (i + 1)), rng.uniform(0.1, 10)] for i in range(levels)]
+        asks = [[mid * (1 + 0.0005 * (i + 1)), rng.uniform(0.1, 10)] for i in range(levels)]
+        return {'bids': bids, 'asks': asks, 'timestamp': now, 'datetime': self.iso8601(now), 'nonce': None}
+
+    def fetch_order_book(self, symbol, limit=None, params={}):
+        return self.fetch_l2_order_book(symbol, limit, params)
+
+    def _trade(self, symbol, timestamp):
+        rng = self._rng(symbol, 'trade', timestamp)
+        price = self.mid(symbol, timestamp)
+        amount = rng.uniform(0.01, 5)
+        return {'id': str(timestamp), 'timestamp': timestamp, 'datetime': self.iso8601(timestamp),
+                'symbol': symbol, 'order': None, 'type': 'limit', 'side': rng.choice(['buy', 'sell']),
+                'takerOrMaker': None, 'price': price, 'amount': amount, 'cost': price * amount,
+                'fee': None, 'info': {}}
+
+    def fetch_trades(self, symbol, since=None, limit=None, params={}):
+        self._call()
+        now = self.milliseconds()
+        limit = limit or 500
+        if since is None:
+            since = now - limit * self.trade_interval
+        start = since + (-since) % self.trade_interval
+        stamps = range(start, min(now + 1, start + limit * self.trade_interval), self.trade_interval)
+        return [self._trade(symbol, ts) for ts in stamps]
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params={}):
+        self._call()
+        step = TIMEFRAMES[timeframe]
+        now = self.milliseconds()
+        limit = limit or 500
+        if since is None:
+            since = now - limit * step
+        start = since + (-since) % step
+        candles = []
+        for ts in range(start, min(now + 1, start + limit * step), step):
+            o, c = self.mid(symbol, ts), self.mid(symbol, ts + step - 1)
+            rng = self._rng(symbol, 'ohlcv', timeframe, ts)
+            candles.append([ts, o, max(o, c) * (1 + rng.random() / 100), min(o, c) * (1 - rng.random() / 100),
+                            c, rng.uniform(1, 1000)])
+        return candles
+
+    # Private calls
+
+    def fetch_balance(self, params={}):
+        self._call()
+        balances = {'info': {}, 'free': {}, 'used': {}, 'total': {}}
+        for currency in ('BTC', 'USD') + tuple(s.split('/')[0] for s in symbols(self.pairs)):
+            balances[currency] = {'free': 10.0, 'used': 0.0, 'total': 10.0}
+        return balances
+
+    def create_order(self, symbol, type, side, amount, price=None, params={}):
+        self._call()
+        if symbol not in symbols(self.pairs):
+            raise ccxt.InvalidOrder(f'{self.id} does not have market symbol {symbol}')
+        order_id = str(next(self.order_ids))
+        now = self.milliseconds()
+        order = {'id': order_id, 'timestamp': now, 'datetime': self.iso8601(now), 'symbol': symbol,
+                 'type': type, 'side': side, 'price': float(price) if price is not None else None,
+                 'amount': float(amount), 'filled': 0.0, 'remaining': float(amount), 'cost': 0.0,
+                 'status': 'open', 'fee': None, 'info': {}}
+        with self.lock:
+            self.mock_orders[order_id] = order
+        return dict(order)
+
+    def fetch_order(self, id, symbol=None, params={}):
+        self._call()
+        with self.lock:
+            if id not in self.mock_orders:
+                raise ccxt.OrderNotFound(f'{self.id} order {id} does not exist')
+            return dict(self.mock_orders[id])
+
+    def cancel_order(self, id, symbol=None, params={}):
+        self._call()
+        with self.lock:
+            order = self.mock_orders.get(id)
+            if order is None or order['status'] != 'open':
+                raise ccxt.OrderNotFound(f'{self.id} order {id} does not exist')
+            order['status'] = 'canceled'
+            return dict(order)
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        self._call()
+        with self.lock:
+            return [dict(o) for o in self.mock_orders.values()
+                    if o['status'] == 'open' and symbol in (None, o['symbol'])]
+
+    def fetch_my_trades(self, symbol=None, since=None, limit=None, params={}):
+        self._call()
+        return []
+
+    def fetch_deposits(self, code=None, since=None, limit=None, params={}):
+        self._call()
+        return []
+
+    def fetch_withdrawals(self, code=None, since=None, limit=None, params={}):
+        self._call()
+        return []
+
+
+class AsyncMockExchange(ccxt_async.Exchange):
+    '''
+    MockExchange for ccxt.async_support: the same data, with latency
+    awaited rather than slept
+    '''
+    latency = 0.0
+    error_rate = 0.0
+    seed = 0
+    pairs = 20
+    now = None
+
+    def describe(self):
+        return self.deep_extend(super(AsyncMockExchange, self).describe(), DESCRIPTION)
+
+    def __init__(self, config={}):
+        super(AsyncMockExchange, self).__init__(config)
+        self.mock = MockExchange({'latency': 0, 'error_rate': self.error_rate, 'seed': self.seed,
+                                  'pairs': self.pairs, 'now': self.now})
+
+    @property
+    def calls(self):
+        return self.mock.calls
+
+    def milliseconds(self):
+        return self.mock.milliseconds()
+
+
+def _coroutine(name):
+    async def call(self, *args, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return getattr(self.mock, name)(*args, **kwargs)
+    call.__name__ = name
+    return call
+
+
+for _name in CALLS:
+    setattr(AsyncMockExchange, _name, _coroutine(_name))
@@ -0,0 +1,96 @@
+import sys
+sys.path.insert(0, '/')
+import asyncio
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from exapi import ccxt_async_exapi
+from exapi.ccxt_async_exapi import AsyncCCXT
+from exapi.market_store import MarketStore
+from exapi.orderbook import OrderBook
+from exapi.tests.mock_exchange import AsyncMockExchange
+
+NOW = 1546300800000
+
+class NowMockExchange(AsyncMockExchange):
+    now = NOW
+    pairs = 4
+
+class PagedMockExchange(NowMockExchange):
+    # two trades and two candles at each page boundary's timestamp
+    trade_times = [NOW - 3000, NOW - 2000, NOW - 2000, NOW - 1000]
+    candle_times = [NOW - 3600000 * 3, NOW - 3600000 * 2, NOW - 3600000]
+
+    async def fetch_trades(self, symbol, since=None, limit=None, params={}):
+        self.mock.calls += 1
+        trades = [{'id': str(i), 'timestamp': t, 'price': 1.0, 'amount': 1.0, 'side': 'buy'}
+                  for i, t in enumerate(self.trade_times) if t >= since]
+        return trades[:limit]
+
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params={}):
+        self.mock.calls += 1
+        return [[t, 1.0, 1.0, 1.0, 1.0, 1.0] for t in self.candle_times if t >= since][:limit]
+
+class TestAsyncCCXT(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = MarketStore(path=self.tmp.name)
+        patcher = mock.patch.object(ccxt_async_exapi, 'store', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def run_async(self, coroutine):
+        return asyncio.run(coroutine)
+
+    def ex(self):
+        return AsyncCCXT('Mock', key='key', secret='secret', exchange_class=NowMockExchange)
+
+    def testMarketsFetchedOnceOffTheLoop(self):
+        threads = []
+        get = self.store.get
+
+        def store_get(*args):
+            threads.append(threading.current_thread())
+            return get(*args)
+
+        async def main():
+            async with self.ex() as a, self.ex() as b:
+                await asyncio.gather(*[ex.get_details('C000', 'BTC') for ex in (a, b) for i in range(5)])
+                return a.exchange.calls + b.exchange.calls
+
+        with mock.patch.object(self.store, 'get', store_get):
+            self.assertEqual(self.run_async(main()), 1)
+        self.assertTrue(threads)
+        self.assertNotIn(threading.main_thread(), threads)
+
+    def testOrders(self):
+        async def main():
+            async with self.ex() as ex:
+                book = await ex.get_orderbook('C000', 'BTC', limit=10)
+                limit_id = await ex.order('buy', 1, float(book.mid()) * 0.9, 'C000', 'BTC')
+                market_id = await ex.order('buy', 1, None, 'C000', 'BTC', type='market')
+                orders = await ex.get_orders()
+                self.assertTrue(await ex.cancel(limit_id, 'C000', 'BTC'))
+                return book, limit_id, market_id, orders
+
+        book, limit_id, market_id, orders = self.run_async(main())
+        self.assertIsInstance(book, OrderBook)
+        self.assertEqual(set(orders), {limit_id, market_id})
+        self.assertIsNone(orders[market_id]['price'])
+
+    def testPagesWithoutBoundaryDuplicates(self):
+        async def main():
+            async with AsyncCCXT('Mock', exchange_class=PagedMockExchange) as ex:
+                history = await ex.get_history('C000', 'BTC', limit=3, since=NOW - 3000)
+                candles = await ex.get_candles('C000', 'BTC', since=NOW - 3600000 * 3, limit=2)
+                return history, candles
+
+        history, candles = self.run_async(main())
+        self.assertEqual([t['id'] for t in history], ['3', '2', '1', '0'])
+        self.assertEqual(list(candles.index), PagedMockExchange.candle_times)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import sys
+sys.path.insert(0, '/')
+import os
+import tempfile
+import unittest
+from exapi.candle_store import CandleStore, parse_timeframe, missing_ranges, add_range, storable
+
+H = 3600000
+NOW = 100 * H + 1234
+
+class TestCandleStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = CandleStore(path=self.tmp.name)
+        self.calls = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def loader(self, since, until):
+        self.calls.append((since, until))
+        end = until if until is not None else NOW
+        return [[t, 1, 2, 0.5, 1.5, 10] for t in range(since, end, H)]
+
+    def testTimeframes(self):
+        self.assertEqual(parse_timeframe('1h'), H)
+        self.assertEqual(parse_timeframe('15m'), 15 * 60000)
+        with self.assertRaises(ValueError):
+            parse_timeframe('1x')
+
+    def testRanges(self):
+        ranges = add_range([[0, 10]], 10, 20)
+        self.assertEqual(ranges, [[0, 20]])
+        self.assertEqual(missing_ranges([[5, 10], [20, 30]], 0, 40), [[0, 5], [10, 20], [30, 40]])
+
+    def testFetchesOnlyMissingRanges(self):
+        candles = self.store.get('Kraken', 'BTC/USD', '1h', 90 * H, self.loader, now=NOW)
+        self.assertEqual(len(candles), 11)
+        self.assertEqual(self.calls, [(90 * H, 100 * H), (100 * H, None)])
+        self.calls = []
+        candles = self.store.get('Kraken', 'BTC/USD', '1h', 80 * H + 5, self.loader, now=NOW)
+        self.assertEqual(len(candles), 21)
+        self.assertEqual(candles[0][0], 80 * H)
+        self.assertEqual(self.calls, [(80 * H, 90 * H), (100 * H, None)])
+
+    def testSharedBetweenStores(self):
+        self.store.get('Kraken', 'BTC/USD', '1h', 90 * H, self.loader, now=NOW)
+        other = CandleStore(path=self.tmp.name)
+        self.calls = []
+        other.get('Kraken', 'BTC/USD', '1h', 90 * H, self.loader, now=NOW)
+        self.assertEqual(self.calls, [(100 * H, None)])
+
+    def testCalendarIntervalsNotStored(self):
+        self.assertTrue(storable(parse_timeframe('1d')))
+        self.assertFalse(storable(parse_timeframe('1w')))
+        self.assertFalse(storable(parse_timeframe('1M')))
+        for i in range(2):
+            candles = self.store.get('Kraken', 'BTC/USD', '1w', 90 * H + 5, self.loader, now=NOW)
+            self.assertEqual(len(candles), 11)
+        self.assertEqual(self.calls, [(90 * H + 5, None)] * 2)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+if __name__ == '__main__':
+    unittest.main()
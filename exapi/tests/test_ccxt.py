@@ -0,0 +1,223 @@
+import sys
+sys.path.insert(0, '/')
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+import ccxt
+from werkzeug.exceptions import HTTPException
+from exapi import ccxt_exapi
+from exapi.ccxt_exapi import CCXT
+from exapi.market_store import MarketStore
+from exapi.transaction_store import TransactionStore
+from exapi.trade_store import TradeStore, OBJECTS
+from exapi.tests.mock_exchange import MockExchange
+
+NOW = 1546300800000
+SECRET = 'secret'
+
+class AccountMockExchange(MockExchange):
+    # a mock exchange with one account, rejecting any other secret
+    now = NOW
+    pairs = 4
+
+    def _private(self):
+        self._call()
+        if self.secret != SECRET:
+            raise ccxt.AuthenticationError(f'{self.id} invalid secret')
+
+    def fetch_my_trades(self, symbol=None, since=None, limit=None, params={}):
+        self._private()
+        trades = [dict(self._trade('C000/BTC', NOW - 60000), order='o1')]
+        return [t for t in trades if since is None or t['timestamp'] >= since]
+
+    def fetch_deposits(self, code=None, since=None, limit=None, params={}):
+        self._private()
+        return [{'id': 'd1', 'txid': 't1', 'timestamp': NOW - 1000, 'datetime': self.iso8601(NOW - 1000),
+                 'address': 'owner-address', 'tag': None, 'type': 'deposit', 'amount': 1.0,
+                 'currency': 'BTC', 'status': 'ok', 'updated': None, 'fee': None}]
+
+    def fetch_withdrawals(self, code=None, since=None, limit=None, params={}):
+        self._private()
+        return []
+
+class CancelAllMockExchange(AccountMockExchange):
+    # cancel-all leaves keep_open orders open and finds filled ones already closed
+    keep_open = ()
+    filled = ()
+    list_response = False
+
+    def describe(self):
+        return self.deep_extend(super(CancelAllMockExchange, self).describe(), {'has': {'cancelAllOrders': True}})
+
+    def cancel_all_orders(self, symbol=None, params={}):
+        self._private()
+        with self.lock:
+            orders = [o for o in self.mock_orders.values() if o['status'] == 'open' and o['symbol'] == symbol]
+            for o in orders:
+                if o['id'] in self.filled:
+                    o['status'] = 'closed'
+                elif o['id'] not in self.keep_open:
+                    o['status'] = 'canceled'
+            if self.list_response:
+                return [dict(o) for o in orders]
+            return {'info': {}}
+
+class TestCCXT(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        stores = {
+            'store': MarketStore(path=os.path.join(self.tmp.name, 'markets')),
+            'tx_store': TransactionStore(path=os.path.join(self.tmp.name, 'txs'), freshness=60),
+            'my_trade_store': TradeStore(os.path.join(self.tmp.name, 'trades'), 86400 * 365, 1024 ** 2, freshness=60,
+                                         objects=OBJECTS + ('symbol', 'datetime')),
+        }
+        for name, store in stores.items():
+            patcher = mock.patch.object(ccxt_exapi, name, store)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def ex(self, secret=SECRET, exchange_class=AccountMockExchange):
+        return CCXT('Mock', key='key', secret=secret, exchange_class=exchange_class)
+
+    def place(self, ex, n, base='C000', quote='BTC'):
+        return [ex.order('buy', 1, 0.01, base, quote) for i in range(n)]
+
+    def testTransactionsNeedSecret(self):
+        self.assertIn('owner-address', self.ex().get_transactions())
+        # fresh in the store, but another secret is a different account
+        self.assertRaises(HTTPException, self.ex('wrong').get_transactions)
+
+    def testTransactionLayouts(self):
+        ex = self.ex()
+        self.assertEqual(json.loads(ex.get_transactions())['address'], {'d1': 'owner-address'})
+        calls = ex.exchange.calls
+        self.assertEqual([tx['id'] for tx in ex.iter_transactions()], ['d1'])
+        self.assertEqual(ex.exchange.calls, calls)
+
+    def testTradesNeedSecret(self):
+        self.assertIn('o1', self.ex().get_trades())
+        self.assertRaises(HTTPException, self.ex('wrong').get_trades)
+
+    def testIterTradesFromStore(self):
+        ex = self.ex()
+        ex.get_trades()
+        calls = ex.exchange.calls
+        # since defaults as for get_trades, and the fresh store is read
+        self.assertEqual([t['order'] for t in ex.iter_trades()], ['o1'])
+        self.assertEqual(ex.exchange.calls, calls)
+
+    def testOrdersCheckedBeforeAnyIsSent(self):
+        ex = self.ex()
+        ex.load_markets()
+        calls = ex.exchange.calls
+        results = ex.orders([
+            {'side': 'buy', 'amount': 1, 'price': 0.01, 'base': 'C000', 'quote': 'BTC'},
+            {'side': 'buy', 'amount': 1, 'price': 0.01, 'base': 'XXX', 'quote': 'BTC'},
+            {'side': 'buy', 'amount': 0.0001, 'price': 0.01, 'base': 'C000', 'quote': 'BTC'},
+            {'side': 'buy', 'amount': 200000, 'price': 0.01, 'base': 'C000', 'quote': 'BTC'},
+            {'side': 'sell', 'amount': 1, 'base': 'C000', 'quote': 'BTC'},
+            {'side': 'sell', 'amount': 1, 'base': 'C000', 'quote': 'BTC', 'type': 'market'},
+        ])
+        self.assertEqual(ex.exchange.calls - calls, 2)
+        self.assertEqual([set(r) for r in results],
+                         [{'id'}] + [{'error', 'status'}] * 4 + [{'id'}])
+        self.assertEqual([r['status'] for r in results[1:5]], [400] * 4)
+        self.assertIn('XXX/BTC', results[1]['error'])
+        self.assertIn('minimum', results[2]['error'])
+        self.assertIn('maximum', results[3]['error'])
+        self.assertIn('price', results[4]['error'])
+        self.assertEqual(set(ex.exchange.mock_orders), {results[0]['id'], results[5]['id']})
+
+    def testOrdersExchangeErrorPerOrder(self):
+        ex = self.ex()
+        ex.load_markets()
+        # a pair the exchange has delisted since the markets were loaded
+        ex.exchange.pairs = 1
+        results = ex.orders([
+            {'side': 'buy', 'amount': 1, 'price': 0.01, 'base': 'C001', 'quote': 'USD'},
+            {'side': 'buy', 'amount': 1, 'price': 0.01, 'base': 'C000', 'quote': 'BTC'},
+        ])
+        self.assertEqual(results[0]['status'], 400)
+        self.assertIn('C001/USD', results[0]['error'])
+        self.assertIn('id', results[1])
+
+    def testCancelAllOrders(self):
+        ex = self.ex()
+        ids = self.place(ex, 3) + self.place(ex, 1, 'C001', 'USD')
+        results = ex.cancel_all()
+        self.assertEqual(sorted(r['id'] for r in results), sorted(ids))
+        self.assertTrue(all(r['cancelled'] for r in results))
+        self.assertEqual(ex.exchange.fetch_open_orders(), [])
+
+    def testCancelAllPairAndIds(self):
+        ex = self.ex()
+        ids = self.place(ex, 2)
+        other = self.place(ex, 1, 'C001', 'USD')
+        self.assertEqual(ex.cancel_all(base='C000', quote='BTC'),
+                         [{'id': order_id, 'cancelled': True} for order_id in ids])
+        self.assertEqual([o['id'] for o in ex.exchange.fetch_open_orders()], other)
+        # already cancelled, and unknown
+        results = ex.cancel_all([ids[0], other[0], '999'])
+        self.assertEqual([r.get('cancelled') for r in results], [False, True, False])
+
+    def testCancelAllNativeChecksStatuses(self):
+        for list_response in (False, True):
+            class Exchange(CancelAllMockExchange):
+                keep_open = ('2',)
+                filled = ('3',)
+            Exchange.list_response = list_response
+            ex = self.ex(exchange_class=Exchange)
+            ids = self.place(ex, 4)
+            self.assertEqual(ids, ['1', '2', '3', '4'])
+            self.assertEqual(ex.cancel_all(base='C000', quote='BTC'), [
+                {'id': '1', 'cancelled': True},
+                {'id': '2', 'cancelled': False},
+                {'id': '3', 'cancelled': False},
+                {'id': '4', 'cancelled': True},
+            ])
+
+    def testCancelAllNativeError(self):
+        ex = self.ex(exchange_class=CancelAllMockExchange)
+        ids = self.place(ex, 2)
+        ex.exchange.secret = 'wrong'
+        # listing open orders is public on the mock, cancelling is not
+        results = ex.cancel_all(base='C000', quote='BTC')
+        self.assertEqual([(r['id'], r['status']) for r in results], [(order_id, 403) for order_id in ids])
+
+    def testBalancesCached(self):
+        ex = self.ex()
+        balances = ex.get_balances()
+        calls = ex.exchange.calls
+        self.assertEqual(ex.get_balances(), balances)
+        self.assertEqual(ex.exchange.calls, calls)
+        with mock.patch.object(ccxt_exapi, 'time', return_value=ccxt_exapi.time() + ccxt_exapi.BALANCE_TTL):
+            ex.get_balances()
+        self.assertEqual(ex.exchange.calls, calls + 1)
+
+    def testBalancesDroppedOnOrderAndCancel(self):
+        ex = self.ex()
+        ex.load_markets()
+        for change in (lambda: self.place(ex, 1)[0],
+                       lambda: ex.cancel('1', 'C000', 'BTC'),
+                       lambda: ex.orders([{'side': 'buy', 'amount': 1, 'price': 0.01, 'base': 'C000', 'quote': 'BTC'}]),
+                       lambda: ex.cancel_all(base='C000', quote='BTC')):
+            ex.get_balances()
+            calls = ex.exchange.calls
+            change()
+            changed = ex.exchange.calls - calls
+            ex.get_balances()
+            self.assertEqual(ex.exchange.calls - calls, changed + 1)
+
+    def testBalancesDroppedWhenOrderFails(self):
+        ex = self.ex()
+        ex.get_balances()
+        with mock.patch.object(ex.exchange, 'create_order', side_effect=ccxt.InvalidOrder('rejected')):
+            self.assertRaises(HTTPException, self.place, ex, 1)
+        self.assertIsNone(ex._balances)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import sys
+sys.path.insert(0, '/')
+import time
+import unittest
+from unittest import mock
+from exapi import exchange
+from exapi.exchange import Exchange
+from exapi.circuit import CircuitBreaker, CircuitBreakers, RetryPolicy, CLOSED, OPEN, HALF_OPEN
+
+class FakeExchange(object):
+    id = 'fake'
+    apiKey = None
+    rateLimit = 1
+
+    def fetch_ticker(self, symbol):
+        return {'symbol': symbol}
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker('test', threshold=2, reset_timeout=0.1, probes=1)
+
+    def testOpensAfterFailures(self):
+        self.assertTrue(self.breaker.allow())
+        self.breaker.failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def testHalfOpenProbe(self):
+        self.breaker.failure()
+        self.breaker.failure()
+        time.sleep(0.15)
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        # only one probe at a time
+        self.assertFalse(self.breaker.allow())
+        self.breaker.success()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def testFailedProbeReopens(self):
+        self.breaker.failure()
+        self.breaker.failure()
+        time.sleep(0.15)
+        self.assertTrue(self.breaker.allow())
+        self.breaker.failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def testReleasedProbe(self):
+        self.breaker.failure()
+        self.breaker.failure()
+        time.sleep(0.15)
+        self.assertTrue(self.breaker.allow())
+        self.breaker.release()
+        self.assertTrue(self.breaker.allow())
+
+    def testProbeReleasedWhenRateLimiterRaises(self):
+        breakers = CircuitBreakers(threshold=1, reset_timeout=0.1)
+        breaker = breakers.get('fake', 'fetch_ticker')
+        breaker.failure()
+        time.sleep(0.15)
+        ex = Exchange()
+        with mock.patch.object(exchange, 'breakers', breakers):
+            with mock.patch.object(exchange.limiter, 'wait_ccxt', side_effect=RuntimeError('limiter')):
+                self.assertRaises(RuntimeError, ex._ccxt_query, FakeExchange(), 'fetch_ticker', 'ETH/BTC')
+            self.assertEqual(breaker.state, HALF_OPEN)
+            self.assertEqual(ex._ccxt_query(FakeExchange(), 'fetch_ticker', 'ETH/BTC'), {'symbol': 'ETH/BTC'})
+        self.assertEqual(breaker.state, CLOSED)
+
+    def testStates(self):
+        breakers = CircuitBreakers(threshold=1)
+        breakers.get('fake', 'fetch_ticker').failure()
+        breakers.get('fake', 'fetch_trades')
+        self.assertEqual({key: state['state'] for key, state in breakers.states().items()},
+                         {'fake.fetch_ticker': OPEN, 'fake.fetch_trades': CLOSED})
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def testBackoff(self):
+        policy = RetryPolicy(retries=3, base=0.5, cap=1, budget=10)
+        deadline = policy.deadline()
+        for attempt in range(3):
+            delay = policy.backoff(attempt, deadline)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, 1)
+        self.assertIsNone(policy.backoff(3, deadline))
+
+    def testBudget(self):
+        policy = RetryPolicy(retries=3, base=100, cap=100, budget=0)
+        self.assertIsNone(policy.backoff(0, policy.deadline() - 1))
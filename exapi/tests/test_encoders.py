@@ -0,0 +1,37 @@
+import sys
+sys.path.insert(0, '/')
+import os
+import json
+import unittest
+from datetime import datetime, timezone
+from decimal import Decimal
+import numpy as np
+import exapi
+sys.path.insert(0, os.path.join(os.path.dirname(exapi.__file__), 'web'))
+import encoders
+
+DATA = {
+    'history': [{'price': 0.0345, 'amount': 2, 'timestamp': datetime(2019, 1, 1, tzinfo=timezone.utc),
+                 'side': 'buy', 'fee': None, 'id': '1'}],
+    'price': Decimal('0.00001234'),
+    'floats': [0.1 + 0.2, 1e-05, 1e17, -0.0, 123456789.123456789],
+    'numpy': {'ints': np.arange(3), 'float': np.float64(1.5), 'int': np.int64(7), 'bool': np.bool_(True)},
+    'text': ['é', 'x/y', '"quoted"\n'],
+    1: 'int key',
+    'nested': {'empty': [], 'none': None, 'flags': [True, False]},
+}
+
+class TestEncoders(unittest.TestCase):
+
+    @unittest.skipIf(encoders.orjson is None, 'orjson is not installed')
+    def testOrjsonMatchesJson(self):
+        fast, slow = encoders.orjson_dumps(DATA), encoders.json_dumps(DATA)
+        self.assertEqual(json.loads(fast), json.loads(slow))
+        self.assertTrue(fast.endswith(b'\n'))
+
+    def testColumnar(self):
+        records = [{'a': 1, 'b': 'x'}, {'a': 2}]
+        self.assertEqual(encoders.columnar(records, ('a', 'b')), {'a': [1, 2], 'b': ['x', None]})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import sys
+sys.path.insert(0, '/')
+import os
+import tempfile
+import unittest
+from exapi.market_store import MarketStore
+
+MARKETS = [{'symbol': 'ETH/BTC', 'base': 'ETH', 'quote': 'BTC'}]
+
+class TestMarketStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = MarketStore(path=self.tmp.name, ttl=60)
+        self.calls = 0
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def loader(self):
+        self.calls += 1
+        return MARKETS
+
+    def testLoadsOnce(self):
+        self.assertEqual(self.store.get('Kraken', self.loader).markets, MARKETS)
+        self.assertEqual(self.store.get('Kraken', self.loader).markets, MARKETS)
+        self.assertEqual(self.calls, 1)
+
+    def testSharedBetweenStores(self):
+        self.store.get('Kraken', self.loader)
+        other = MarketStore(path=self.tmp.name, ttl=60)
+        self.assertEqual(other.get('Kraken', self.loader).markets, MARKETS)
+        self.assertEqual(self.calls, 1)
+
+    def testExpiredSnapshotReloads(self):
+        self.store.get('Kraken', self.loader)
+        filename = os.path.join(self.tmp.name, 'kraken.json')
+        os.utime(filename, (0, 0))
+        self.store.snapshots.clear()
+        self.assertIsNone(self.store.peek('Kraken'))
+        self.store.get('Kraken', self.loader)
+        self.assertEqual(self.calls, 2)
+        self.assertLess(self.store.ages()['kraken'], 60)
+
+    def testStaleSnapshotOnLoaderFailure(self):
+        self.store.get('Kraken', self.loader)
+        os.utime(os.path.join(self.tmp.name, 'kraken.json'), (0, 0))
+        self.store.snapshots['Kraken'].timestamp = 0
+
+        def failing():
+            raise ConnectionError('down')
+        self.assertEqual(self.store.get('Kraken', failing).markets, MARKETS)
+
+    def testLoaderFailureWithoutSnapshot(self):
+        def failing():
+            raise ConnectionError('down')
+        with self.assertRaises(ConnectionError):
+            self.store.get('Kraken', failing)
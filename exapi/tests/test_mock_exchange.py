@@ -0,0 +1,45 @@
+import sys
+sys.path.insert(0, '/')
+import unittest
+import ccxt
+from exapi.tests.mock_exchange import MockExchange
+
+NOW = 1546300800000
+
+class TestMockExchange(unittest.TestCase):
+
+    def setUp(self):
+        self.ex = MockExchange({'now': NOW, 'pairs': 4})
+
+    def testDeterministic(self):
+        other = MockExchange({'now': NOW, 'pairs': 4})
+        self.assertEqual(self.ex.fetch_l2_order_book('C000/BTC', 10), other.fetch_l2_order_book('C000/BTC', 10))
+        self.assertEqual(self.ex.fetch_trades('C001/USD'), other.fetch_trades('C001/USD'))
+        self.assertNotEqual(self.ex.fetch_trades('C001/USD'), MockExchange({'now': NOW, 'seed': 1}).fetch_trades('C001/USD'))
+
+    def testMarkets(self):
+        self.ex.load_markets()
+        self.assertEqual(self.ex.symbols, ['C000/BTC', 'C001/USD', 'C002/BTC', 'C003/USD'])
+        self.assertEqual(self.ex.amount_to_precision('C000/BTC', 1.23456), '1.234')
+
+    def testPaging(self):
+        trades = self.ex.fetch_trades('C000/BTC', NOW - 3600000, 10)
+        self.assertEqual(len(trades), 10)
+        self.assertEqual(trades[0]['timestamp'], NOW - 3600000)
+        candles = self.ex.fetch_ohlcv('C000/BTC', '1h', NOW - 86400000)
+        self.assertEqual(len(candles), 25)
+        self.assertTrue(all(c[3] <= min(c[1], c[4]) <= max(c[1], c[4]) <= c[2] for c in candles))
+
+    def testOrders(self):
+        order = self.ex.create_order('C000/BTC', 'limit', 'buy', 1, 2)
+        self.assertEqual([o['id'] for o in self.ex.fetch_open_orders()], [order['id']])
+        self.ex.cancel_order(order['id'])
+        self.assertEqual(self.ex.fetch_order(order['id'])['status'], 'canceled')
+        self.assertRaises(ccxt.OrderNotFound, self.ex.cancel_order, order['id'])
+
+    def testErrorRate(self):
+        ex = MockExchange({'error_rate': 1})
+        self.assertRaises(ccxt.NetworkError, ex.fetch_balance)
+
+if __name__ == '__main__':
+    unittest.main()
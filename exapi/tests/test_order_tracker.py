@@ -0,0 +1,65 @@
+import sys
+sys.path.insert(0, '/')
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from exapi.order_tracker import OrderTracker
+
+def order(order_id, status='open', symbol='ETH/BTC'):
+    return {'id': order_id, 'symbol': symbol, 'status': status}
+
+class TestOrderTracker(unittest.TestCase):
+
+    def setUp(self):
+        self.open = [order(str(i)) for i in range(50)]
+        self.single = {}
+        self.sweeps = []
+        self.fetches = []
+        self.tracker = OrderTracker(self.fetch_open, self.fetch_one, refresh=60)
+
+    def fetch_open(self, symbol):
+        self.sweeps.append(symbol)
+        return [o for o in self.open if symbol is None or o['symbol'] == symbol]
+
+    def fetch_one(self, order_id, symbol):
+        self.fetches.append(order_id)
+        return self.single.get(order_id)
+
+    def testOneSweepForManyOrders(self):
+        with ThreadPoolExecutor(8) as pool:
+            found = list(pool.map(lambda i: self.tracker.get(str(i), 'ETH/BTC')[0], range(50)))
+        self.assertEqual(found, self.open)
+        self.assertEqual(self.sweeps, ['ETH/BTC'])
+        self.assertEqual(self.fetches, [])
+
+    def testSweepOfAllPairsServesOnePair(self):
+        self.open.append(order('x', symbol='LTC/BTC'))
+        self.tracker.open_orders()
+        as_of, orders = self.tracker.open_orders('LTC/BTC')
+        self.assertEqual(list(orders), ['x'])
+        self.assertEqual(self.sweeps, [None])
+
+    def testClosedOrderFetchedOnceThenRemembered(self):
+        self.tracker.get('0', 'ETH/BTC')
+        self.single['0'] = order('0', 'closed')
+        self.tracker.invalidate()
+        self.open.pop(0)
+        for _ in range(3):
+            self.assertEqual(self.tracker.get('0', 'ETH/BTC')[0]['status'], 'closed')
+        self.assertEqual(self.fetches, ['0'])
+        self.assertEqual(len(self.sweeps), 2)
+
+    def testNewOrderAddedToSweep(self):
+        self.tracker.get('0', 'ETH/BTC')
+        self.single['new'] = order('new')
+        self.tracker.get('new', 'ETH/BTC')
+        self.assertIn('new', self.tracker.open_orders('ETH/BTC')[1])
+        self.tracker.get('new', 'ETH/BTC')
+        self.assertEqual(self.fetches, ['new'])
+
+    def testMissingOrder(self):
+        order, as_of = self.tracker.get('nope', 'ETH/BTC')
+        self.assertIsNone(order)
+        self.assertGreater(as_of, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import sys
+sys.path.insert(0, '/')
+import json
+import unittest
+from exapi.orderbook import OrderBook
+
+CCXT_BOOK = {
+    'bids': [[100.0, 1.0], [99.5, 2.0], [99.0, 3.0]],
+    'asks': [['101', '0.5', 4], ['102', '1.5', 2]],
+}
+
+class TestOrderBook(unittest.TestCase):
+
+    def testFromCCXT(self):
+        ob = OrderBook.from_ccxt(CCXT_BOOK)
+        self.assertEqual(ob['bids'][0][0], 100.0)
+        self.assertEqual(ob.best_ask(), 101.0)
+        self.assertEqual(ob.asks.shape, (2, 2))
+
+    def testSide(self):
+        ob = OrderBook.from_ccxt(CCXT_BOOK, side='bids')
+        self.assertEqual(len(ob.asks), 0)
+        self.assertEqual(ob.side('bids', 2).tolist(), [[100.0, 1.0], [99.5, 2.0]])
+        self.assertEqual(len(ob.head(1).bids), 1)
+
+    def testJSONShape(self):
+        ob = OrderBook.from_ccxt(CCXT_BOOK)
+        expected = {
+            'bids': [(100.0, 1.0), (99.5, 2.0), (99.0, 3.0)],
+            'asks': [(101.0, 0.5), (102.0, 1.5)],
+        }
+        self.assertEqual(json.dumps(ob.to_dict()), json.dumps(expected))
+
+    def testEmpty(self):
+        ob = OrderBook.from_ccxt({'bids': [], 'asks': []})
+        self.assertEqual(ob.to_dict(), {'bids': [], 'asks': []})
+
+    def testImpactAmount(self):
+        ob = OrderBook.from_ccxt(CCXT_BOOK)
+        impact = ob.impact('buy', amount=1.0)
+        self.assertEqual(impact['filled'], 1.0)
+        self.assertEqual(impact['cost'], 101.0 * 0.5 + 102.0 * 0.5)
+        self.assertEqual(impact['worst_price'], 102.0)
+        self.assertTrue(impact['complete'])
+        self.assertGreater(impact['slippage_bps'], 0)
+
+    def testImpactNotional(self):
+        ob = OrderBook.from_ccxt(CCXT_BOOK)
+        impact = ob.impact('sell', notional=299.0)
+        self.assertEqual(impact['filled'], 3.0)
+        self.assertEqual(impact['worst_price'], 99.5)
+
+    def testImpactEmpty(self):
+        books = [OrderBook.from_ccxt({'bids': [], 'asks': []}),
+                 OrderBook.from_ccxt({'bids': [[100.0, 0.0]], 'asks': [[101.0, 0.0]]})]
+        for ob in books:
+            for impact in (ob.impact('buy', amount=1.0), ob.impact('sell', notional=10.0),
+                           OrderBook.from_ccxt(CCXT_BOOK).impact('buy', amount=0.0)):
+                self.assertEqual(impact['filled'], 0.0)
+                self.assertIsNone(impact['vwap'])
+                self.assertIsNone(impact['slippage_bps'])
+
+    def testImpactIncomplete(self):
+        ob = OrderBook.from_ccxt(CCXT_BOOK)
+        impact = ob.impact('buy', amount=5.0)
+        self.assertFalse(impact['complete'])
+        self.assertEqual(impact['filled'], 2.0)
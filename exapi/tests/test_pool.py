@@ -0,0 +1,62 @@
+import sys
+sys.path.insert(0, '/')
+import time
+import unittest
+from exapi.pool import InstancePool
+
+class Instance(object):
+    def __init__(self, key):
+        self.key = key
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+class TestInstancePool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = InstancePool(lambda exchange, key, secret, passphrase: Instance(key),
+                                 size=2, idle_time=60)
+
+    def get(self, key, secret='s'):
+        with self.pool.lease('Binance', key, secret) as ex:
+            return ex
+
+    def testHit(self):
+        a = self.get('a')
+        self.assertIs(self.get('a'), a)
+        stats = self.pool.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 1, 1))
+
+    def testSecretIsPartOfKey(self):
+        self.assertIsNot(self.get('a', 's1'), self.get('a', 's2'))
+
+    def testLeastRecentlyUsedEvicted(self):
+        a, b = self.get('a'), self.get('b')
+        self.get('a')
+        c = self.get('c')
+        self.assertTrue(b.closed)
+        self.assertFalse(a.closed or c.closed)
+        self.assertEqual(self.pool.stats()['evictions'], 1)
+        self.assertIsNot(self.get('b'), b)
+
+    def testIdleExpired(self):
+        a = self.get('a')
+        self.pool.idle_time = 0.05
+        time.sleep(0.1)
+        self.pool.sweep()
+        self.assertTrue(a.closed)
+        self.assertEqual(self.pool.stats()['size'], 0)
+
+    def testLeasedNotClosedUntilReleased(self):
+        lease = self.pool.lease('Binance', 'a', 's')
+        stream = lease.retain()
+        lease.release()
+        self.get('b')
+        self.get('c')
+        self.assertFalse(lease.instance.closed)
+        stream.release()
+        self.assertTrue(lease.instance.closed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import sys
+sys.path.insert(0, '/')
+import os
+import time
+import tempfile
+import threading
+import unittest
+from decimal import Decimal
+import exapi
+sys.path.insert(0, os.path.join(os.path.dirname(exapi.__file__), 'web'))
+from price_backends import MmapBackend
+
+def entry(price, ttl=60):
+    now = time.time()
+    return {'price': Decimal(price), 'timestamp': now, 'expiry': now + ttl}
+
+class TestMmapBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def backend(self, slots=8, probes=4):
+        return MmapBackend(path=os.path.join(self.tmp.name, 'prices'), slots=slots, probes=probes)
+
+    def testSharedBetweenInstances(self):
+        self.backend().set(('Binance', 'ETH', 'BTC'), entry('0.0345'))
+        self.assertEqual(self.backend().get(('Binance', 'ETH', 'BTC'))['price'], Decimal('0.0345'))
+
+    def testKeysCaseInsensitive(self):
+        backend = self.backend()
+        backend.set(('binance', 'eth', 'btc'), entry('1'))
+        backend.set(('Binance', 'ETH', 'BTC'), entry('2'))
+        self.assertEqual(backend.get(('BINANCE', 'eth', 'BTC'))['price'], Decimal('2'))
+
+    def testFullTableEvictsLeastRecentlyUsed(self):
+        backend = self.backend(slots=4, probes=4)
+        keys = [('Mock', f'C{i:03}', 'BTC') for i in range(4)]
+        for key in keys:
+            backend.set(key, entry('1'))
+        for key in keys[1:]:
+            backend.get(key)
+        backend.set(('Mock', 'NEW', 'BTC'), entry('2'))
+        self.assertIsNone(backend.get(keys[0]))
+        self.assertEqual(backend.get(('Mock', 'NEW', 'BTC'))['price'], Decimal('2'))
+        for key in keys[1:]:
+            self.assertIsNotNone(backend.get(key))
+
+    def testFullTableEvictsExpiredFirst(self):
+        backend = self.backend(slots=4, probes=4)
+        keys = [('Mock', f'C{i:03}', 'BTC') for i in range(4)]
+        for key in keys:
+            backend.set(key, entry('1', ttl=-1 if key == keys[2] else 60))
+        backend.set(('Mock', 'NEW', 'BTC'), entry('2'))
+        self.assertIsNone(backend.get(keys[2]))
+        self.assertEqual(len([k for k in keys if backend.get(k)]), 3)
+
+    def testLockExcludesThreadsOnTheSameByte(self):
+        # every key shares the one lock byte
+        backend = self.backend(slots=1, probes=1)
+        inside = []
+        overlaps = []
+
+        def hold(key):
+            with backend.lock(key):
+                inside.append(key)
+                overlaps.append(len(inside))
+                time.sleep(0.05)
+                inside.remove(key)
+
+        threads = [threading.Thread(target=hold, args=(('Mock', f'C{i:03}', 'BTC'),)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(overlaps, [1, 1, 1, 1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import sys
+sys.path.insert(0, '/')
+import os
+import time
+import unittest
+import exapi
+from exapi.ccxt_exapi import CCXT
+from exapi.tests.mock_exchange import MockExchange
+sys.path.insert(0, os.path.join(os.path.dirname(exapi.__file__), 'web'))
+from price_refresher import PriceRefresher
+
+class SlowMockExchange(MockExchange):
+    # one request per second
+    def describe(self):
+        return self.deep_extend(super(SlowMockExchange, self).describe(), {'rateLimit': 1000})
+
+class FakeCacher(object):
+    # every price is about to expire
+    def __init__(self):
+        self.refreshed = []
+
+    def expiry(self, ex, base, quote):
+        return time.time()
+
+    def refresh(self, ex, base, quote):
+        self.refreshed.append((ex, base, quote))
+
+class TestPriceRefresher(unittest.TestCase):
+
+    def setUp(self):
+        exapi.exs.register('MockFast', lambda: CCXT('Mock', exchange_class=MockExchange))
+        exapi.exs.register('MockSlow', lambda: CCXT('Mock', exchange_class=SlowMockExchange))
+        exapi.exs.register('MockOther', lambda: object())
+        for name in ('MockFast', 'MockSlow', 'MockOther'):
+            self.addCleanup(exapi.exs.pop, name)
+        self.cacher = FakeCacher()
+        self.refresher = PriceRefresher(self.cacher, hot_requests=1, share=0.5, budget=2)
+        # record() would start the refresh thread
+        self.refresher.start = lambda: None
+
+    def testRateFromLimiter(self):
+        self.assertEqual(self.refresher.rate('MockSlow'), 0.5)
+        self.assertEqual(self.refresher.rate('MockFast'), 500)
+        self.assertEqual(self.refresher.rate('MockOther'), 2)
+        self.refresher.budgets['MockSlow'] = 3
+        self.assertEqual(self.refresher.rate('MockSlow'), 3)
+
+    def testRefreshesWithinRate(self):
+        for ex in ('MockFast', 'MockSlow'):
+            for i in range(5):
+                self.refresher.record((ex, f'C{i:03}', 'BTC'))
+        self.refresher.tick()
+        self.assertEqual(len([key for key in self.cacher.refreshed if key[0] == 'MockFast']), 5)
+        # half a refresh has accrued
+        self.assertEqual(len([key for key in self.cacher.refreshed if key[0] == 'MockSlow']), 0)
+        self.refresher.last_tick -= 2
+        self.refresher.tick()
+        self.assertEqual(len([key for key in self.cacher.refreshed if key[0] == 'MockSlow']), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import sys
+sys.path.insert(0, '/')
+import os
+import time
+import tempfile
+import unittest
+from exapi.ratelimit import TokenBucket, RateLimiter
+
+class FakeExchange(object):
+    def __init__(self, id, apiKey=None, rateLimit=100):
+        self.id = id
+        self.apiKey = apiKey
+        self.rateLimit = rateLimit
+
+class TestTokenBucket(unittest.TestCase):
+
+    def testBurstThenWait(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1, places=2)
+        # reservations queue up behind each other
+        self.assertAlmostEqual(bucket.reserve(), 0.2, places=2)
+
+    def testWeightedCost(self):
+        bucket = TokenBucket(rate=10, capacity=1)
+        self.assertEqual(bucket.reserve(1), 0)
+        self.assertAlmostEqual(bucket.reserve(5), 0.5, places=2)
+
+class TestRateLimiter(unittest.TestCase):
+
+    def testBucketsIndependent(self):
+        limiter = RateLimiter(shared=False)
+        busy = FakeExchange('binance')
+        for i in range(20):
+            limiter.reserve_ccxt(busy, 'fetch_trades')
+        self.assertGreater(limiter.reserve_ccxt(busy, 'fetch_trades'), 0)
+        self.assertEqual(limiter.reserve_ccxt(FakeExchange('kraken'), 'fetch_trades'), 0)
+        # private calls are limited per API key
+        self.assertEqual(limiter.reserve_ccxt(FakeExchange('binance', 'a'), 'fetch_balance'), 0)
+        self.assertEqual(limiter.reserve_ccxt(FakeExchange('binance', 'b'), 'fetch_balance'), 0)
+
+    def testIdleBucketNeverWaits(self):
+        # one request every 3s, as Kraken
+        slow = FakeExchange('kraken', 'a', rateLimit=3000)
+        for method in ('fetch_markets', 'fetch_open_orders', 'fetch_balance'):
+            limiter = RateLimiter(shared=False)
+            self.assertEqual(limiter.reserve_ccxt(slow, method), 0)
+
+    def testIdleBucketsDropped(self):
+        limiter = RateLimiter(shared=False, max_buckets=4)
+        for i in range(4):
+            limiter.reserve_ccxt(FakeExchange('binance', str(i)), 'fetch_balance')
+        # all but the last have refilled
+        for bucket in list(limiter.buckets.values())[:3]:
+            bucket.updated -= 10
+        limiter.reserve_ccxt(FakeExchange('binance', 'new'), 'fetch_balance')
+        self.assertEqual(list(limiter.buckets), [('binance', '3'), ('binance', 'new')])
+
+    def testShared(self):
+        with tempfile.TemporaryDirectory() as path:
+            fds = len(os.listdir('/proc/self/fd'))
+            a = RateLimiter(shared=True, path=path)
+            b = RateLimiter(shared=True, path=path)
+            self.assertEqual(a.reserve(('x',), rate=1), 0)
+            self.assertGreater(b.reserve(('x',), rate=1), 0.9)
+            # no file is kept open between reservations
+            self.assertEqual(len(os.listdir('/proc/self/fd')), fds)
@@ -0,0 +1,102 @@
+import sys
+sys.path.insert(0, '/')
+import json
+import unittest
+from exapi import records
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+TRADES = [
+    {'id': '1', 'timestamp': 1546300800000, 'datetime': '2019-01-01T00:00:00.000Z', 'symbol': 'ETH/BTC',
+     'order': None, 'type': 'limit', 'side': 'buy', 'price': 0.0345, 'amount': 2, 'cost': 0.069,
+     'fee': {'cost': 0.1 + 0.2, 'currency': 'BNB'}},
+    {'id': '3', 'timestamp': 1546300802000, 'datetime': '2019-01-01T00:00:02.000Z', 'symbol': 'ETH/BTC',
+     'order': '9', 'type': None, 'side': 'sell', 'price': 0.0346, 'amount': 1.5, 'cost': None, 'fee': None},
+    {'id': '2', 'timestamp': 1546300801000, 'datetime': '2019-01-01T00:00:01.000Z', 'symbol': 'ETH/BTC',
+     'order': None, 'type': 'limit', 'side': 'buy', 'price': 123456789.123456789, 'amount': 1e-11,
+     'cost': 1, 'fee': None},
+    {'id': '1', 'timestamp': 1546300800000, 'datetime': '2019-01-01T00:00:00.000Z', 'symbol': 'ETH/BTC',
+     'order': None, 'type': 'limit', 'side': 'buy', 'price': 0.0345, 'amount': 2, 'cost': 0.069, 'fee': None},
+]
+
+TXS = [
+    {'id': 'a', 'txid': '0x1', 'timestamp': 1546300805000, 'datetime': None, 'address': 'x/y', 'tag': None,
+     'type': 'deposit', 'amount': 1.25, 'currency': 'BTC', 'status': 'ok', 'updated': None, 'fee': None},
+    {'id': 'b', 'txid': None, 'timestamp': 1546300801000, 'datetime': None, 'address': None, 'tag': 'é',
+     'type': 'withdrawal', 'amount': 3, 'currency': 'ETH', 'status': 'pending', 'updated': 1546300809000,
+     'fee': {'cost': 0.01, 'currency': 'ETH'}},
+]
+
+CANDLES = [[1546300800000, 1.0, 2.0, 0.5, 1.5, 10], [1546304400000, 1.5, 2.5, 1.0, 2.0, 0.1 + 0.2],
+           [1546304400000, 9, 9, 9, 9, 9]]
+
+def pandas_transactions(txs):
+    t = pd.DataFrame(txs, columns=records.TRANSACTION_COLUMNS)
+    # transactions without an id are keyed as the transaction store keys them
+    t['id'] = [records.tx_key(tx) if tx.get('id') is None else tx['id'] for tx in txs]
+    t.datetime = pd.to_datetime(t.timestamp, unit='ms')
+    t = t.reset_index().drop_duplicates(subset='id', keep='first')
+    return t.sort_values('timestamp', kind='stable').set_index('id')
+
+class TestRecords(unittest.TestCase):
+
+    def testHistory(self):
+        history = records.to_history(list(TRADES))
+        self.assertEqual(history[0]['id'], '1')
+        self.assertEqual(history[0]['timestamp'].year, 2019)
+        self.assertEqual(set(history[0]), set(records.HISTORY_COLUMNS))
+
+    @unittest.skipIf(pd is None, 'pandas is not installed')
+    def testTradesMatchPandas(self):
+        t = pd.DataFrame(TRADES, columns=records.TRADE_COLUMNS)
+        t = t.reset_index().drop_duplicates(subset='timestamp', keep='first').set_index('datetime')
+        self.assertEqual(records.to_trades(TRADES).to_json(), t.sort_index().to_json())
+
+    @unittest.skipIf(pd is None, 'pandas is not installed')
+    def testTransactionsMatchPandas(self):
+        self.assertEqual(records.to_transactions(TXS).to_json(), pandas_transactions(TXS).to_json())
+
+    def testMissingIndexKey(self):
+        trades = TRADES + [dict(TRADES[1], id='4', timestamp=None, datetime=None)]
+        txs = TXS + [dict(TXS[0], id=None)]
+        self.assertEqual(len(json.loads(records.to_trades(trades).to_json())['id']), 4)
+        self.assertEqual(len(json.loads(records.to_transactions(txs).to_json())['type']), 3)
+
+    @unittest.skipIf(pd is None, 'pandas is not installed')
+    def testMissingIndexKeyMatchesPandas(self):
+        trades = TRADES + [dict(TRADES[1], id='4', timestamp=None, datetime=None)]
+        t = pd.DataFrame(trades, columns=records.TRADE_COLUMNS)
+        t = t.reset_index().drop_duplicates(subset='timestamp', keep='first').set_index('datetime')
+        self.assertEqual(records.to_trades(trades).to_json(), t.sort_index().to_json())
+        txs = TXS + [dict(TXS[0], id='c', timestamp=None), dict(TXS[0], id=None)]
+        self.assertEqual(records.to_transactions(txs).to_json(), pandas_transactions(txs).to_json())
+
+    def testTransactionsDedupedOnId(self):
+        same_time = dict(TXS[1], id='c', type='deposit', timestamp=TXS[0]['timestamp'])
+        table = records.to_transactions(TXS + [same_time, TXS[0]])
+        self.assertEqual(table.index, ['b', 'a', 'c'])
+        # both are in the JSON, keyed by id
+        self.assertEqual(json.loads(table.to_json())['type'], {'b': 'withdrawal', 'a': 'deposit', 'c': 'deposit'})
+
+    def testTransactionsWithoutId(self):
+        other = dict(TXS[0], id=None, txid='0x2')
+        txs = TXS + [dict(TXS[0], id=None), other, dict(other)]
+        self.assertEqual(len(json.loads(records.to_transactions(txs).to_json())['txid']), 4)
+
+    @unittest.skipIf(pd is None, 'pandas is not installed')
+    def testCandlesMatchPandas(self):
+        c = pd.DataFrame(CANDLES, columns=records.CANDLE_COLUMNS)
+        c.timestamp = pd.to_datetime(c.timestamp, unit='ms')
+        c = c.drop_duplicates(subset='timestamp', keep='first').set_index('timestamp')
+        table = records.to_candles(CANDLES)
+        self.assertEqual(table.to_json(), c.to_json())
+        self.assertTrue(table.to_frame().equals(c))
+
+    def testFloatFormat(self):
+        self.assertEqual(records.format_float(0.1 + 0.2), '0.3')
+        self.assertEqual(records.format_float(1e-11), '0.0')
+        self.assertEqual(records.format_float(1e17), '1e+17')
+        self.assertEqual(records.format_float(1.5e-10), '0.0000000002')
@@ -0,0 +1,42 @@
+import sys
+sys.path.insert(0, '/')
+import time
+import unittest
+from exapi.registry import ExchangeRegistry
+
+class TestRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.created = []
+        self.exs = ExchangeRegistry()
+        self.exs.register('Fast', lambda: self.create('Fast'))
+        self.exs.register('Slow', lambda: self.create('Slow', delay=0.5))
+        self.exs.register('Dead', lambda: self.create('Dead', fail=True))
+
+    def create(self, name, delay=0, fail=False):
+        time.sleep(delay)
+        if fail:
+            raise ConnectionError(name)
+        self.created.append(name)
+        return name
+
+    def testLazy(self):
+        self.assertEqual(self.created, [])
+        self.assertEqual(self.exs['Fast']['PUBLIC'], 'Fast')
+        self.assertEqual(self.exs['Fast']['PUBLIC'], 'Fast')
+        self.assertEqual(self.created, ['Fast'])
+        self.assertIn('Fast', self.exs.startup_times)
+
+    def testDeadExchange(self):
+        with self.assertRaises(ConnectionError):
+            self.exs['Dead']['PUBLIC']
+        self.assertIn('Dead', self.exs.startup_errors)
+        with self.assertRaises(KeyError):
+            self.exs['Fast']['some-key']
+
+    def testWarmup(self):
+        start = time.time()
+        self.assertEqual(self.exs.warmup(deadline=0.2), ['Dead', 'Slow'])
+        self.assertLess(time.time() - start, 0.5)
+        self.assertIn('Fast', self.created)
+        self.assertEqual(self.exs['Slow']['PUBLIC'], 'Slow')
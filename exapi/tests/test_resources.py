@@ -0,0 +1,160 @@
+import sys
+sys.path.insert(0, '/')
+import os
+import json
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import ccxt
+import exapi
+from exapi import ccxt_exapi
+from exapi.ccxt_exapi import CCXT
+from exapi.market_store import MarketStore
+from exapi.trade_store import TradeStore
+from exapi.candle_store import CandleStore
+from exapi.transaction_store import TransactionStore
+from exapi.pool import InstancePool
+from exapi.tests.mock_exchange import MockExchange
+sys.path.insert(0, os.path.join(os.path.dirname(exapi.__file__), 'web'))
+import app
+import resources
+import price_cacher
+from price_cacher import PriceCacher
+from price_backends import MemoryBackend
+
+NOW = 1546300800000
+
+class NowMockExchange(MockExchange):
+    now = NOW
+    pairs = 4
+
+class FailingMockExchange(NowMockExchange):
+    def fetch_l2_order_book(self, symbol, limit=None, params={}):
+        self._call()
+        raise ccxt.ExchangeError(f'{self.id} is down')
+
+    def fetch_trades(self, symbol, since=None, limit=None, params={}):
+        self._call()
+        raise ccxt.ExchangeError(f'{self.id} is down')
+
+class SlowMockExchange(NowMockExchange):
+    latency = 1.0
+
+class DepositsMockExchange(NowMockExchange):
+    # an exchange that gives deposits no id
+    def fetch_deposits(self, code=None, since=None, limit=None, params={}):
+        self._call()
+        deposits = []
+        for i, txid in enumerate(('0x1', '0x2')):
+            timestamp = NOW - 1000 * (i + 1)
+            deposits.append({'id': None, 'txid': txid, 'timestamp': timestamp, 'datetime': self.iso8601(timestamp),
+                             'address': 'owner-address', 'tag': None, 'type': 'deposit', 'amount': 1.0,
+                             'currency': 'BTC', 'status': 'ok', 'updated': None, 'fee': None})
+        return deposits
+
+EXCHANGES = {'MockA': NowMockExchange, 'MockB': NowMockExchange,
+             'MockDown': FailingMockExchange, 'MockSlow': SlowMockExchange}
+
+class TestResources(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patches = [
+            mock.patch.object(ccxt_exapi, 'store', MarketStore(path=os.path.join(self.tmp.name, 'markets'))),
+            mock.patch.object(ccxt_exapi, 'trade_store', TradeStore(os.path.join(self.tmp.name, 'trades'))),
+            mock.patch.object(ccxt_exapi, 'candle_store', CandleStore(os.path.join(self.tmp.name, 'candles'))),
+            mock.patch.object(ccxt_exapi, 'tx_store', TransactionStore(path=os.path.join(self.tmp.name, 'txs'))),
+            mock.patch.object(resources, 'instances', InstancePool(
+                lambda name, key, secret, passphrase=None: CCXT('Mock', key=key, secret=secret,
+                                                                exchange_class=DepositsMockExchange))),
+            mock.patch.object(resources, 'cacher', PriceCacher(refresh_ahead=False, backend=MemoryBackend())),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for name, exchange_class in EXCHANGES.items():
+            exapi.exs.register(name, lambda exchange_class=exchange_class: CCXT('Mock', exchange_class=exchange_class))
+            self.addCleanup(exapi.exs.pop, name)
+        self.client = app.app.test_client()
+
+    def testMultiMidPrice(self):
+        resp = self.client.get('/midprice?base=C000&quote=BTC&exchanges=MockA,MockB,MockDown,MockSlow&timeout=0.5')
+        self.assertEqual(resp.status_code, 200)
+        results = resp.get_json()
+        self.assertEqual(set(results), set(EXCHANGES))
+        for name in ('MockA', 'MockB'):
+            self.assertTrue(results[name]['success'])
+            self.assertEqual(results[name]['price_float'], float(results[name]['price_str']))
+            self.assertLess(results[name]['age'], 60)
+        self.assertEqual(results['MockA']['price_str'], results['MockB']['price_str'])
+        self.assertFalse(results['MockDown']['success'])
+        self.assertEqual(results['MockSlow'], {'success': False, 'error': 'Timed out after 0.5s'})
+
+    def testMultiMidPriceNotBehindRefreshes(self):
+        cacher = resources.cacher
+        release = threading.Event()
+        self.addCleanup(release.set)
+        for i in range(price_cacher.REFRESH_WORKERS + 5):
+            cacher.pool.submit(release.wait)
+        resp = self.client.get('/midprice?base=C000&quote=BTC&exchanges=MockA,MockB&timeout=0.5')
+        self.assertTrue(all(result['success'] for result in resp.get_json().values()))
+
+    def testMultiMidPriceCancelsLookups(self):
+        cacher = resources.cacher
+        release = threading.Event()
+        self.addCleanup(release.set)
+        busy = [cacher.fanout_pool.submit(release.wait) for i in range(price_cacher.FANOUT_WORKERS)]
+        resp = self.client.get('/midprice?base=C000&quote=BTC&exchanges=MockA&timeout=0.1')
+        self.assertFalse(resp.get_json()['MockA']['success'])
+        release.set()
+        for future in busy:
+            future.result()
+        cacher.fanout_pool.submit(lambda: None).result()
+        # the queued lookup never ran
+        self.assertIsNone(cacher.age('MockA', 'C000', 'BTC'))
+
+    def testMultiMidPriceUnknownExchange(self):
+        resp = self.client.get('/midprice?base=C000&quote=BTC&exchanges=MockA,Nowhere')
+        self.assertEqual(resp.status_code, 404)
+        self.assertIn('Nowhere', resp.get_json()['message'])
+
+    def testStreamHistory(self):
+        resp = self.client.get(f'/MockA/history?base=C000&quote=BTC&since={NOW - 3600000}&stream=true')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.mimetype, 'application/x-ndjson')
+        lines = resp.get_data().splitlines()
+        trades = [json.loads(line) for line in lines]
+        # one a minute, since included
+        self.assertEqual(len(trades), 61)
+        self.assertEqual(set(trades[0]), set(ccxt_exapi.HISTORY_COLUMNS))
+        timestamps = [t['timestamp'] for t in trades]
+        self.assertEqual(timestamps, sorted(timestamps))
+
+    def testStreamCandles(self):
+        resp = self.client.get(f'/MockA/candles?base=C000&quote=BTC&interval=1h&since={NOW - 86400000}&stream=true')
+        self.assertEqual(resp.mimetype, 'application/x-ndjson')
+        candles = [json.loads(line) for line in resp.get_data().splitlines()]
+        self.assertTrue(candles)
+        expected = json.loads(self.client.get(f'/MockA/candles?base=C000&quote=BTC&interval=1h&since={NOW - 86400000}'
+                                              '&layout=columnar').get_data())
+        self.assertEqual(len(candles), len(expected['timestamp']))
+        self.assertEqual([c['timestamp'] for c in candles], expected['timestamp'])
+
+    def testStreamUpstreamError(self):
+        # the first record is fetched before responding, so the status is kept
+        resp = self.client.get(f'/MockDown/history?base=C000&quote=BTC&since={NOW - 3600000}&stream=true')
+        self.assertEqual(resp.status_code, 404)
+
+    def testTransactionsWithoutId(self):
+        url = '/MockA/transactions?key=key&secret=secret'
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        # the JSON layout is a JSON document in a string, as the pandas one was
+        self.assertEqual(sorted(json.loads(resp.get_json())['txid'].values()), ['0x1', '0x2'])
+        columns = json.loads(self.client.get(url + '&layout=columnar').get_data())
+        self.assertEqual(columns['txid'], ['0x2', '0x1'])
+
+if __name__ == '__main__':
+    unittest.main()
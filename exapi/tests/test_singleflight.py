@@ -0,0 +1,44 @@
+import sys
+sys.path.insert(0, '/')
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from exapi.singleflight import SingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.calls = 0
+
+    def slow(self, value):
+        self.calls += 1
+        time.sleep(0.2)
+        return value
+
+    def testSharedCall(self):
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda _: self.flight.do('k', self.slow, 1), range(8)))
+        self.assertEqual(results, [1] * 8)
+        self.assertEqual(self.calls, 1)
+        self.assertFalse(self.flight.in_flight('k'))
+
+    def testKeysIndependent(self):
+        with ThreadPoolExecutor(2) as pool:
+            results = list(pool.map(lambda k: self.flight.do(k, self.slow, k), ['a', 'b']))
+        self.assertEqual(results, ['a', 'b'])
+        self.assertEqual(self.calls, 2)
+
+    def testErrorShared(self):
+        def fail():
+            raise ValueError('boom')
+        with self.assertRaises(ValueError):
+            self.flight.do('k', fail)
+        self.assertFalse(self.flight.in_flight('k'))
+
+    def testSubmit(self):
+        with ThreadPoolExecutor(2) as pool:
+            self.flight.submit(pool, 'k', self.slow, 1)
+            self.flight.submit(pool, 'k', self.slow, 1)
+            self.assertTrue(self.flight.in_flight('k'))
+        self.assertEqual(self.calls, 1)
@@ -0,0 +1,54 @@
+import sys
+sys.path.insert(0, '/')
+import os
+import tempfile
+import unittest
+import exapi.trade_store as trade_store
+from exapi.trade_store import TradeStore
+
+def trade(ts, id):
+    return {'timestamp': ts, 'id': str(id), 'price': 1.0 + ts / 1000, 'amount': 2.0,
+            'cost': None, 'side': 'buy', 'type': None, 'order': None, 'fee': None}
+
+class TestTradeStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = TradeStore(path=self.tmp.name, freshness=0)
+        self.trades = [trade(1000 * i, i) for i in range(10)]
+        self.calls = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def loader(self, since, until):
+        self.calls.append((since, until))
+        return [t for t in self.trades if t['timestamp'] >= since and (until is None or t['timestamp'] < until)]
+
+    def testFetchesOnlyNewTrades(self):
+        got = self.store.get('Kraken', 'ETH/BTC', 0, self.loader)
+        self.assertEqual([t['id'] for t in got], [str(i) for i in range(10)])
+        self.trades.append(trade(10000, 10))
+        got = self.store.get('Kraken', 'ETH/BTC', 5000, self.loader)
+        self.assertEqual(self.calls[-1], (9000, None))
+        self.assertEqual([t['id'] for t in got], [str(i) for i in range(5, 11)])
+
+    def testFillsGapBeforeStart(self):
+        self.store.get('Kraken', 'ETH/BTC', 5000, self.loader)
+        got = self.store.get('Kraken', 'ETH/BTC', 2000, self.loader)
+        self.assertIn((2000, 5000), self.calls)
+        self.assertEqual([t['timestamp'] for t in got], [1000 * i for i in range(2, 10)])
+
+    def testRetention(self):
+        rows = trade_store.CHUNK_ROWS
+        trade_store.CHUNK_ROWS = 4
+        try:
+            self.store.get('Kraken', 'ETH/BTC', 0, self.loader)
+        finally:
+            trade_store.CHUNK_ROWS = rows
+        self.store.retention = 0
+        self.store.prune(force=True)
+        d = os.path.join(self.tmp.name, 'kraken', 'ETH-BTC')
+        self.assertEqual(len([f for f in os.listdir(d) if f.endswith('.npz')]), 1)
+        got = self.store.read('Kraken', 'ETH/BTC', 0)
+        self.assertEqual([t['id'] for t in got], ['8', '9'])
@@ -0,0 +1,36 @@
+import sys
+sys.path.insert(0, '/')
+import unittest
+from exapi.trade_sync import windows, fetch_windows, account_symbol
+from exapi.pool import account_id
+
+TRADES = [{'id': str(i), 'timestamp': i * 10} for i in range(100)]
+
+class TestTradeSync(unittest.TestCase):
+
+    def fetch(self, start, end):
+        # like an exchange without an end parameter, returns a page past end
+        return [t for t in TRADES if t['timestamp'] >= start][:(end - start) // 10 + 5]
+
+    def testWindows(self):
+        self.assertEqual(windows(0, 250, 100), [(0, 100), (100, 200), (200, 250)])
+        self.assertEqual(windows(0, 0, 100), [])
+
+    def testFetchWindows(self):
+        trades = fetch_windows(self.fetch, 0, 1000, 120)
+        self.assertEqual(trades, TRADES)
+
+    def testFetchWindowsRange(self):
+        trades = fetch_windows(self.fetch, 105, 305, 50)
+        self.assertEqual([t['timestamp'] for t in trades], list(range(110, 305, 10)))
+
+    def testAccountSymbolHidesCredentials(self):
+        symbol = account_symbol(account_id('Poloniex', 'secret-key', 'secret'), 'ETH/BTC')
+        self.assertNotIn('secret-key', symbol)
+        self.assertNotIn('secret', symbol)
+        self.assertTrue(symbol.endswith('-ETH/BTC'))
+        self.assertNotEqual(symbol, account_symbol(account_id('Poloniex', 'other-key', 'secret'), 'ETH/BTC'))
+        self.assertNotEqual(symbol, account_symbol(account_id('Poloniex', 'secret-key', 'wrong'), 'ETH/BTC'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import sys
+sys.path.insert(0, '/')
+import tempfile
+import unittest
+from exapi.transaction_store import TransactionStore
+
+def tx(tx_id, timestamp, status='ok'):
+    return {'id': tx_id, 'timestamp': timestamp, 'status': status}
+
+class TestTransactionStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = TransactionStore(path=self.tmp.name, freshness=0)
+        self.deposits = [tx('d1', 1000), tx('d2', 2000)]
+        self.withdrawals = [tx('w1', 1000, 'pending')]
+        self.calls = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def loaders(self):
+        def loader(name, txs):
+            def load(since):
+                self.calls.append((name, since))
+                return [t for t in txs if t['timestamp'] >= since]
+            return load
+        return {'deposits': loader('deposits', self.deposits),
+                'withdrawals': loader('withdrawals', self.withdrawals)}
+
+    def get(self, since=0):
+        return self.store.get('Kraken', 'key', since, self.loaders())
+
+    def testSameTimestampKept(self):
+        self.assertEqual([t['id'] for t in self.get()], ['d1', 'w1', 'd2'])
+
+    def testIncremental(self):
+        self.get()
+        self.calls.clear()
+        self.deposits.append(tx('d3', 3000))
+        self.withdrawals[0]['status'] = 'ok'
+        txs = self.get()
+        # deposits from the last one seen, withdrawals from the pending one
+        self.assertEqual(sorted(self.calls), [('deposits', 2000), ('withdrawals', 1000)])
+        self.assertEqual([t['id'] for t in txs], ['d1', 'w1', 'd2', 'd3'])
+        self.assertEqual(txs[1]['status'], 'ok')
+
+    def testFreshSkipsFetch(self):
+        self.store.freshness = 60
+        self.get(1500)
+        self.calls.clear()
+        self.assertEqual(len(self.get(2000)), 1)
+        self.assertEqual(self.calls, [])
+        # before the stored range
+        self.assertEqual(len(self.get(0)), 3)
+        self.assertEqual(sorted(self.calls), [('deposits', 0), ('withdrawals', 0)])
+
+if __name__ == '__main__':
+    unittest.main()
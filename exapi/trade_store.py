@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+import os
+import json
+import fcntl
+import logging
+import tempfile
+from threading import Lock
+from time import time
+import numpy as np
+
+TRADE_DIR = os.getenv('EXAPI_TRADE_DIR', os.path.join(tempfile.gettempdir(), 'exapi', 'trades'))
+TRADE_RETENTION = int(os.getenv('EXAPI_TRADE_RETENTION', 7 * 86400))      # seconds
+TRADE_MAX_BYTES = int(os.getenv('EXAPI_TRADE_MAX_MB', 1024)) * 1024 ** 2
+TRADE_FRESHNESS = float(os.getenv('EXAPI_TRADE_FRESHNESS', 2))           # seconds
+CHUNK_ROWS = 10000      # a chunk is rewritten with new trades until it holds this many
+PRUNE_INTERVAL = 60     # seconds between retention/size sweeps
+
+NUMERIC = ('timestamp', 'price', 'amount', 'cost')
+OBJECTS = ('id', 'order', 'side', 'type', 'fee')  # stored as JSON strings
+
+log = logging.getLogger(__name__)
+
+
+def to_columns(trades, objects=OBJECTS):
+    # list of ccxt trades -> dict of numpy columns
+    columns = {
+        'timestamp': np.array([t['timestamp'] for t in trades], dtype=np.int64),
+    }
+    for name in NUMERIC[1:]:
+        columns[name] = np.array([np.nan if t.get(name) is None else t[name] for t in trades],
+                                 dtype=float)
+    for name in objects:
+        columns[name] = np.array([json.dumps(t.get(name)) for t in trades], dtype=str)
+    return columns
+
+
+def from_columns(columns, objects=OBJECTS):
+    # dict of numpy columns -> list of ccxt-like trades, oldest first
+    n = len(columns['timestamp'])
+    rows = [{} for _ in range(n)]
+    for name in NUMERIC:
+        for row, value in zip(rows, columns[name].tolist()):
+            row[name] = None if value != value else value  # NaN was None
+    for name in objects:
+        for row, value in zip(rows, columns[name].tolist()):
+            row[name] = json.loads(value)
+    return rows
+
+
+def trade_key(trade):
+    # identity of a trade, to drop the overlap between consecutive fetches
+    if trade.get('id') is not None:
+        return str(trade['id'])
+    return json.dumps([trade['timestamp'], trade.get('price'), trade.get('amount'), trade.get('side')])
+
+
+class TradeStore(object):
+    '''
+    Append-only store of public trades per (exchange, symbol), shared by
+    every process. Trades are kept as columnar .npz chunks named after the
+    first and last timestamp they hold; meta.json records the covered range
+    [start, hwm] so only trades after the high-water mark are fetched.
+    Chunks older than retention seconds, and the oldest chunks when the
+    store grows past max_bytes, are deleted. objects are the non-numeric
+    fields kept for each trade.
+    '''
+    def __init__(self, path=TRADE_DIR, retention=TRADE_RETENTION, max_bytes=TRADE_MAX_BYTES,
+                 freshness=TRADE_FRESHNESS, objects=OBJECTS):
+        self.path = path
+        self.objects = objects
+        self.retention = retention
+        self.max_bytes = max_bytes
+        self.freshness = freshness
+        self.locks = {}
+        self.pruned = 0
+        os.makedirs(self.path, exist_ok=True)
+
+    def _dir(self, name, symbol):
+        return os.path.join(self.path, name.lower(), symbol.replace('/', '-'))
+
+    def _read_meta(self, d):
+        try:
+            with open(os.path.join(d, 'meta.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, d, meta):
+        fd, tmp = tempfile.mkstemp(dir=d, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(d, 'meta.json'))
+
+    @staticmethod
+    def _chunks(d):
+        # [(first, last, filename)] oldest first
+        chunks = []
+        for filename in os.listdir(d):
+            if filename.endswith('.npz'):
+                first, last = filename[:-4].split('-')
+                chunks.append((int(first), int(last), filename))
+        return sorted(chunks)
+
+    def _write_chunk(self, d, columns):
+        ts = columns['timestamp']
+        filename = f'{ts[0]:013d}-{ts[-1]:013d}.npz'
+        fd, tmp = tempfile.mkstemp(dir=d, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **columns)
+        os.replace(tmp, os.path.join(d, filename))
+        return filename
+
+    def _load_chunk(self, d, filename):
+        with np.load(os.path.join(d, filename)) as data:
+            return {name: data[name] for name in NUMERIC + self.objects}
+
+    def _append(self, d, trades, tail):
+        # writes trades (oldest first) after the existing chunks, filling
+        # the last chunk up to CHUNK_ROWS before starting a new one
+        columns = to_columns(trades, self.objects)
+        chunks = self._chunks(d)
+        old = None
+        if tail and chunks:
+            first, last, filename = chunks[-1]
+            old = self._load_chunk(d, filename)
+            if len(old['timestamp']) < CHUNK_ROWS:
+                columns = {k: np.concatenate([old[k], columns[k]]) for k in columns}
+            else:
+                old = None
+        for i in range(0, len(columns['timestamp']), CHUNK_ROWS):
+            written = self._write_chunk(d, {k: v[i:i + CHUNK_ROWS] for k, v in columns.items()})
+            if old is not None and written != filename:
+                os.unlink(os.path.join(d, filename))
+            old = None
+
+    def iter_read(self, name, symbol, since, until=None):
+        '''
+        yields the stored trades for name/symbol from since (ms), oldest
+        first, one list per chunk
+        '''
+        d = self._dir(name, symbol)
+        meta = self._read_meta(d)
+        if meta is None:
+            return
+        since = max(since, meta['start'])
+        for first, last, filename in self._chunks(d):
+            if last < since or (until is not None and first >= until):
+                continue
+            try:
+                columns = self._load_chunk(d, filename)
+            except OSError:
+                # the last chunk is rewritten under a new name as it grows
+                renamed = [c[2] for c in self._chunks(d) if c[0] == first]
+                if not renamed:
+                    continue
+                columns = self._load_chunk(d, renamed[0])
+            mask = columns['timestamp'] >= since
+            if until is not None:
+                mask &= columns['timestamp'] < until
+            yield from_columns({k: v[mask] for k, v in columns.items()}, self.objects)
+
+    def read(self, name, symbol, since, until=None):
+        '''
+        returns the stored trades for name/symbol from since (ms), oldest first
+        '''
+        return [t for part in self.iter_read(name, symbol, since, until) for t in part]
+
+    def get(self, name, symbol, since, loader):
+        '''
+        returns trades for name/symbol from since (ms), oldest first, see sync()
+        '''
+        self.sync(name, symbol, since, loader)
+        return self.read(name, symbol, since)
+
+    def sync(self, name, symbol, since, loader):
+        '''
+        brings the stored trades for name/symbol up to date from since (ms).
+        loader(since, until) fetches trades from the exchange; it is only
+        called for the range before the stored data and after its high-water
+        mark. Only one caller across all processes updates a given symbol.
+        '''
+        d = self._dir(name, symbol)
+        os.makedirs(d, exist_ok=True)
+        with self.locks.setdefault(d, Lock()):
+            with open(os.path.join(d, 'meta.lock'), 'a') as lockfile:
+                fcntl.flock(lockfile, fcntl.LOCK_EX)
+                try:
+                    self._sync(d, since, loader)
+                finally:
+                    fcntl.flock(lockfile, fcntl.LOCK_UN)
+        self.prune()
+
+    def _sync(self, d, since, loader):
+        meta = self._read_meta(d)
+        now = time()
+        if meta is None or not self._chunks(d):
+            trades = loader(since, None)
+            if trades:
+                self._append(d, trades, tail=False)
+                meta = {'start': since, 'hwm': trades[-1]['timestamp'],
+                        'edge': [trade_key(t) for t in trades if t['timestamp'] == trades[-1]['timestamp']]}
+            else:
+                meta = {'start': since, 'hwm': since, 'edge': []}
+            meta['synced'] = now
+            self._write_meta(d, meta)
+            return
+
+        if since < meta['start']:
+            # gap before the stored range, up to the first stored trade
+            log.debug(f'Fetching trades before {meta["start"]} for {d}')
+            first = min(meta['start'], self._chunks(d)[0][0])
+            trades = [t for t in loader(since, first) if t['timestamp'] < first]
+            if trades:
+                self._append(d, trades, tail=False)
+            meta['start'] = since
+
+        if now - meta.get('synced', 0) >= self.freshness:
+            edge = set(meta['edge'])
+            trades = [t for t in loader(meta['hwm'], None)
+                      if t['timestamp'] > meta['hwm'] or
+                      (t['timestamp'] == meta['hwm'] and trade_key(t) not in edge)]
+            if trades:
+                self._append(d, trades, tail=True)
+                hwm = trades[-1]['timestamp']
+                at_hwm = [trade_key(t) for t in trades if t['timestamp'] == hwm]
+                meta['edge'] = at_hwm if hwm > meta['hwm'] else meta['edge'] + at_hwm
+                meta['hwm'] = hwm
+            meta['synced'] = now
+        self._write_meta(d, meta)
+
+    def prune(self, force=False):
+        '''
+        deletes chunks past retention and, oldest first, chunks beyond
+        max_bytes across all symbols. Runs at most every PRUNE_INTERVAL.
+        '''
+        now = time()
+        if not force and now - self.pruned < PRUNE_INTERVAL:
+            return
+        self.pruned = now
+        horizon = (now - self.retention) * 1000
+        chunks = []
+        for root, dirs, files in os.walk(self.path):
+            if 'meta.json' in files:
+                for first, last, filename in self._chunks(root):
+                    size = os.path.getsize(os.path.join(root, filename))
+                    chunks.append((last, root, filename, size))
+        total = sum(c[3] for c in chunks)
+        for last, root, filename, size in sorted(chunks):
+            if last >= horizon and total <= self.max_bytes:
+                break
+            with open(os.path.join(root, 'meta.lock'), 'a') as lockfile:
+                fcntl.flock(lockfile, fcntl.LOCK_EX)
+                try:
+                    meta = self._read_meta(root)
+                    if meta is None or last >= meta['hwm']:
+                        # never drop the chunk holding the high-water mark
+                        continue
+                    os.unlink(os.path.join(root, filename))
+                    meta['start'] = max(meta['start'], last + 1)
+                    self._write_meta(root, meta)
+                    total -= size
+                except OSError:
+                    pass
+                finally:
+                    fcntl.flock(lockfile, fcntl.LOCK_UN)
+
+
+store = TradeStore()
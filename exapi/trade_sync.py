@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+import os
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from .trade_store import TradeStore, OBJECTS, trade_key
+
+MY_TRADE_DIR = os.getenv('EXAPI_MY_TRADE_DIR', os.path.join(tempfile.gettempdir(), 'exapi', 'my_trades'))
+MY_TRADE_RETENTION = int(os.getenv('EXAPI_MY_TRADE_RETENTION', 10 * 365 * 86400))   # seconds
+MY_TRADE_MAX_BYTES = int(os.getenv('EXAPI_MY_TRADE_MAX_MB', 1024)) * 1024 ** 2
+MY_TRADE_WINDOW = int(os.getenv('EXAPI_MY_TRADE_WINDOW', 7 * 86400)) * 1000        # ms fetched per window
+MY_TRADE_LOOKBACK = 30 * 86400 * 1000   # ms synced when no since is given
+MY_TRADE_WORKERS = int(os.getenv('EXAPI_MY_TRADE_WORKERS', 4))   # windows fetched at once
+
+# widest range an exchange's fetch_my_trades accepts, in ms
+MAX_WINDOWS = {
+    'Poloniex': 10 * 86400 * 1000,
+}
+
+log = logging.getLogger(__name__)
+
+# threads start on first use, so this is safe to create before uWSGI forks
+pool = ThreadPoolExecutor(max_workers=MY_TRADE_WORKERS)
+
+
+def account_symbol(account, symbol=None):
+    '''
+    the store's "symbol" for an account's trades of symbol (or of every
+    pair). account is the pool.account_id of its credentials, so neither
+    they nor another secret for the same key lead to the account's trades.
+    '''
+    return f'{account}-{symbol or "all"}'
+
+
+def windows(since, until, size):
+    '''
+    splits [since, until) into [start, end) windows of at most size ms
+    '''
+    return [(start, min(start + size, until)) for start in range(since, until, size)]
+
+
+def fetch_windows(fetch, since, until, size, pool=pool):
+    '''
+    returns the trades of fetch(start, end) over windows of [since, until),
+    fetched concurrently on pool, oldest first and without duplicates.
+    Trades a window returns outside of it are dropped.
+    '''
+    parts = windows(since, until, size)
+    log.debug(f'Fetching {len(parts)} windows of trades from {since} to {until}')
+    futures = [pool.submit(fetch, start, end) for start, end in parts]
+    seen = set()
+    trades = []
+    for (start, end), future in zip(parts, futures):
+        for trade in sorted(future.result(), key=lambda t: t['timestamp']):
+            key = trade_key(trade)
+            if start <= trade['timestamp'] < end and key not in seen:
+                seen.add(key)
+                trades.append(trade)
+    return trades
+
+
+# an account's own trades, kept for MY_TRADE_RETENTION so only fills after
+# the high-water mark are fetched again
+store = TradeStore(MY_TRADE_DIR, MY_TRADE_RETENTION, MY_TRADE_MAX_BYTES,
+                   objects=OBJECTS + ('symbol', 'datetime'))
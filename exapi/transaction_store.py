@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+import os
+import json
+import fcntl
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import time
+from .records import tx_key
+
+TX_DIR = os.getenv('EXAPI_TX_DIR', os.path.join(tempfile.gettempdir(), 'exapi', 'transactions'))
+TX_FRESHNESS = float(os.getenv('EXAPI_TX_FRESHNESS', 10))   # seconds
+FINAL_STATUSES = ('ok', 'failed', 'canceled')
+
+log = logging.getLogger(__name__)
+
+# threads start on first use, so this is safe to create before uWSGI forks
+pool = ThreadPoolExecutor(max_workers=4)
+
+
+class TransactionStore(object):
+    '''
+    On-disk deposits and withdrawals per account, shared by every process,
+    kept by transaction id. For each leg (the ccxt method listing them) the
+    store records the range it has fetched, [start, hwm]; a sync fetches
+    each leg concurrently from its high-water mark, or from the oldest of
+    its transactions still pending so their status gets updated.
+    '''
+    def __init__(self, path=TX_DIR, freshness=TX_FRESHNESS):
+        self.path = path
+        self.freshness = freshness
+        self.locks = {}
+        os.makedirs(self.path, exist_ok=True)
+
+    def _base(self, name, account):
+        d = os.path.join(self.path, name.lower())
+        os.makedirs(d, exist_ok=True)
+        return os.path.join(d, account)
+
+    def _read(self, base):
+        try:
+            with open(base + '.json') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'legs': {}, 'txs': {}}
+
+    def _write(self, base, data):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(base), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, base + '.json')
+
+    def _from(self, data, leg, since):
+        # where the next fetch of leg starts, or None if it is up to date
+        state = data['legs'].get(leg)
+        if state is None or since < state['start']:
+            return since
+        if time() - state['synced'] < self.freshness:
+            return None
+        pending = [tx['timestamp'] for tx in data['txs'].values()
+                   if tx.get('leg') == leg and tx.get('status') not in FINAL_STATUSES
+                   and tx.get('timestamp') is not None]
+        return min([state['hwm']] + pending)
+
+    def _sync(self, base, since, loaders):
+        data = self._read(base)
+        starts = {leg: self._from(data, leg, since) for leg in loaders}
+        starts = {leg: start for leg, start in starts.items() if start is not None}
+        if not starts:
+            return data
+        futures = {leg: pool.submit(loaders[leg], start) for leg, start in starts.items()}
+        now = time()
+        for leg, future in futures.items():
+            txs = future.result()
+            log.debug(f'Fetched {len(txs)} {leg} from {starts[leg]}')
+            for tx in txs:
+                data['txs'][tx_key(tx)] = {**tx, 'leg': leg}
+            state = data['legs'].get(leg, {'start': since, 'hwm': since})
+            stamps = [tx['timestamp'] for tx in txs if tx.get('timestamp') is not None]
+            data['legs'][leg] = {'start': min(state['start'], since),
+                                 'hwm': max([state['hwm']] + stamps), 'synced': now}
+        self._write(base, data)
+        return data
+
+    def get(self, name, account, since, loaders):
+        '''
+        returns the transactions of the account from since (ms), oldest
+        first. account is the pool.account_id of its credentials, so
+        credentials that were never checked by the exchange cannot read
+        another account's transactions. loaders is {leg: loader(since)}, each returning every
+        transaction of its leg from since; they run concurrently and only
+        for legs that are not up to date. Only one caller across all
+        processes updates a given account.
+        '''
+        base = self._base(name, account)
+        with self.locks.setdefault(base, Lock()):
+            with open(base + '.lock', 'a') as lockfile:
+                fcntl.flock(lockfile, fcntl.LOCK_EX)
+                try:
+                    data = self._sync(base, since, loaders)
+                finally:
+                    fcntl.flock(lockfile, fcntl.LOCK_UN)
+        txs = [tx for tx in data['txs'].values()
+               if tx.get('leg') in loaders and (tx.get('timestamp') or 0) >= since]
+        txs.sort(key=lambda tx: tx.get('timestamp') or 0)
+        return [{k: v for k, v in tx.items() if k != 'leg'} for tx in txs]
+
+
+store = TransactionStore()
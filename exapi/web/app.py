@@ -1,14 +1,18 @@
 #!/usr/bin/env python3
+import os
 import sys
 sys.path.insert(0, '/')
 from flask import Flask
 from flask_restful import Api, Resource, abort
 from flask_apispec import FlaskApiSpec
 from flask_cors import CORS
+import exapi
+import encoders
 from webargs.flaskparser import parser
 from resources import (CachedMidPriceResource, OrderBookResource, HistoryResource, Healthcheck, DetailsResource,
-                       CandlesResource, BalancesResource, OrderResource, OrdersResource, WithdrawalResource,
-                       MarketsResource, TradeResource, TradesResource, TransactionResource)
+                       AllDetailsResource, MultiMidPriceResource, ImpactResource,
+                       CandlesResource, BalancesResource, OrderResource, OrdersResource, BatchOrdersResource,
+                       WithdrawalResource, MarketsResource, TradeResource, TradesResource, TransactionResource)
 
 
 app = Flask(__name__)
@@ -19,14 +23,18 @@ app.config['ERROR_404_HELP'] = False
 # Enable Cross Origin Resource Sharing for all domains on all routes
 CORS(app)
 api = Api(app)
+encoders.init_app(app, api)
 docs = FlaskApiSpec(app)
 
 resources = {
     # Unsecured
     '/<string:exchangeName>/orderbook' : OrderBookResource,
     '/<string:exchangeName>/midprice' : CachedMidPriceResource,
+    '/midprice' : MultiMidPriceResource,
+    '/<string:exchangeName>/impact' : ImpactResource,
     '/<string:exchangeName>/history' : HistoryResource,
     '/<string:exchangeName>/details' : DetailsResource,
+    '/<string:exchangeName>/details/all' : AllDetailsResource,
     '/<string:exchangeName>/candles' : CandlesResource,
     '/<string:exchangeName>/markets' : MarketsResource,
     '/health': Healthcheck,
@@ -34,6 +42,7 @@ resources = {
     '/<string:exchangeName>/balances' : BalancesResource,
     '/<string:exchangeName>/order/<string:order_id>' : OrderResource,
     '/<string:exchangeName>/orders' : OrdersResource,
+    '/<string:exchangeName>/orders/batch' : BatchOrdersResource,
     '/<string:exchangeName>/withdrawal/test' : WithdrawalResource,
     '/<string:exchangeName>/trade/test' : TradeResource,
     '/<string:exchangeName>/trades' : TradesResource,
@@ -46,6 +55,10 @@ for key, value in resources.items():
     # Register documentation
     docs.register(value)
 
+# Optionally load every exchange concurrently instead of on first use
+if os.getenv('EXAPI_WARMUP'):
+    exapi.exs.warmup(deadline=float(os.getenv('EXAPI_WARMUP_DEADLINE', 30)))
+
 # This error handler is necessary for webargs usage with Flask-RESTful.
 @parser.error_handler
 def handle_request_parsing_error(err, req):
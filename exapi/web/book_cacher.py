@@ -0,0 +1,44 @@
+import logging
+from time import time
+from threading import Lock
+from flask_restful import abort
+import exapi
+from exapi.singleflight import SingleFlight
+
+BOOK_CACHE_TIME = 2  # seconds
+
+log = logging.getLogger(__name__)
+
+
+class BookCacher(object):
+    '''
+    Keeps each fetched OrderBook for cachetime seconds, so that bursts of
+    requests on the same pair share one orderbook fetch. The cache is
+    shared by the request threads, so it is only touched under lock.
+    '''
+    def __init__(self, cachetime=BOOK_CACHE_TIME):
+        self.cachetime = cachetime
+        self.cache = {}
+        self.lock = Lock()
+        self.flight = SingleFlight()
+
+    def get_book(self, ex, base, quote, limit=100):
+        key = (ex, base.upper(), quote.upper(), limit)
+        with self.lock:
+            c = self.cache.get(key)
+        if c is not None and c['expiry'] > time():
+            return c['book']
+        return self.flight.do(key, self._fetch, key)
+
+    def _fetch(self, key):
+        ex, base, quote, limit = key
+        ob = exapi.exs[ex]['PUBLIC'].get_orderbook(base, quote, limit=limit)
+        if not isinstance(ob, exapi.OrderBook):
+            abort(404, message=f'No orderbook available for {base}/{quote} at {ex}')
+        now = time()
+        with self.lock:
+            # drop expired books so the cache only holds recently quoted pairs
+            for k in [k for k, c in self.cache.items() if c['expiry'] < now]:
+                del self.cache[k]
+            self.cache[key] = {'book': ob, 'expiry': now + self.cachetime}
+        return ob
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import os
+import json
 import requests
 from pprint import pprint
 
@@ -17,6 +18,24 @@ def get_orderbook(exchangeName, base=None, quote=None, count=None, side=None):
     return json_content
 
 
+def get_midprices(base, quote, exchanges='all', timeout=None):
+    url = baseURL + '/midprice'
+    params = {'base' : base, 'quote' : quote, 'exchanges' : exchanges, 'timeout' : timeout}
+    response = requests.get(url, params=params)
+    response.raise_for_status()
+    json_content = response.json()
+    return json_content
+
+
+def get_impact(exchangeName, base, quote, side, amount=None, notional=None):
+    url = baseURL + exchangeName + '/impact'
+    params = {'base' : base, 'quote' : quote, 'side' : side, 'amount' : amount, 'notional' : notional}
+    response = requests.get(url, params=params)
+    response.raise_for_status()
+    json_content = response.json()
+    return json_content
+
+
 def get_history(exchangeName, base=None, quote=None, count=None):
     url = baseURL + exchangeName + '/history'
     params = {'base' : base, 'quote' : quote, 'count' : count}
@@ -26,6 +45,15 @@ def get_history(exchangeName, base=None, quote=None, count=None):
     return json_content
     
 
+def stream_history(exchangeName, base=None, quote=None, since=None):
+    url = baseURL + exchangeName + '/history'
+    params = {'base' : base, 'quote' : quote, 'since' : since, 'stream' : 'true'}
+    with requests.get(url, params=params, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            yield json.loads(line)
+
+
 def get_details(exchangeName, base=None, quote=None):
     url = baseURL + exchangeName + '/details'
     params = {'base' : base, 'quote' : quote}
@@ -35,6 +63,14 @@ def get_details(exchangeName, base=None, quote=None):
     return json_content
 
 
+def get_all_details(exchangeName):
+    url = baseURL + exchangeName + '/details/all'
+    response = requests.get(url)
+    response.raise_for_status()
+    json_content = response.json()
+    return json_content
+
+
 def get_candles(exchangeName, base=None, quote=None, interval=None, start=None, limit=None):
     url = baseURL + exchangeName + '/candles'
     params = {'base' : base, 'quote' : quote, 'interval' : interval, 'start' : start, 'limit' : limit}
@@ -90,6 +126,27 @@ def order(exchangeName, base, quote, side, amount, key, secret, passphrase=None,
     return json_content
 
 
+def cancel_all(exchangeName, key, secret, passphrase=None, base=None, quote=None, orderids=None):
+    url = baseURL + exchangeName + '/orders'
+    params = {'base' : base, 'quote' : quote, 'key' : key, 'secret' : secret, 'passphrase' : passphrase}
+    if orderids:
+        params['order_ids'] = ','.join(orderids)
+    response = requests.delete(url, params=params)
+    response.raise_for_status()
+    json_content = response.json()
+    return json_content['results']
+
+
+def batch_order(exchangeName, orders, key, secret, passphrase=None):
+    # orders: [{'base': ..., 'quote': ..., 'side': ..., 'amount': ..., 'price': ..., 'type': ...}]
+    url = baseURL + exchangeName + '/orders/batch'
+    params = {'key' : key, 'secret' : secret, 'passphrase' : passphrase}
+    response = requests.post(url, params=params, json={'orders': orders})
+    response.raise_for_status()
+    json_content = response.json()
+    return json_content['results']
+
+
 def test_withdrawal(exchangeName, key, secret, passphrase=None):
     url = baseURL + exchangeName + '/withdrawal/test'
     params = {'key' : key, 'secret' : secret, 'passphrase' : passphrase}
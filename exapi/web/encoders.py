@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+import json
+import logging
+from datetime import date
+from decimal import Decimal
+from flask import Response
+from werkzeug.http import http_date
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+log = logging.getLogger(__name__)
+
+
+def default(obj):
+    # types the stdlib encoder does not know, rendered as flask's encoder does
+    if isinstance(obj, date):
+        return http_date(obj)
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def json_dumps(data):
+    return json.dumps(data, default=default, separators=(',', ':')).encode() + b'\n'
+
+
+if orjson is not None:
+    ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS |
+                      orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_APPEND_NEWLINE)
+
+    def orjson_dumps(data):
+        return orjson.dumps(data, default=default, option=ORJSON_OPTIONS)
+
+    dumps = orjson_dumps
+else:
+    dumps = json_dumps
+
+
+def json_response(data, code=200, headers=None):
+    '''
+    encodes data with orjson when installed, else the json module
+    '''
+    resp = Response(dumps(data), status=code, mimetype='application/json')
+    resp.headers.extend(headers or {})
+    return resp
+
+
+def columnar(records, columns):
+    '''
+    returns {column: [values]} for an iterable of record dicts
+    '''
+    data = {c: [] for c in columns}
+    appends = [(c, data[c].append) for c in columns]
+    for record in records:
+        for c, append in appends:
+            append(record.get(c))
+    return data
+
+
+def init_app(app, api):
+    '''
+    makes json_response the encoder of flask_restful and flask_apispec responses
+    '''
+    api.representations['application/json'] = json_response
+    app.config['APISPEC_FORMAT_RESPONSE'] = json_response
+    log.info(f'Encoding responses with {"orjson" if orjson else "json"}')
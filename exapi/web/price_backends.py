@@ -0,0 +1,214 @@
+import os
+import mmap
+import zlib
+import fcntl
+import struct
+import logging
+import tempfile
+from time import time
+from contextlib import contextmanager
+from decimal import Decimal as dec
+from threading import Lock
+
+PRICE_BACKEND = os.getenv('EXAPI_PRICE_BACKEND', 'memory')
+MMAP_PATH = os.getenv('EXAPI_PRICE_MMAP',
+                      os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+                                   'exapi-prices'))
+MMAP_SLOTS = 4096
+MMAP_PROBES = 32  # slots a key may occupy past its hash
+REDIS_URL = os.getenv('EXAPI_REDIS_URL', 'redis://localhost:6379/0')
+REDIS_LOCK_TIMEOUT = 60  # seconds
+
+log = logging.getLogger(__name__)
+
+
+def _name(key):
+    return ':'.join(key).upper()
+
+
+class PriceBackend(object):
+    '''
+    Storage for PriceCacher entries {'price', 'timestamp', 'expiry'} keyed
+    by (exchange, base, quote). lock(key) is held while fetching a price so
+    that every process sharing the backend makes one upstream fetch per key.
+    '''
+    name = None
+
+    def __init__(self):
+        self.counters = {'hits': 0, 'misses': 0, 'stale': 0}
+
+    def count(self, counter):
+        self.counters[counter] += 1
+
+    def stats(self):
+        return {'backend': self.name, **self.counters}
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, entry):
+        raise NotImplementedError
+
+    def lock(self, key):
+        raise NotImplementedError
+
+
+class MemoryBackend(PriceBackend):
+    '''
+    Per-process dict. The default, and an in-process fake for tests.
+    '''
+    name = 'memory'
+
+    def __init__(self):
+        super(MemoryBackend, self).__init__()
+        self.entries = {}
+        self.locks = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, entry):
+        self.entries[key] = entry
+
+    def lock(self, key):
+        return self.locks.setdefault(key, Lock())
+
+
+class MmapBackend(PriceBackend):
+    '''
+    Hash table in a memory-mapped file shared by all processes on the
+    host. Readers hold a shared and writers an exclusive lock on the file.
+    A key lives within MMAP_PROBES slots of its hash; when those are taken
+    it replaces an expired entry or else the least recently used one.
+    Fetches are serialized per key with a byte-range lock on a separate
+    lock file and a lock per byte within this process. Counters are per
+    process.
+    '''
+    name = 'mmap'
+    slot = struct.Struct('<64s48sddd')  # key, price, timestamp, expiry, last used
+
+    def __init__(self, path=MMAP_PATH, slots=MMAP_SLOTS, probes=MMAP_PROBES):
+        super(MmapBackend, self).__init__()
+        self.slots = slots
+        self.probes = min(probes, slots)
+        size = self.slot.size * slots
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+        self.map = mmap.mmap(self.fd, size)
+        self.lockfd = os.open(path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        self.locks = {}
+
+    def _offsets(self, name):
+        # linear probing from a hash that is stable across processes
+        h = zlib.crc32(name)
+        return [((h + i) % self.slots) * self.slot.size for i in range(self.probes)]
+
+    def _find(self, name):
+        for offset in self._offsets(name):
+            if self.map[offset:offset + 64].rstrip(b'\0') == name:
+                return offset
+        return None
+
+    def _victim(self, name, now):
+        # an empty slot, else an expired entry, else the least recently used
+        def rank(offset):
+            _, _, _, expiry, used = self.slot.unpack_from(self.map, offset)
+            return expiry > now, used
+        offsets = self._offsets(name)
+        for offset in offsets:
+            if not self.map[offset:offset + 64].rstrip(b'\0'):
+                return offset
+        return min(offsets, key=rank)
+
+    def get(self, key):
+        name = _name(key).encode()
+        fcntl.lockf(self.fd, fcntl.LOCK_SH)
+        try:
+            offset = self._find(name)
+            if offset is None:
+                return None
+            _, price, timestamp, expiry, _ = self.slot.unpack_from(self.map, offset)
+            # racing readers may both write here; the last one wins, which
+            # is all eviction needs
+            struct.pack_into('<d', self.map, offset + self.slot.size - 8, time())
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN)
+        return {
+            'price': dec(price.rstrip(b'\0').decode()),
+            'timestamp': timestamp,
+            'expiry': expiry,
+        }
+
+    def set(self, key, entry):
+        name = _name(key).encode()
+        if len(name) > 64:
+            log.warning(f'Price key too long, not caching {name}')
+            return
+        now = time()
+        fcntl.lockf(self.fd, fcntl.LOCK_EX)
+        try:
+            offset = self._find(name)
+            if offset is None:
+                offset = self._victim(name, now)
+            self.slot.pack_into(self.map, offset, name, str(entry['price']).encode(),
+                                entry['timestamp'], entry['expiry'], now)
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN)
+
+    @contextmanager
+    def lock(self, key):
+        # record locks are per process: keys sharing a byte would neither
+        # exclude nor keep each other's lock in the same process, so threads
+        # take a local lock for the byte first
+        offset = zlib.crc32(_name(key).encode()) % self.slots
+        with self.locks.setdefault(offset, Lock()):
+            fcntl.lockf(self.lockfd, fcntl.LOCK_EX, 1, offset)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self.lockfd, fcntl.LOCK_UN, 1, offset)
+
+
+class RedisBackend(PriceBackend):
+    '''
+    Entries in a local Redis (or compatible) key-value service.
+    Requires the redis package.
+    '''
+    name = 'redis'
+
+    def __init__(self, url=REDIS_URL):
+        super(RedisBackend, self).__init__()
+        import redis
+        self.redis = redis.Redis.from_url(url)
+
+    def get(self, key):
+        entry = self.redis.hgetall('exapi:price:' + _name(key))
+        if not entry:
+            return None
+        return {
+            'price': dec(entry[b'price'].decode()),
+            'timestamp': float(entry[b'timestamp']),
+            'expiry': float(entry[b'expiry']),
+        }
+
+    def set(self, key, entry):
+        self.redis.hset('exapi:price:' + _name(key), mapping={
+            'price': str(entry['price']),
+            'timestamp': entry['timestamp'],
+            'expiry': entry['expiry'],
+        })
+
+    def lock(self, key):
+        return self.redis.lock('exapi:lock:' + _name(key), timeout=REDIS_LOCK_TIMEOUT)
+
+
+backends = {
+    'memory': MemoryBackend,
+    'mmap': MmapBackend,
+    'redis': RedisBackend,
+}
+
+
+def get_backend(name=PRICE_BACKEND):
+    return backends[name]()
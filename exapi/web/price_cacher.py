@@ -1,11 +1,21 @@
+import os
 import logging
 from time import time, sleep
-from threading import RLock
+from concurrent.futures import ThreadPoolExecutor, wait
 from decimal import Decimal as dec
 import exapi
+from exapi.singleflight import SingleFlight
+from exapi.circuit import RetryPolicy
+from price_refresher import PriceRefresher
+from price_backends import get_backend
 
-GRACE_TIME = 5  # seconds to sleep on exception
 API_RETRIES = 2
+retry_policy = RetryPolicy(retries=API_RETRIES - 1)
+STALE_TIME = int(os.getenv('EXAPI_PRICE_STALE_TIME', 300))  # seconds past expiry a price is still served
+REFRESH_AHEAD = os.getenv('EXAPI_PRICE_REFRESH_AHEAD', '1') != '0'
+FANOUT_TIMEOUT = 10  # seconds to wait for each exchange in get_prices
+FANOUT_WORKERS = 16  # lookups of get_prices running at once
+REFRESH_WORKERS = 16  # background refreshes running at once
 
 log = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG)
@@ -16,61 +26,134 @@ class PCError(Exception):
 
 
 class PriceCacher(object):
-    def __init__(self, cachetime=60):
+    '''
+    Caches mid prices per (exchange, base, quote) for cachetime seconds.
+    Only one fetch runs per key; for stale_time seconds after expiry the
+    old price is returned while a single background fetch refreshes it.
+    With refresh_ahead, frequently requested prices are refreshed before
+    they expire, see PriceRefresher. Entries live in backend, which can be
+    shared by all worker processes, see price_backends.
+    '''
+    def __init__(self, cachetime=60, stale_time=STALE_TIME, refresh_ahead=REFRESH_AHEAD,
+                 backend=None):
         self.cachetime = cachetime
-        self.rlock = RLock()
-        self.cache = {}
+        self.stale_time = stale_time
+        self.backend = backend or get_backend()
+        self.flight = SingleFlight()
+        # lookups for a request do not queue behind background refreshes
+        self.pool = ThreadPoolExecutor(max_workers=REFRESH_WORKERS)
+        self.fanout_pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS)
+        self.refresher = PriceRefresher(self) if refresh_ahead else None
 
     def get_price(self, ex, base, quote, limit=10):
-        # return cached price if not expired
-        try:
-            if self.cache[ex][quote][base]['expiry'] > time():
+        key = (ex, base, quote)
+        if self.refresher:
+            self.refresher.record(key)
+        c = self.backend.get(key)
+        now = time()
+        if c is not None:
+            # return cached price if not expired
+            if c['expiry'] > now:
                 log.debug(f'Retrieving cached price for {ex}: {quote}/{base}')
-                log.debug(self.cache[ex][quote][base]['price'])
-                return self.cache[ex][quote][base]['price']
-        except KeyError:
-            pass
-        with self.rlock:
-            # re-attempt in case of queued requests
+                self.backend.count('hits')
+                return c['price']
+            if c['expiry'] + self.stale_time > now:
+                log.debug(f'Refreshing stale price for {ex}: {quote}/{base}')
+                self.backend.count('stale')
+                self.refresh(ex, base, quote, limit)
+                return c['price']
+        self.backend.count('misses')
+        return self.flight.do(key, self._fetch, ex, base, quote, limit)
+
+    def _fetch(self, ex, base, quote, limit):
+        key = (ex, base, quote)
+        start = time()
+        with self.backend.lock(key):
+            # another process may have fetched it while we waited
+            c = self.backend.get(key)
+            if c is not None and c['timestamp'] >= start:
+                return c['price']
+            return self._fetch_orderbook(ex, base, quote, limit)
+
+    def _fetch_orderbook(self, ex, base, quote, limit):
+        key = (ex, base, quote)
+        deadline = retry_policy.deadline()
+        for i in range(API_RETRIES):
             try:
-                if self.cache[ex][quote][base]['expiry'] > time():
-                    log.debug(f'Retrieving cached price for {ex}: {quote}/{base}')
-                    log.debug(self.cache[ex][quote][base]['price'])
-                    return self.cache[ex][quote][base]['price']
-            except KeyError:
-                pass
+                ob = exapi.exs[ex]['PUBLIC'].get_orderbook(base, quote, limit=limit)
+                log.debug(ob)
+                # Mid price (midway between best bid and ask)
+                c = {
+                    'price': dec(ob.best_bid() + ob.best_ask()) / 2,
+                    'timestamp': time(),
+                    'expiry': time() + self.cachetime
+                }
+                self.backend.set(key, c)
+                return c['price']
+            except Exception as e:
+                log.debug('[PC] %s %s/%s: %s' % (ex, base, quote, e))
+                tb = e
+                delay = retry_policy.backoff(i, deadline)
+                if delay is None:
+                    break
+                sleep(delay)
+        c = self.backend.get(key)
+        if c is not None:
+            log.warn('[PC] Returning stale data for %s %s/%s' % (ex, base, quote))
+            return c['price']
+        raise PCError(tb)
+
+    def refresh(self, ex, base, quote, limit=10):
+        '''
+        fetches the price in the background unless a fetch is already running
+        '''
+        key = (ex, base, quote)
+        self.flight.submit(self.pool, key, self._fetch, ex, base, quote, limit)
+
+    def expiry(self, ex, base, quote):
+        c = self.backend.get((ex, base, quote))
+        if c is None:
+            return None
+        return c['expiry']
+
+    def age(self, ex, base, quote):
+        '''
+        returns seconds since the cached price was fetched, or None
+        '''
+        c = self.backend.get((ex, base, quote))
+        if c is None:
+            return None
+        return time() - c['timestamp']
 
-            for i in range(API_RETRIES):
-                try:
-                    ob = exapi.exs[ex]['PUBLIC'].get_orderbook(base, quote, limit=limit)
-                    log.debug(ob)
-                    # Mid price (midway between best bid and ask)
-                    c = {
-                        'price': dec(ob['bids'][0][0] + ob['asks'][0][0]) / 2,
-                        'expiry': time() + self.cachetime
-                    }
-                    try:
-                        self.cache[ex][quote][base] = c
-                    except KeyError:
-                        try:
-                            self.cache[ex][quote] = {
-                                base: c
-                            }
-                        except KeyError:
-                            self.cache[ex] = {
-                                quote: {base: c}
-                            }
-                    return self.cache[ex][quote][base]['price']
-                except Exception as e:
-                    log.debug('[PC] %s %s/%s: %s' % (ex, base, quote, e))
-                    if i + 1 < API_RETRIES:
-                        sleep(GRACE_TIME)
-                    else:
-                        try:
-                            p = self.cache[ex][quote][base]['price']
-                        except KeyError:
-                            tb = e
-                        else:
-                            log.warn('[PC] Returning stale data for %s %s/%s' % (ex, base, quote))
-                            return p
-            raise PCError(tb)
\ No newline at end of file
+    def get_prices(self, exs, base, quote, timeout=FANOUT_TIMEOUT):
+        '''
+        resolves the mid price on every exchange in exs concurrently,
+        waiting at most timeout seconds. Returns {ex: result} where result
+        has the price and its age, or the error for that exchange.
+        '''
+        futures = {ex: self.fanout_pool.submit(self.get_price, ex, base, quote) for ex in exs}
+        wait(futures.values(), timeout=timeout)
+        results = {}
+        for ex, future in futures.items():
+            if not future.done():
+                # a lookup that has not started is dropped; a running one
+                # still fills the cache for the next request
+                future.cancel()
+                results[ex] = {
+                    'success': False,
+                    'error': f'Timed out after {timeout}s',
+                }
+            elif future.exception() is not None:
+                results[ex] = {
+                    'success': False,
+                    'error': str(future.exception()),
+                }
+            else:
+                price = future.result()
+                results[ex] = {
+                    'success': True,
+                    'price_str': str(price),
+                    'price_float': float(price),
+                    'age': self.age(ex, base, quote),
+                }
+        return results
@@ -0,0 +1,129 @@
+import os
+import logging
+from time import time, sleep
+from threading import Lock, Thread
+import exapi
+from exapi.ratelimit import limiter
+
+REFRESH_LEAD = 10    # seconds before expiry a hot price is refreshed
+HOT_REQUESTS = 3     # requests needed before a key is refreshed ahead of time
+IDLE_TIME = 600      # seconds without requests before a key is dropped
+RATE_SHARE = float(os.getenv('EXAPI_REFRESH_RATE_SHARE', 0.5))  # share of an exchange's request rate refreshes may use
+RATE_BUDGET = 2      # refreshes per second on exchanges without a ccxt rate limit
+TICK = 1             # seconds between scheduler runs
+
+log = logging.getLogger(__name__)
+
+
+class PriceRefresher(object):
+    '''
+    Tracks which (exchange, base, quote) keys are requested and refreshes
+    the hot ones shortly before their cached price expires, so callers
+    polling a fixed set of pairs never wait on an orderbook fetch.
+    Refreshes per exchange are limited to budgets.get(ex) per second, or
+    else to share of the exchange's public request rate, see rate().
+    '''
+    def __init__(self, cacher, lead=REFRESH_LEAD, hot_requests=HOT_REQUESTS,
+                 idle_time=IDLE_TIME, share=RATE_SHARE, budget=RATE_BUDGET, budgets=None):
+        self.cacher = cacher
+        self.lead = lead
+        self.hot_requests = hot_requests
+        self.idle_time = idle_time
+        self.share = share
+        self.budget = budget
+        self.budgets = budgets or {}
+        self.keys = {}
+        self.allowance = {}
+        self.lock = Lock()
+        self.pid = None
+        self.last_tick = time()
+
+    def record(self, key):
+        now = time()
+        with self.lock:
+            k = self.keys.get(key)
+            if k is None:
+                self.keys[key] = {'requests': 1, 'last': now}
+            else:
+                k['requests'] += 1
+                k['last'] = now
+        self.start()
+
+    def start(self):
+        # the thread is started in each worker process, not in the uWSGI master
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    self.pid = os.getpid()
+                    Thread(target=self.run, name='PriceRefresher', daemon=True).start()
+
+    def run(self):
+        while True:
+            try:
+                self.tick()
+            except Exception as e:
+                log.warning(f'[PR] {e!r}')
+            sleep(TICK)
+
+    def rate(self, ex):
+        '''
+        refreshes per second allowed on ex: share of the rate the rate
+        limiter gives its order book calls, or budget for exchanges that
+        are not ccxt ones
+        '''
+        if ex in self.budgets:
+            return self.budgets[ex]
+        try:
+            exchange = getattr(exapi.exs[ex]['PUBLIC'], 'exchange', None)
+        except Exception:
+            # not created yet because it fails to start; the refresh would fail too
+            exchange = None
+        if exchange is None:
+            return self.budget
+        _, rate, _, cost = limiter.ccxt_bucket(exchange, 'fetch_l2_order_book')
+        return self.share * rate / cost
+
+    def _spend(self, ex, elapsed):
+        rate = self.rate(ex)
+        # below one refresh per second, a whole refresh still has to accrue
+        allowance = min(max(1, rate), self.allowance.get(ex, rate) + elapsed * rate)
+        if allowance < 1:
+            self.allowance[ex] = allowance
+            return False
+        self.allowance[ex] = allowance - 1
+        return True
+
+    def tick(self):
+        '''
+        drops idle keys and starts refreshes for hot keys close to expiry.
+        returns the keys refreshed.
+        '''
+        now = time()
+        elapsed, self.last_tick = now - self.last_tick, now
+        with self.lock:
+            for key in [key for key, k in self.keys.items() if k['last'] + self.idle_time < now]:
+                del self.keys[key]
+            hot = [key for key, k in self.keys.items() if k['requests'] >= self.hot_requests]
+        due = []
+        for key in hot:
+            expiry = self.cacher.expiry(*key)
+            if expiry is not None and expiry - self.lead < now:
+                due.append((expiry, key))
+        # the budget of an exchange may not cover every key, refresh those expiring first
+        due.sort()
+        refreshed = []
+        spent = set()
+        for expiry, key in due:
+            ex = key[0]
+            if ex not in spent:
+                # budget accrues once per tick for each exchange
+                spent.add(ex)
+                if not self._spend(ex, elapsed):
+                    continue
+            elif not self._spend(ex, 0):
+                continue
+            self.cacher.refresh(*key)
+            refreshed.append(key)
+        if refreshed:
+            log.debug(f'[PR] Refreshing {len(refreshed)} prices')
+        return refreshed
@@ -1,15 +1,23 @@
 import sys
 sys.path.insert(0, '/')
 import logging
+from flask import Response, stream_with_context
 from flask_apispec import MethodResource, doc, use_kwargs as use_kwargs_doc
 from flask_restful import abort
 from webargs import fields, validate
 from webargs.flaskparser import use_kwargs 
 from marshmallow import missing
 import exapi
+from exapi.records import HISTORY_COLUMNS, CANDLE_COLUMNS, TRADE_COLUMNS, TRANSACTION_COLUMNS
+from exapi.market_store import store as market_store
+from exapi.circuit import breakers
+from exapi.pool import InstancePool
 from price_cacher import PriceCacher, PCError
+from book_cacher import BookCacher
+from encoders import dumps, columnar
 
 cacher = PriceCacher()
+book_cacher = BookCacher()
 
 logging.basicConfig(level=logging.DEBUG)
 log = logging.getLogger(__name__)
@@ -22,35 +30,93 @@ def pruneCreds(args):
 
 base_args = {
 }
+tabular_args = {
+    'stream': fields.Bool(required=False, missing=False,
+                          description='Stream records as newline-delimited JSON as they are fetched'),
+    'layout': fields.Str(required=False, missing='records',
+                         validate=validate.OneOf(['records', 'columnar']),
+                         description='columnar returns {column: [values]} with epoch-ms timestamps'),
+}
 secure_args = {**base_args, **{
     'key': fields.Str(required=True, description='The API key for exchange authentication'),
     'secret': fields.Str(required=True, description='The API password / secret for exchange authentication'),
     'passphrase': fields.Str(required=False, description='The passphrase or user ID for exchange authentication, if needed')
 }}
 
-def addExchange(exchangeName, key, secret, passphrase=None):
-    if exchangeName == 'Kucoin':
-        ex = exapi.CCXT('Kucoin2', key=key, secret=secret, passphrase=passphrase)
-    else:
-        ex = exapi.CCXT(exchangeName, key=key, secret=secret, passphrase=passphrase)
-    exapi.exs[exchangeName][key] = ex
-    return ex
+order_args = {
+    'side': fields.Str(required=True,
+                        validate=validate.OneOf(['buy', 'sell']),
+                        description='Whether to post a buy order or a sell order'),
+    'amount': fields.Float(required=True,
+                           description='The quantity of the currency used in the order'),
+    'price': fields.Decimal(required=False,
+                            description='The price required if posting a limit order; ignored for market orders'),
+    'base': fields.Str(required=True, description='Base currency code'),
+    'quote': fields.Str(required=True, description='Quote currency code'),
+    'type': fields.Str(required=False,
+                        validate=validate.OneOf(['limit', 'market']),
+                        missing='limit',
+                        description='Whether to post a limit order or a market order'),
+}
+BATCH_LIMIT = 50    # orders per batch request
+
+def make_secure_ex(exchangeName, key, secret, passphrase=None):
+    return exapi.CCXT(exapi.ccxt_names.get(exchangeName, exchangeName),
+                      key=key, secret=secret, passphrase=passphrase)
+
+instances = InstancePool(make_secure_ex)
 
 def get_secure_ex(exchangeName, kwargs):
-    if kwargs.get('key') in exapi.exs[exchangeName]:
-        log.debug(f'Using cached {exchangeName} CCXT object for {kwargs.get("key")}')
-        ex = exapi.exs[exchangeName][kwargs.get('key')]
-    else:
-        log.debug(f'Creating new {exchangeName} CCXT object for {kwargs.get("key")}')
-        ex = addExchange(exchangeName, **pruneCreds(kwargs))
-    return ex
+    '''
+    returns a Lease on the pooled CCXT object for the request's credentials;
+    use "with get_secure_ex(...) as ex:"
+    '''
+    if exchangeName not in exapi.exs:
+        abort(404, message=f'Unknown exchange {exchangeName}')
+    return instances.lease(exchangeName, **pruneCreds(kwargs))
+
+def ndjson(records, lease=None):
+    '''
+    streams records as newline-delimited JSON. The first record is fetched
+    before responding so upstream errors still set the status code; a later
+    error ends the stream with an {"error": message} line. A lease on the
+    instance producing records is held until the response is closed.
+    '''
+    records = iter(records)
+    try:
+        first = [next(records)]
+    except StopIteration:
+        first = []
+
+    def generate():
+        for record in first:
+            yield dumps(record)
+        try:
+            for record in records:
+                yield dumps(record)
+        except Exception as e:
+            log.exception('Stream failed')
+            message = getattr(e, 'data', {}).get('message') or str(e)
+            yield dumps({'error': message})
+    resp = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    if lease is not None:
+        resp.call_on_close(lease.retain().release)
+    return resp
 
 # ----------------------------------------------- Unsecured Resources
 
 class Healthcheck(MethodResource):
     @doc(tags=['Healthcheck'], description='Endpoint for checking API health')
     def get(self):
-        return {'message': 'exapi API is running'}
+        return {
+            'message': 'exapi API is running',
+            'market_ages': market_store.ages(),
+            'startup_times': exapi.exs.startup_times,
+            'startup_errors': exapi.exs.startup_errors,
+            'price_cache': cacher.backend.stats(),
+            'breakers': breakers.states(),
+            'instance_pool': instances.stats(),
+        }
 
 class OrderBookResource(MethodResource):
     get_args = {**base_args, **{
@@ -67,7 +133,10 @@ class OrderBookResource(MethodResource):
     @doc(tags=['Unsecured'], description='Retrieves the current order book at the exchange.')
     def get(self, exchangeName, **kwargs):
         ex = exapi.exs[exchangeName]['PUBLIC']
-        return ex.get_orderbook(**pruneArgs(kwargs))
+        ob = ex.get_orderbook(**pruneArgs(kwargs))
+        if isinstance(ob, exapi.OrderBook):
+            return ob.to_dict()
+        return ob
 
 class CachedMidPriceResource(MethodResource):
     get_args = {**base_args, **{
@@ -79,10 +148,11 @@ class CachedMidPriceResource(MethodResource):
     @doc(tags=['Unsecured'], description='Retrieves the current mid price from the order book at the exchange.')
     def get(self, exchangeName, **kwargs):
         try:
+            price = cacher.get_price(exchangeName, **pruneArgs(kwargs))
             return {
                 'success': True,
-                'price_str': str(cacher.get_price(exchangeName, **pruneArgs(kwargs))),
-                'price_float': float(cacher.get_price(exchangeName, **pruneArgs(kwargs))),
+                'price_str': str(price),
+                'price_float': float(price),
             }
         except PCError as e:
             return {
@@ -90,8 +160,58 @@ class CachedMidPriceResource(MethodResource):
                 'error': str(e),
             }
 
-class HistoryResource(MethodResource):
+class MultiMidPriceResource(MethodResource):
     get_args = {**base_args, **{
+        'base': fields.Str(required=True, description='Base currency code'),
+        'quote': fields.Str(required=True, description='Quote currency code'),
+        'exchanges': fields.Str(required=False, missing='all',
+                                description='Comma separated exchange names, or "all"'),
+        'timeout': fields.Float(required=False, missing=10,
+                                validate=validate.Range(min=0, max=60),
+                                description='Seconds to wait for each exchange'),
+    }}
+    @use_kwargs(get_args)
+    @use_kwargs_doc(get_args, locations=['query'])
+    @doc(tags=['Unsecured'], description='Retrieves the current mid price at several exchanges concurrently. '
+                                         'Exchanges that fail or time out are reported with an error.')
+    def get(self, base, quote, exchanges, timeout):
+        if exchanges == 'all':
+            names = exapi.exchanges
+        else:
+            names = [name.strip() for name in exchanges.split(',') if name.strip()]
+        unknown = [name for name in names if name not in exapi.exs]
+        if unknown:
+            abort(404, message=f'Unknown exchanges: {", ".join(unknown)}')
+        return cacher.get_prices(names, base, quote, timeout=timeout)
+
+class ImpactResource(MethodResource):
+    get_args = {**base_args, **{
+        'base': fields.Str(required=True, description='Base currency code'),
+        'quote': fields.Str(required=True, description='Quote currency code'),
+        'side': fields.Str(required=True,
+                           validate=validate.OneOf(['buy', 'sell']),
+                           description='Whether the order would buy (take asks) or sell (take bids)'),
+        'amount': fields.Float(required=False, validate=validate.Range(min=0),
+                               description='Order size in the base currency'),
+        'notional': fields.Float(required=False, validate=validate.Range(min=0),
+                                 description='Order size in the quote currency, instead of amount'),
+        'limit': fields.Integer(required=False, missing=100,
+                                description='Order book depth to fetch'),
+    }}
+    @use_kwargs(get_args)
+    @use_kwargs_doc(get_args, locations=['query'])
+    @doc(tags=['Unsecured'], description='Estimates the fill of a market order from the current order book: '
+                                         'filled amount, cost, VWAP, worst price and slippage versus mid in bps.')
+    def get(self, exchangeName, base, quote, side, limit, amount=missing, notional=missing):
+        if (amount is missing) == (notional is missing):
+            abort(422, message='Specify exactly one of amount or notional')
+        ob = book_cacher.get_book(exchangeName, base, quote, limit=limit)
+        if amount is not missing:
+            return ob.impact(side, amount=amount)
+        return ob.impact(side, notional=notional)
+
+class HistoryResource(MethodResource):
+    get_args = {**base_args, **tabular_args, **{
         'base': fields.Str(required=False, description='Base currency code'),
         'quote': fields.Str(required=False, description='Quote currency code'),
         'limit': fields.Integer(required=False, description='The maximum number of trades to return'),
@@ -99,9 +219,16 @@ class HistoryResource(MethodResource):
     }}
     @use_kwargs(get_args)
     @use_kwargs_doc(get_args, locations=['query'])
-    @doc(tags=['Unsecured'], description='Retrieves recent trade history for the specified currency pair.')
-    def get(self, exchangeName, **kwargs):
+    @doc(tags=['Unsecured'], description='Retrieves recent trade history for the specified currency pair. '
+                                         'With stream=true, trades are streamed oldest first as NDJSON.')
+    def get(self, exchangeName, stream, layout, **kwargs):
         ex = exapi.exs[exchangeName]['PUBLIC']
+        if stream:
+            return ndjson(ex.iter_history(**pruneArgs(kwargs)))
+        if layout == 'columnar':
+            history = columnar(ex.iter_history(**pruneArgs(kwargs)), HISTORY_COLUMNS)
+            # newest first, as with the records layout
+            return {column: values[::-1] for column, values in history.items()}
         return ex.get_history(**pruneArgs(kwargs))
 
 class DetailsResource(MethodResource):
@@ -116,6 +243,12 @@ class DetailsResource(MethodResource):
         ex = exapi.exs[exchangeName]['PUBLIC']
         return ex.get_details(**pruneArgs(kwargs))
 
+class AllDetailsResource(MethodResource):
+    @doc(tags=['Unsecured'], description='Retrieves details for every currency pair at the exchange, keyed by symbol.')
+    def get(self, exchangeName):
+        ex = exapi.exs[exchangeName]['PUBLIC']
+        return ex.get_all_details()
+
 class MarketsResource(MethodResource):
     @doc(tags=['Unsecured'], description='Retrieves summary.')
     def get(self, exchangeName, **kwargs):
@@ -127,7 +260,7 @@ class MarketsResource(MethodResource):
         return markets
 
 class CandlesResource(MethodResource):
-    get_args = {**base_args, **{
+    get_args = {**base_args, **tabular_args, **{
         'base': fields.Str(required=False, description='Base currency code'),
         'quote': fields.Str(required=False, description='Quote currency code'),
         'interval': fields.Str(required=False,
@@ -141,10 +274,15 @@ class CandlesResource(MethodResource):
     }}
     @use_kwargs(get_args)
     @use_kwargs_doc(get_args, locations=['query'])
-    @doc(tags=['Unsecured'], description='Retrieves candles. Not all exchanges support this method; HTTP status 404 will be returned if unavailable.')
-    def get(self, exchangeName, **kwargs):
+    @doc(tags=['Unsecured'], description='Retrieves candles. Not all exchanges support this method; HTTP status 404 will be returned if unavailable. '
+                                         'With stream=true, candles are streamed oldest first as NDJSON.')
+    def get(self, exchangeName, stream, layout, **kwargs):
         ex = exapi.exs[exchangeName]['PUBLIC']
         args = pruneArgs(kwargs)
+        if stream and hasattr(ex, 'iter_candles'):
+            return ndjson(ex.iter_candles(**args))
+        if layout == 'columnar' and hasattr(ex, 'iter_candles'):
+            return columnar(ex.iter_candles(**args), CANDLE_COLUMNS)
         # not every class has get_candles defined
         if hasattr(ex, 'get_candles') and callable(getattr(ex, 'get_candles')):
             return ex.get_candles(**args).to_json()
@@ -157,34 +295,48 @@ class BalancesResource(MethodResource):
     @use_kwargs_doc(secure_args, locations=['query'])
     @doc(tags=['Secured'], description='Retrieves all asset balances for the authenticated user.')
     def get(self, exchangeName, **kwargs):
-        ex = get_secure_ex(exchangeName, kwargs)
-        return ex.get_balances(**pruneArgs(kwargs))
+        with get_secure_ex(exchangeName, kwargs) as ex:
+            return ex.get_balances(**pruneArgs(kwargs))
 
 class TradesResource(MethodResource):
-    get_args = {**secure_args, **{
+    get_args = {**secure_args, **tabular_args, **{
         'base': fields.Str(required=False, description='Base currency code'),
         'quote': fields.Str(required=False, description='Quote currency code'),
-        'limit': fields.Integer(required=False, description='The maximum number of trades to return'),
-        'since': fields.Integer(required=False, description='Start time'),
+        'limit': fields.Integer(required=False,
+                                description='Trades fetched per request to the exchange; every trade from since is returned'),
+        'since': fields.Integer(required=False, description='Start time, in ms; the last 30 days if omitted'),
     }}
     @use_kwargs(get_args)
     @use_kwargs_doc(get_args, locations=['query'])
-    @doc(tags=['Secured'], description='Retrieves user trade history')
-    def get(self, exchangeName, **kwargs):
-        ex = get_secure_ex(exchangeName, kwargs)
-        return ex.get_trades(**pruneArgs(kwargs))
+    @doc(tags=['Secured'], description='Retrieves user trade history. '
+                                       'With stream=true, the trades from since are streamed oldest first as NDJSON.')
+    def get(self, exchangeName, stream, layout, **kwargs):
+        lease = get_secure_ex(exchangeName, kwargs)
+        with lease as ex:
+            if stream:
+                return ndjson(ex.iter_trades(**pruneArgs(kwargs)), lease)
+            if layout == 'columnar':
+                return columnar(ex.iter_trades(**pruneArgs(kwargs)), TRADE_COLUMNS)
+            return ex.get_trades(**pruneArgs(kwargs))
 
 class TransactionResource(MethodResource):
-    get_args = {**secure_args, **{
-        'limit': fields.Integer(required=False, description='The maximum number of trades to return'),
+    get_args = {**secure_args, **tabular_args, **{
+        'limit': fields.Integer(required=False,
+                                description='Transactions fetched per request to the exchange; every one from since is returned'),
         'since': fields.Integer(required=False, description='Start time')
     }}
     @use_kwargs(get_args)
     @use_kwargs_doc(get_args, locations=['query'])
-    @doc(tags=['Secured'], description='Retrieves user transaction history')
-    def get(self, exchangeName, **kwargs):
-        ex = get_secure_ex(exchangeName, kwargs)
-        return ex.get_transactions(**pruneArgs(kwargs))
+    @doc(tags=['Secured'], description='Retrieves user transaction history, keyed by transaction id. '
+                                       'With stream=true, the transactions from since are streamed oldest first as NDJSON.')
+    def get(self, exchangeName, stream, layout, **kwargs):
+        lease = get_secure_ex(exchangeName, kwargs)
+        with lease as ex:
+            if stream:
+                return ndjson(ex.iter_transactions(**pruneArgs(kwargs)), lease)
+            if layout == 'columnar':
+                return columnar(ex.iter_transactions(**pruneArgs(kwargs)), TRANSACTION_COLUMNS)
+            return ex.get_transactions(**pruneArgs(kwargs))
 
 class OrderResource(MethodResource):
     get_args = {**secure_args, **{
@@ -193,15 +345,17 @@ class OrderResource(MethodResource):
     }}
     @use_kwargs(get_args)
     @use_kwargs_doc(get_args, locations=['query'])
-    @doc(tags=['Secured'], description='Retrieves an order previously posted by the authenticated user (open or closed)')
+    @doc(tags=['Secured'], description='Retrieves an order previously posted by the authenticated user (open or closed). '
+                                       'as_of is when the order was last fetched, in ms; open orders are refreshed '
+                                       'every EXAPI_ORDER_REFRESH seconds.')
     def get(self, exchangeName, **kwargs):
-        ex = get_secure_ex(exchangeName, kwargs)
-        try:
-            return ex.get_order(**pruneArgs(kwargs))
-        except Exception as e:
-            if 'not exist' in str(e):
-                abort(404)
-            raise e
+        with get_secure_ex(exchangeName, kwargs) as ex:
+            try:
+                return ex.get_order(**pruneArgs(kwargs))
+            except Exception as e:
+                if 'not exist' in str(e):
+                    abort(404)
+                raise e
     
     delete_args = {**secure_args, **{
         'base': fields.Str(required=False, description='Base currency code'),
@@ -211,8 +365,8 @@ class OrderResource(MethodResource):
     @use_kwargs_doc(delete_args, locations=['query'])
     @doc(tags=['Secured'], description='Cancel an open order (and allow the exchange to delete it if needed)')
     def delete(self, exchangeName, **kwargs):
-        ex = get_secure_ex(exchangeName, kwargs)
-        return ex.cancel(**pruneArgs(kwargs))
+        with get_secure_ex(exchangeName, kwargs) as ex:
+            return ex.cancel(**pruneArgs(kwargs))
 
 class OrdersResource(MethodResource):
     get_args = {**secure_args, **{
@@ -224,51 +378,70 @@ class OrdersResource(MethodResource):
     }}
     @use_kwargs(get_args)
     @use_kwargs_doc(get_args, locations=['query'])
-    @doc(tags=['Secured'], description='Retrieves all orders previously posted by the authenticated user with the specified type.')
+    @doc(tags=['Secured'], description='Retrieves all orders previously posted by the authenticated user with the specified type. '
+                                       'as_of is when the open orders were last fetched, in ms.')
     def get(self, exchangeName, type, **kwargs):
-        ex = get_secure_ex(exchangeName, kwargs)
-        if type == 'open':
-            return ex.get_orders(**pruneArgs(kwargs))
-        abort(404)
+        with get_secure_ex(exchangeName, kwargs) as ex:
+            if type == 'open':
+                return ex.get_orders(**pruneArgs(kwargs))
+            abort(404)
     
-    post_args = {**secure_args, **{
-        'side': fields.Str(required=True,
-                            validate=validate.OneOf(['buy', 'sell']),
-                            description='Whether to post a buy order or a sell order'),
-        'amount': fields.Float(required=True,
-                               description='The quantity of the currency used in the order'),
-        'price': fields.Decimal(required=False,
-                                description='The price required if posting a limit order; ignored for market orders'),
-        'base': fields.Str(required=True, description='Base currency code'),
-        'quote': fields.Str(required=True, description='Quote currency code'),
-        'type': fields.Str(required=False,
-                            validate=validate.OneOf(['limit', 'market']),
-                            missing='limit',
-                            description='Whether to post a limit order or a market order'),
-    }}
+    post_args = {**secure_args, **order_args}
     @use_kwargs(post_args)
     @use_kwargs_doc(post_args, locations=['query'])
     @doc(tags=['Secured'], description='Posts a new order to the exchange.')
     def post(self, exchangeName, **kwargs):
-        ex = get_secure_ex(exchangeName, kwargs)
-        log.debug(ex)
-        log.debug(kwargs)
-        return ex.order(**pruneArgs(kwargs))
-    
+        with get_secure_ex(exchangeName, kwargs) as ex:
+            log.debug(ex)
+            log.debug(kwargs)
+            return ex.order(**pruneArgs(kwargs))
+
+    delete_args = {**secure_args, **{
+        'base': fields.Str(required=False, description='Base currency code'),
+        'quote': fields.Str(required=False, description='Quote currency code'),
+        'order_ids': fields.DelimitedList(fields.Str(), required=False,
+                                          description='Comma-separated ids to cancel; all open orders if omitted'),
+    }}
+    @use_kwargs(delete_args)
+    @use_kwargs_doc(delete_args, locations=['query'])
+    @doc(tags=['Secured'], description='Cancels the given orders, or every open order (of base/quote if given), '
+                                       'concurrently. Returns {"results": [...]}, each {"id": order id, '
+                                       '"cancelled": bool} or {"id": order id, "error": message, "status": HTTP status}.')
+    def delete(self, exchangeName, **kwargs):
+        with get_secure_ex(exchangeName, kwargs) as ex:
+            return {'results': ex.cancel_all(**pruneArgs(kwargs))}
+
+class BatchOrdersResource(MethodResource):
+    post_args = {**secure_args, **{
+        'orders': fields.List(fields.Nested(order_args), required=True, location='json',
+                              validate=validate.Length(min=1, max=BATCH_LIMIT),
+                              description='The orders to post, each with the arguments of POST /orders'),
+    }}
+    @use_kwargs(post_args)
+    @use_kwargs_doc(secure_args, locations=['query'])
+    @use_kwargs_doc({'orders': post_args['orders']}, locations=['json'])
+    @doc(tags=['Secured'], description='Posts several orders for one account. All are checked against the '
+                                       'trading rules first, then the valid ones are submitted concurrently. '
+                                       'Returns {"results": [...]} in request order, each {"id": order id} '
+                                       'or {"error": message, "status": HTTP status}.')
+    def post(self, exchangeName, orders, **kwargs):
+        with get_secure_ex(exchangeName, kwargs) as ex:
+            return {'results': ex.orders(orders)}
+
 class WithdrawalResource(MethodResource):
     @use_kwargs(secure_args)
     @use_kwargs_doc(secure_args, locations=['query'])
     @doc(tags=['Secured'], description='Returns whether a withdrawal is allowed for the authenticated user.')
     # change to "post" if desired
     def get(self, exchangeName, **kwargs):
-        ex = get_secure_ex(exchangeName, kwargs)
-        return ex.test_withdrawal(**pruneArgs(kwargs))
+        with get_secure_ex(exchangeName, kwargs) as ex:
+            return ex.test_withdrawal(**pruneArgs(kwargs))
     
 class TradeResource(MethodResource):
     @use_kwargs(secure_args)
     @use_kwargs_doc(secure_args, locations=['query'])
     @doc(tags=['Secured'], description='Returns whether trading is enabled for the authenticated user.')
     def get(self, exchangeName, **kwargs):
-        ex = get_secure_ex(exchangeName, kwargs)
-        return ex.test_trading_enabled(**pruneArgs(kwargs))
+        with get_secure_ex(exchangeName, kwargs) as ex:
+            return ex.test_trading_enabled(**pruneArgs(kwargs))
 